@@ -1 +1 @@
-from . import analysis, upload, metrics
+from . import analysis, upload, metrics, compare, dashboard
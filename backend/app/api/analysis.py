@@ -1,29 +1,69 @@
 
+import asyncio
+import logging
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from app.services.orchestrator import orchestrate_analysis
 from app.services.ingestion import FULL_TEXT_DB
+from app.services.answer_cache import ANSWER_CACHE
+from app.services.filing_catalog import FILING_CATALOG
+from app.core.config import settings
+from app.core.memory import MEMORY, MemoryPressure
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class AnalysisRequest(BaseModel):
     company_id: str
     question: str
 
+NO_CONTEXT = "The user has not uploaded an annual report yet. Answer generally or ask them to upload."
+MAX_CONTEXT_CHARS = 500000
+
+def has_context(company_id: str) -> bool:
+    return company_id in FULL_TEXT_DB or bool(FILING_CATALOG.company_filings(company_id))
+
+def retrieve_context(company_id: str, question: str | None = None) -> str:
+    """
+    Filing text the chat answers from (capped at MAX_CONTEXT_CHARS). With a question, only the cataloged
+    filings for the periods and document types it names are read; otherwise the last processed upload.
+    """
+    if question:
+        context = FILING_CATALOG.context(company_id, question, MAX_CONTEXT_CHARS)
+        if context:
+            return context
+    context = FULL_TEXT_DB.get(company_id)
+    if not context:
+        logger.info("Context not found", extra={"company_id": company_id})
+        # Fallback if no upload yet
+        return NO_CONTEXT
+    logger.info("Context found", extra={"company_id": company_id, "context_chars": len(context)})
+    return context[:MAX_CONTEXT_CHARS]
+
 @router.post("/analyze")
 async def analyze_company(request: AnalysisRequest):
-    print(f"Analyzing for: {request.company_id}")
-    print(f"Available keys in DB: {list(FULL_TEXT_DB.keys())}")
+    # Semantic answer cache: a close enough earlier question about the same filings skips both LLM calls
+    loaded = has_context(request.company_id) # Also picks up a catalog re-indexed on disk, resetting the cache
+    embedding, version, scope = None, ANSWER_CACHE.version(request.company_id), ()
+    if settings.ANSWER_CACHE_ENABLED and loaded:
+        scope = await asyncio.to_thread(FILING_CATALOG.answer_scope, request.company_id, request.question)
+        cached, embedding = await ANSWER_CACHE.lookup(request.company_id, request.question, scope)
+        if cached:
+            logger.info("Answered from cache", extra={"company_id": request.company_id, "similarity": cached["similarity"]})
+            return {"analysis": cached["answer"], "cached": True, "similar_question": cached["question"], "similarity": cached["similarity"]}
+
+    # Admission gate: at most MAX_CHAT_REQUESTS at once, and none while over MEMORY_BUDGET_MB
+    try:
+        async with MEMORY.chat_slot():
+            return await answer_question(request, embedding, version, scope)
+    except MemoryPressure as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+async def answer_question(request: AnalysisRequest, embedding: list | None = None, version: int = 0, scope: tuple = ()):
+    logger.info("Analyze request", extra={"company_id": request.company_id, "loaded_companies": list(FULL_TEXT_DB.keys())})
     
     # 1. Retrieve Context
-    context = FULL_TEXT_DB.get(request.company_id)
-    
-    if not context:
-        print("Context not found in DB")
-        # Fallback if no upload yet
-        context = "The user has not uploaded an annual report yet. Answer generally or ask them to upload."
-    else:
-        print(f"Context found. Length: {len(context)}")
+    context = await asyncio.to_thread(retrieve_context, request.company_id, request.question)
 
     try:
         # The orchestrator is designed to take (company_id, context) usually
@@ -65,19 +105,19 @@ async def analyze_company(request: AnalysisRequest):
 
         --------------
         ANNUAL REPORT CONTEXT:
-        {context[:500000]} 
+        {context} 
         --------------
 
         ANSWER:
         """
         # 1. Generate Draft Analysis
-        print(f"Generating draft analysis for question: {request.question}")
-        draft_response = await generate_content(prompt)
-        print("Draft analysis generated.")
+        logger.info("Generating draft analysis", extra={"company_id": request.company_id, "question": request.question})
+        draft_response = await generate_content(prompt, site="analyze.draft")
+        logger.info("Draft analysis generated")
         
         # 2. Quality Control & Formatting (The Reviewer Agent)
         try:
-            print("Starting Quality Control (Reviewer Agent)...")
+            logger.info("Starting reviewer agent")
             review_prompt = f"""
             You are a Senior Editor and Quality Control Specialist.
             Your task is to polish the "DRAFT ANSWER" provided by a junior analyst.
@@ -101,16 +141,28 @@ async def analyze_company(request: AnalysisRequest):
             FINAL POLISHED OUTPUT:
             """
             
-            final_response = await generate_content(review_prompt)
-            print("Reviewer Agent finished.")
-            return {"analysis": final_response}
+            final_response = await generate_content(review_prompt, site="analyze.review")
+            logger.info("Reviewer agent finished")
+            ANSWER_CACHE.store(request.company_id, request.question, embedding, final_response, version, scope)
+            return {"analysis": final_response, "cached": False}
             
         except Exception as review_error:
-            print(f"Reviewer Agent failed: {str(review_error)}. Returning draft response.")
+            logger.warning("Reviewer agent failed, returning draft", extra={"error": str(review_error)})
             # Fallback to draft if verification fails (latency/error)
             # Append a small note so we know it wasn't reviewed
             fallback = draft_response + "\n\n*(Note: Automated quality check skipped due to processing timeout)*"
-            return {"analysis": fallback}
+            return {"analysis": fallback, "cached": False}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analyze/cache/stats")
+def get_answer_cache_stats():
+    """Hit rate, entries and filings version per company for the chat answer cache."""
+    return ANSWER_CACHE.stats()
+
+@router.get("/llm/queue")
+def get_llm_queue_stats():
+    """Queue depth and wait times per LLM priority class (interactive vs batch)."""
+    from app.services.gemini import dispatcher
+    return dispatcher.stats()
@@ -0,0 +1,117 @@
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from app.api.metrics import CACHE, normalize_symbol, run_blocking, load_snapshot, build_ratios
+from app.services.financials import compute_panel, cagr
+from app.services.price_store import PERIOD_DAYS
+from app.services.market_data import market_data
+from app.core.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_WATCHLIST = 50
+
+class CompareRequest(BaseModel):
+    tickers: list[str]
+    period: str = "1y"
+
+def download_closes(symbols: list[str], period: str) -> pd.DataFrame:
+    """One bulk yfinance download for the whole watchlist -> DataFrame of closes, one column per symbol."""
+    data = market_data().download(symbols, period)
+    if data is None or data.empty:
+        return pd.DataFrame(columns=symbols)
+    closes = data["Close"]
+    if isinstance(closes, pd.Series): # Single ticker without a ticker column level
+        closes = closes.to_frame(symbols[0])
+    return closes
+
+async def load_closes(symbols: list[str], period: str) -> pd.DataFrame:
+    key = ",".join(sorted(symbols))
+    try:
+        return await CACHE.get(key, f"download:{period}", lambda: run_blocking(download_closes, symbols, period))
+    except Exception as e:
+        logger.warning("Bulk price download failed", extra={"symbols": key, "error": str(e)})
+        return pd.DataFrame(columns=symbols)
+
+async def load_fundamentals(company_id: str):
+    try:
+        return await load_snapshot(company_id, ("financials", "balance_sheet", "info"))
+    except Exception as e:
+        logger.warning("Compare: fundamentals failed", extra={"symbol": company_id, "error": str(e)})
+        return None
+
+def panel_row(panel: pd.DataFrame, symbol: str, metric: str, years: list) -> list:
+    if (symbol, metric) not in panel.index:
+        return [None] * len(years)
+    row = panel.loc[(symbol, metric)].reindex(years).round(1)
+    return [None if pd.isna(v) else float(v) for v in row.tolist()]
+
+@router.post("/companies/compare")
+async def compare_companies(request: CompareRequest):
+    """
+    Side-by-side prices, ratios and revenue/EBIT/RoE trends for a watchlist.
+    Prices come from a single bulk download; statements and info go through the shared per-ticker cache.
+    """
+    if request.period not in PERIOD_DAYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period '{request.period}'. Use one of: {', '.join(PERIOD_DAYS)}")
+
+    # Normalize (.NS/.BO suffixing, legacy aliases) and de-duplicate while keeping order
+    symbols = list(dict.fromkeys(normalize_symbol(t.strip()) for t in request.tickers if t and t.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers given.")
+    if len(symbols) > MAX_WATCHLIST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_WATCHLIST} tickers per request.")
+
+    closes, *snapshots = await asyncio.gather(
+        load_closes(symbols, request.period),
+        *[load_fundamentals(symbol) for symbol in symbols],
+    )
+
+    # Price change over the window for every ticker at once
+    last = closes.ffill().iloc[-1] if not closes.empty else pd.Series(dtype=float)
+    first = closes.bfill().iloc[0] if not closes.empty else pd.Series(dtype=float)
+    # A zero or missing first close has no meaningful change (and would divide into inf)
+    change_pct = ((last / first.where(first > 0)) - 1) * 100
+
+    # Trends and ratios for the whole watchlist in one vectorized pass
+    loaded = {symbol: snapshot for symbol, snapshot in zip(symbols, snapshots) if snapshot is not None}
+    panel = compute_panel(
+        {symbol: (s.financials, s.cashflow, s.balance_sheet) for symbol, s in loaded.items()},
+        {symbol: s.fx_rate for symbol, s in loaded.items()},
+    )
+    year_axis = [str(y) for y in panel.columns]
+    growth = cagr(panel.xs("revenue", level="metric")) if not panel.empty else pd.Series(dtype=float)
+
+    companies = []
+    for symbol in symbols:
+        snapshot = loaded.get(symbol)
+        price = last.get(symbol)
+        change = change_pct.get(symbol)
+        revenue_cagr = growth.get(symbol)
+        companies.append({
+            "ticker": symbol,
+            "name": snapshot.info.get("longName", symbol) if snapshot else symbol,
+            "price": round(float(price), 2) if price is not None and pd.notna(price) else None,
+            "change_pct": round(float(change), 1) if change is not None and pd.notna(change) else None,
+            "ratios": build_ratios(snapshot) if snapshot else {},
+            "revenue": panel_row(panel, symbol, "revenue", year_axis),
+            "operating_profit": panel_row(panel, symbol, "operating_profit", year_axis),
+            "operating_margin": panel_row(panel, symbol, "operating_margin", year_axis),
+            "roe": panel_row(panel, symbol, "roe", year_axis),
+            "revenue_cagr": round(float(revenue_cagr), 1) if revenue_cagr is not None and pd.notna(revenue_cagr) else None,
+        })
+
+    return {
+        "meta": {"currency_symbol": "₹", "currency_unit": "Cr", "period": request.period},
+        "years": year_axis,
+        "companies": companies,
+        "citation": "Yahoo Finance",
+    }
@@ -0,0 +1,123 @@
+
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.api.metrics import (
+    SNAPSHOT_DATASETS, get_ticker, run_blocking, start_fetches, snapshot_from,
+    load_prices, load_extracted_summary, build_metrics, build_stock, build_news, build_status,
+)
+from app.services.downsample import downsample, RESOLUTIONS
+from app.services.price_store import PERIOD_DAYS
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("status", "metrics", "stock", "news")
+
+def dashboard_sections(company_id: str, period: str, resolution: str, max_points: int | None) -> tuple[dict, dict]:
+    """
+    One coroutine per dashboard section, plus the shared upstream fetch tasks they read from
+    (one yfinance Ticker, each dataset requested once), so e.g. `info` serves both metrics and stock.
+    """
+    ticker = get_ticker(company_id)
+    fetches = start_fetches(ticker, SNAPSHOT_DATASETS + ("news",))
+
+    async def metrics():
+        snapshot, summary = await asyncio.gather(
+            snapshot_from(ticker, fetches),
+            run_blocking(load_extracted_summary, company_id),
+        )
+        return build_metrics(snapshot, company_id, summary)
+
+    async def stock():
+        (dates, closes), info = await asyncio.gather(load_prices(ticker, period), fetches["info"])
+        dates, closes = downsample(dates, closes, max_points, resolution)
+        return build_stock(ticker.ticker, dates, closes, info)
+
+    async def news():
+        return build_news(await fetches["news"])
+
+    async def status():
+        return await run_blocking(build_status, company_id)
+
+    return {"status": status(), "metrics": metrics(), "stock": stock(), "news": news()}, fetches
+
+async def run_sections(sections: dict, timeout: float):
+    """Yields (section, data, error) in completion order; sections still running at the deadline yield a timeout."""
+    loop = asyncio.get_running_loop()
+    tasks = {asyncio.create_task(coro): name for name, coro in sections.items()}
+    pending = set(tasks)
+    deadline = loop.time() + timeout
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    logger.warning("Dashboard section failed", extra={"section": tasks[task], "error": str(task.exception())})
+                    yield tasks[task], None, "error"
+                else:
+                    yield tasks[task], task.result(), None
+        for task in pending:
+            yield tasks[task], None, "timeout"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.get("/company/{company_id}/dashboard")
+async def get_company_dashboard(
+    company_id: str,
+    stream: bool = False,
+    period: str = "1y",
+    resolution: str = "daily",
+    max_points: int | None = Query(None, ge=3, le=10000),
+    timeout: float | None = Query(None, gt=0, le=60),
+):
+    """
+    Status, metrics, stock and news for one company in a single request.
+    Sections that fail or miss the deadline come back as null and are listed in `incomplete`.
+    With stream=true the response is NDJSON, one {"section", "data"} line per section as it finishes.
+    """
+    if period not in PERIOD_DAYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period '{period}'. Use one of: {', '.join(PERIOD_DAYS)}")
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported resolution '{resolution}'. Use one of: {', '.join(RESOLUTIONS)}")
+
+    sections, fetches = dashboard_sections(company_id, period, resolution, max_points)
+    deadline = timeout or settings.DASHBOARD_TIMEOUT
+
+    def cancel_fetches():
+        # Upstream calls are shielded inside the cache, so this only drops our interest in them
+        for task in fetches.values():
+            task.cancel()
+
+    if stream:
+        async def ndjson():
+            incomplete = {}
+            try:
+                async for name, data, error in run_sections(sections, deadline):
+                    if error:
+                        incomplete[name] = error
+                    yield json.dumps({"section": name, "data": jsonable_encoder(data), "error": error}) + "\n"
+                yield json.dumps({"section": "done", "incomplete": incomplete}) + "\n"
+            finally:
+                cancel_fetches()
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    result = {name: None for name in SECTIONS}
+    incomplete = {}
+    try:
+        async for name, data, error in run_sections(sections, deadline):
+            result[name] = data
+            if error:
+                incomplete[name] = error
+    finally:
+        cancel_fetches()
+    result["incomplete"] = incomplete
+    return result
@@ -0,0 +1,70 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from app.services.filing_catalog import FILING_CATALOG, period_label
+from app.services.transcripts import TRANSCRIPTS
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+PUBLIC_FIELDS = ("key", "title", "period", "fiscal_year", "quarter", "doc_type", "doc_label", "currency", "pages", "chars", "indexed_at")
+TURN_FIELDS = ("n", "speaker", "role", "title", "firm", "section", "exchange", "page", "text")
+TURN_ROLES = ("management", "analyst")
+
+def filing_view(entry: dict) -> dict:
+    return {field: entry.get(field) for field in PUBLIC_FIELDS}
+
+@router.get("/company/{company_id}/filings")
+def list_filings(company_id: str, fiscal_year: str | None = None, quarter: int | None = None, doc_type: str | None = None):
+    """The company's filing catalog, oldest period first; filter by fiscal_year ("2021-22"), quarter and doc_type."""
+    filings = sorted(FILING_CATALOG.company_filings(company_id).values(), key=lambda f: (f["fy"] or 0, f["quarter"] or 0, f["title"]))
+    if fiscal_year:
+        filings = [f for f in filings if f["fiscal_year"] == fiscal_year]
+    if quarter:
+        filings = [f for f in filings if f["quarter"] == quarter]
+    if doc_type:
+        filings = [f for f in filings if f["doc_type"] == doc_type]
+    return {"company_id": company_id, "count": len(filings), "filings": [filing_view(f) for f in filings]}
+
+@router.get("/company/{company_id}/filings/select")
+def preview_selection(company_id: str, question: str):
+    """Which filings /analyze would read for `question` (periods, document types, currency it names)."""
+    if not FILING_CATALOG.company_filings(company_id):
+        raise HTTPException(status_code=404, detail="No cataloged filings for this company.")
+    selected, query = FILING_CATALOG.select(company_id, question)
+    return {
+        "company_id": company_id,
+        "question": question,
+        "periods": [period_label(fy, q) or f"Q{q}" for fy, q in query["periods"]],
+        "doc_types": query["doc_types"],
+        "currency": query["currency"],
+        "period_found": query["period_found"],
+        "filings": [filing_view(f) for f in selected],
+        "chars": sum(f["chars"] for f in selected),
+    }
+
+@router.get("/company/{company_id}/transcripts/turns")
+def transcript_turns(company_id: str, question: str, speaker: str | None = None, role: str | None = None, limit: int | None = None):
+    """
+    Earnings call turns /analyze would read for `question`, in call order: speaker, role, title or firm,
+    section and Q&A exchange, page. `speaker` (a name or CEO/CFO/...) and `role` (management, analyst) narrow further.
+    """
+    if role and role not in TURN_ROLES:
+        raise HTTPException(status_code=422, detail=f"role must be one of {', '.join(TURN_ROLES)}")
+    selected, query = FILING_CATALOG.select(company_id, question, doc_types=["transcript"])
+    calls = [(f, TRANSCRIPTS.turns(company_id, f, FILING_CATALOG.text(company_id, f["key"]))) for f in selected if f["doc_type"] == "transcript"]
+    if not calls:
+        raise HTTPException(status_code=404, detail="No cataloged call transcripts for this company.")
+    hits, wanted = TRANSCRIPTS.search(question, calls, max_turns=limit, speaker=speaker, role=role)
+    hits.sort(key=lambda hit: (hit[0]["fy"] or 0, hit[0]["quarter"] or 0, hit[1]["n"]))
+    return {
+        "company_id": company_id,
+        "question": question,
+        "periods": [period_label(fy, q) or f"Q{q}" for fy, q in query["periods"]],
+        "period_found": query["period_found"],
+        "speakers": sorted(wanted["titles"] | wanted["names"] | wanted["roles"]),
+        "calls": [filing_view(f) for f, _ in calls],
+        "turns": [
+            {"filing": f["key"], "period": f["period"], **{field: turn[field] for field in TURN_FIELDS}, "score": round(score, 3)}
+            for f, turn, score in hits
+        ],
+    }
@@ -1,12 +1,214 @@
 
-import yfinance as yf
-import pandas as pd
-from fastapi import APIRouter
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.telemetry import UPSTREAM_SECONDS, REGISTRY
+from app.services.price_store import PriceStore, PERIOD_DAYS
+from app.services.downsample import downsample, RESOLUTIONS
+from app.services.financials import CRORE, compute_metrics, cagr, to_points
+from app.services.market_data import market_data
+
+pd = lazy_import("pandas")
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-def get_ticker(company_id: str):
+# yfinance is blocking (HTTP under the hood), so every upstream call runs in this bounded pool
+# instead of on the event loop. A timed-out call keeps its worker until yfinance returns,
+# the pool size caps how many of those can pile up.
+YF_EXECUTOR = ThreadPoolExecutor(max_workers=settings.YF_MAX_WORKERS, thread_name_prefix="yfinance")
+
+async def run_blocking(func, *args, timeout: float | None = None):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(YF_EXECUTOR, func, *args), timeout or settings.YF_TIMEOUT)
+
+# Freshness per dataset: statements change quarterly, quotes intraday, news a few times an hour
+DATASET_TTLS = {
+    "financials": settings.CACHE_TTL_STATEMENTS,
+    "cashflow": settings.CACHE_TTL_STATEMENTS,
+    "balance_sheet": settings.CACHE_TTL_STATEMENTS,
+    "major_holders": settings.CACHE_TTL_STATEMENTS,
+    "info": settings.CACHE_TTL_QUOTES,
+    "news": settings.CACHE_TTL_NEWS,
+    "download": settings.CACHE_TTL_QUOTES,
+}
+
+# How long past its TTL an entry may still be served: a day for statements, seconds for quotes
+DATASET_MAX_STALE = {
+    "financials": settings.CACHE_MAX_STALE_STATEMENTS,
+    "cashflow": settings.CACHE_MAX_STALE_STATEMENTS,
+    "balance_sheet": settings.CACHE_MAX_STALE_STATEMENTS,
+    "major_holders": settings.CACHE_MAX_STALE_STATEMENTS,
+    "info": settings.CACHE_MAX_STALE_QUOTES,
+    "news": settings.CACHE_MAX_STALE_NEWS,
+    "download": settings.CACHE_MAX_STALE_QUOTES,
+}
+
+def is_empty(value) -> bool:
+    """yfinance signals most upstream failures with an empty frame / dict / list rather than an exception."""
+    if value is None:
+        return True
+    empty = getattr(value, "empty", None)
+    if isinstance(empty, bool):
+        return empty
+    return isinstance(value, (dict, list, tuple)) and not value
+
+class DatasetCache:
+    """
+    Per-ticker, per-dataset cache for upstream market data.
+    - Fresh entries (age < TTL) are served directly.
+    - Stale entries (age < TTL + max_stale, both per dataset) are served immediately while one background refresh runs.
+    - Concurrent misses for the same key share a single upstream fetch.
+    Failed fetches and empty results are never cached.
+    """
+
+    def __init__(self, ttls: dict, max_stale: dict, max_entries: int):
+        self.ttls = ttls
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # (symbol, dataset) -> (value, fetched_at)
+        self._inflight = {} # (symbol, dataset) -> asyncio.Task
+        self._stats = {}
+
+    def _count(self, dataset: str, event: str):
+        kind = dataset.split(":", 1)[0]
+        stats = self._stats.setdefault(kind, {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "errors": 0})
+        stats[event] += 1
+
+    def _ttl(self, dataset: str) -> int:
+        return self.ttls.get(dataset.split(":", 1)[0], settings.CACHE_TTL_QUOTES)
+
+    def _max_stale(self, dataset: str) -> int:
+        return self.max_stale.get(dataset.split(":", 1)[0], settings.CACHE_MAX_STALE_QUOTES)
+
+    async def get(self, symbol: str, dataset: str, loader):
+        key = (symbol, dataset)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            ttl = self._ttl(dataset)
+            if age < ttl:
+                self._count(dataset, "hits")
+                self._entries.move_to_end(key)
+                return value
+            if age < ttl + self._max_stale(dataset):
+                self._count(dataset, "stale")
+                self._refresh(key, loader)
+                return value
+
+        if key in self._inflight:
+            self._count(dataset, "coalesced")
+        else:
+            self._count(dataset, "misses")
+        # Shield so a client disconnect doesn't cancel the fetch other waiters depend on
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def _refresh(self, key, loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            # Background refreshes may have no awaiter, so always retrieve the exception
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key, loader):
+        kind = key[1].split(":", 1)[0]
+        start = time.perf_counter()
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._count(key[1], "errors")
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, source=market_data().name, dataset=kind, outcome=outcome)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if is_empty(value):
+            # Returned to the callers waiting on it, but the next lookup asks upstream again
+            self._count(key[1], "errors")
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, source=market_data().name, dataset=kind, outcome="empty")
+            return value
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, source=market_data().name, dataset=kind, outcome="ok")
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        report = {"entries": len(self._entries), "datasets": {}}
+        for kind, stats in self._stats.items():
+            lookups = stats["hits"] + stats["stale"] + stats["misses"] + stats["coalesced"]
+            served_from_cache = stats["hits"] + stats["stale"]
+            report["datasets"][kind] = {**stats, "hit_rate": round(served_from_cache / lookups, 3) if lookups else 0.0}
+        return report
+
+CACHE = DatasetCache(DATASET_TTLS, DATASET_MAX_STALE, settings.CACHE_MAX_ENTRIES)
+
+@REGISTRY.register_collector
+def market_cache_metrics():
+    stats = CACHE.stats()
+    lookups = [
+        ({"dataset": kind, "result": event}, counts[event])
+        for kind, counts in stats["datasets"].items()
+        for event in ("hits", "stale", "misses", "coalesced", "errors")
+    ]
+    return [
+        ("market_cache_lookups_total", "counter", "Market data cache lookups by result", lookups),
+        ("market_cache_hit_ratio", "gauge", "Share of lookups served from cache (fresh or stale)",
+         [({"dataset": kind}, counts["hit_rate"]) for kind, counts in stats["datasets"].items()]),
+        ("market_cache_entries", "gauge", "Cached upstream datasets", [({}, stats["entries"])]),
+    ]
+
+async def fetch_dataset(ticker, name: str, default=None):
+    """Reads one yfinance Ticker attribute (financials, info, news...) through the cache, off the event loop."""
+    try:
+        return await CACHE.get(ticker.ticker, name, lambda: run_blocking(getattr, ticker, name))
+    except asyncio.TimeoutError:
+        logger.warning("yfinance timed out", extra={"dataset": name, "symbol": ticker.ticker, "timeout_s": settings.YF_TIMEOUT})
+    except Exception as e:
+        logger.warning("yfinance failed", extra={"dataset": name, "symbol": ticker.ticker, "error": str(e)})
+    return default
+
+# Daily closes are served from the local store; upstream is only asked for missing bars,
+# at most once per quote TTL
+PRICE_STORE = PriceStore(settings.PRICE_STORE_DIR, refresh_seconds=settings.CACHE_TTL_QUOTES)
+
+async def load_prices(ticker, period: str = "1y"):
+    """Columnar (dates, closes). Falls back to the local copy if the upstream sync is too slow."""
+    start = time.perf_counter()
+    try:
+        result = await run_blocking(PRICE_STORE.load, ticker.ticker, period, ticker.history)
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, source="price_store", dataset="history", outcome="ok")
+        return result
+    except asyncio.TimeoutError:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, source="price_store", dataset="history", outcome="timeout")
+        logger.warning("Price sync timed out, serving local bars", extra={"symbol": ticker.ticker})
+        return await run_blocking(PRICE_STORE.read, ticker.ticker, period)
+
+def load_extracted_summary(company_id: str):
+    try:
+        metrics_path = Path("uploads") / company_id / "metrics.json"
+        if metrics_path.exists():
+            with open(metrics_path, "r") as f:
+                return json.load(f).get("summary")
+    except: pass
+    return None
+
+def normalize_symbol(company_id: str) -> str:
     ticker_symbol = company_id.upper()
     # If it's a common name, map it (Legacy) - but now rely on upload detection mainly
     if ticker_symbol == "TCS": ticker_symbol = "TCS.NS"
@@ -17,243 +219,297 @@ def get_ticker(company_id: str):
     if not ticker_symbol.endswith(".NS") and not ticker_symbol.endswith(".BO"):
          ticker_symbol += ".NS"
          
-    return yf.Ticker(ticker_symbol)
+    return ticker_symbol
 
-@router.get("/company/{company_id}/metrics")
-def get_company_metrics(company_id: str, t: int = 0):
-    # Retrieve financial metrics using yfinance (Synchronous)
+def get_ticker(company_id: str):
+    """yfinance Ticker, or its replay stand-in, depending on MARKET_DATA_PROVIDER."""
+    return market_data().ticker(normalize_symbol(company_id))
+
+# Chart Scaling Content:
+# Yahoo Finance usually returns values in absolute units (e.g., USD).
+# To display in Crores (1 Crore = 10^7), we divide by 10,000,000 (see app.services.financials.CRORE).
+# If Yahoo were to return values in thousands, the scale would need adjustment (e.g., 10^4 for Crores).
+USD_INR_RATE = 85.0 # Approx rate
+
+SNAPSHOT_DATASETS = ("financials", "cashflow", "balance_sheet", "info", "major_holders")
+
+@dataclass
+class TickerSnapshot:
+    """
+    Upstream data for one ticker, loaded once per request and shared by every metric builder.
+    The currency/FX decision is made here so builders never touch yfinance themselves.
+    """
+    ticker: object # yf.Ticker or a fixture replay (app.services.market_data)
+    info: dict = field(default_factory=dict)
+    financials: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
+    cashflow: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
+    balance_sheet: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
+    major_holders: pd.DataFrame = field(default_factory=lambda: pd.DataFrame())
+    currency: str = field(init=False)
+    fx_rate: float = field(init=False)
+
+    def __post_init__(self):
+        self.info = self.info or {}
+        # Currency Conversion (USD to INR fix)
+        # Some Indian tickers on Yahoo return USD financials. We must convert.
+        self.currency = self.info.get("currency", "INR")
+        self.fx_rate = USD_INR_RATE if self.currency == "USD" else 1.0
+
+    @property
+    def symbol(self) -> str:
+        return self.ticker.ticker
+
+    def link(self, suffix: str = "") -> str:
+        base = f"https://finance.yahoo.com/quote/{self.symbol}"
+        return f"{base}/{suffix}" if suffix else base
+
+DATASET_DEFAULTS = {"info": {}, "news": []}
+
+def start_fetches(ticker, datasets) -> dict:
+    """Kicks off (cached) upstream fetches as tasks so several consumers can share them."""
+    return {name: asyncio.create_task(fetch_dataset(ticker, name, DATASET_DEFAULTS.get(name, pd.DataFrame()))) for name in datasets}
+
+async def snapshot_from(ticker, fetches: dict, datasets=SNAPSHOT_DATASETS) -> TickerSnapshot:
+    values = await asyncio.gather(*[fetches[name] for name in datasets])
+    return TickerSnapshot(ticker=ticker, **dict(zip(datasets, values)))
+
+async def load_snapshot(company_id: str, datasets=SNAPSHOT_DATASETS) -> TickerSnapshot:
+    """One round of (cached, concurrent) upstream calls for everything the request needs."""
+    ticker = get_ticker(company_id)
+    return await snapshot_from(ticker, start_fetches(ticker, datasets), datasets)
+
+def build_statement_metrics(snapshot: TickerSnapshot) -> pd.DataFrame:
+    """Every trend and derived ratio for the snapshot in one vectorized pass (metric x fiscal year)."""
+    if logger.isEnabledFor(logging.DEBUG) and "Total Revenue" in snapshot.financials.index:
+        logger.debug("%s raw Total Revenue: %r [currency=%s, fx=%s]", snapshot.symbol, snapshot.financials.loc["Total Revenue"].iloc[0], snapshot.currency, snapshot.fx_rate)
+    return compute_metrics(snapshot.financials, snapshot.cashflow, snapshot.balance_sheet, snapshot.fx_rate, CRORE)
+
+def build_roe(snapshot: TickerSnapshot, frame: pd.DataFrame) -> list:
+    # RoE (Calculated or Fallback)
+    roe_data = to_points(frame, "roe")
+    inf = snapshot.info
+    if not roe_data and inf.get('returnOnEquity'):
+         roe_val = round(inf.get('returnOnEquity', 0) * 100, 1)
+         roe_data = [{"year": "TTM", "value": roe_val}]
+    return roe_data
+
+def build_holders(snapshot: TickerSnapshot):
+    inf = snapshot.info
+    holders_df = snapshot.major_holders
     try:
-        ticker = get_ticker(company_id)
-        
-        # Fetch Data
-        financials = ticker.financials
-        cashflow = ticker.cashflow
-        balance_sheet = ticker.balance_sheet
-        inf = ticker.info # Fetch info early for RoE fallback
-        
-        # Helper to extract trend
-        def get_trend(df, row_name, scale=10000000, link_suffix="financials"): 
-            link = f"https://finance.yahoo.com/quote/{ticker.ticker}/{link_suffix}"
-            if row_name not in df.index:
-                return [], link
-            series = df.loc[row_name].iloc[:4][::-1] 
-            
-            # Chart Scaling Content:
-            # Yahoo Finance usually returns values in absolute units (e.g., USD).
-            # To display in Crores (1 Crore = 10^7), we divide by 10,000,000.
-            # If Yahoo were to return values in thousands, the scale would need adjustment (e.g., 10^4 for Crores).
-            
-            # Currency Conversion (USD to INR fix) 
-            
-            # Currency Conversion (USD to INR fix)
-            # Some Indian tickers on Yahoo return USD financials. We must convert.
-            currency = "INR"
-            try:
-                currency = ticker.info.get("currency", "INR")
-            except: pass
-
-            fx_rate = 1.0
-            if currency == "USD":
-                fx_rate = 85.0 # Approx rate
-            
-            # DEBUG: Check raw values
-            if not series.empty:
-                 print(f"DEBUG RAW VALUES ({row_name}): {series.iloc[0]} (Type: {type(series.iloc[0])}) [Currency: {currency}]")
-            
-            # Apply FX rate and scale to Crores
-            series = (series * fx_rate) / scale
-            
-            data = []
-            for date, value in series.items():
-                if pd.isna(value): continue
-                year_label = date.strftime("FY%y") 
-                data.append({"year": year_label, "value": round(value, 1)}) # Value is already scaled
-            return data, link
+        # Parsing holders (Keys vary by region/version)
+        # Try efficient access or fallback
+        insiders = 0
+        institutions = 0
 
-        
-        # 1. Revenue
-        scale = 10000000 
-        revenue, rev_link = get_trend(financials, "Total Revenue", scale, "financials")
-        
-        # 2. EBIT
-        ebit_row = "EBIT" if "EBIT" in financials.index else "Operating Income"
-        operating_profit, ebit_link = get_trend(financials, ebit_row, scale, "financials")
-        
-        # 3. EPS
-        eps, eps_link = get_trend(financials, "Basic EPS", 1, "financials") 
-        
-        # 4. Operating Cash Flow
-        ocf, ocf_link = get_trend(cashflow, "Operating Cash Flow", scale, "cash-flow")
-        
-        # 5. RoE (Calculated or Fallback)
-        net_income = financials.loc["Net Income"] if "Net Income" in financials.index else financials.loc["Net Income Common Stockholders"]
-        equity = balance_sheet.loc["Stockholders Equity"] if "Stockholders Equity" in balance_sheet.index else \
-                 balance_sheet.loc["Total Equity Gross Minority Interest"] 
-        
-        roe_link = f"https://finance.yahoo.com/quote/{ticker.ticker}/key-statistics"         
-        roe_data = []
-        cols = net_income.index.intersection(equity.index)
-        sorted_cols = sorted(cols, reverse=True)[:4]
-        sorted_cols_osc = sorted_cols[::-1]
-        
-        for date in sorted_cols_osc:
-            ni = net_income[date]
-            eq = equity[date]
-            if eq != 0:
-                roe_val = (ni / eq) * 100
-                roe_data.append({"year": date.strftime("FY%y"), "value": round(roe_val, 1)})
-        
-        if not roe_data and inf.get('returnOnEquity'):
-             roe_val = round(inf.get('returnOnEquity', 0) * 100, 1)
-             roe_data = [{"year": "TTM", "value": roe_val}]
+        # holders_df might be dataframe 0/1 columns
+        if holders_df is not None and not holders_df.empty:
+           # Often rows are "Breakdown", "Value" or similar
+           # We'll trust mapped keys if available or defaults
+           pass
 
-        # 6. Major Holders
-        holders_data = []
-        comp_link = f"https://finance.yahoo.com/quote/{ticker.ticker}/holders"
-        try:
-            holders_df = ticker.major_holders
-            # Parsing holders (Keys vary by region/version)
-            # Try efficient access or fallback
-            insiders = 0
-            institutions = 0
-            
-            # holders_df might be dataframe 0/1 columns
-            if not holders_df.empty:
-               # Often rows are "Breakdown", "Value" or similar
-               # We'll trust mapped keys if available or defaults
-               pass 
-            
-            # Fallback to info for holders if DF is messy
-            insiders = inf.get('heldPercentInsiders', 0)
-            institutions = inf.get('heldPercentInstitutions', 0)
-            public = 1.0 - insiders - institutions
-            
-            holders_data = [
-                 {"name": "Promoters/Insiders", "value": round(insiders * 100, 1)},
-                 {"name": "Institutions", "value": round(institutions * 100, 1)},
-                 {"name": "Public/Others", "value": round(max(0, public * 100), 1)}
-            ]
-        except:
-             holders_data = [] 
-
-        # 7. Ratios Info
-        ratios = {
-            "P/E Ratio": round(inf.get('trailingPE', 0), 1),
-            "P/B Ratio": round(inf.get('priceToBook', 0), 1),
-            "Debt/Equity": round(inf.get('debtToEquity', 0), 1),
-            "RoE (Latest)": f"{round(inf.get('returnOnEquity', 0) * 100, 1)}%",
-            "Gross Margin": f"{round(inf.get('grossMargins', 0) * 100, 1)}%",
-            "Op Margin": f"{round(inf.get('operatingMargins', 0) * 100, 1)}%"
-        }
-        
-        # 8. Profile Data
-        profile = {
-            "name": inf.get('longName', company_id),
-            "ticker": ticker.ticker,
-            "description": inf.get('longBusinessSummary', 'No description available.'),
-            "industry": inf.get('industry', 'N/A'),
-            "sector": inf.get('sector', 'N/A'),
-            "website": inf.get('website', '#'),
-            "employees": inf.get('fullTimeEmployees', 'N/A'),
-            "founded": "N/A", # Yahoo often doesn't give founded date easily in 'info', can try 'start' or skip
-            "market_cap": inf.get('marketCap', 0),
-            "current_price": inf.get('currentPrice', 0) or inf.get('regularMarketPrice', 0),
-            "currency": inf.get('currency', 'INR')
-        }
+        # Fallback to info for holders if DF is messy
+        insiders = inf.get('heldPercentInsiders', 0)
+        institutions = inf.get('heldPercentInstitutions', 0)
+        public = 1.0 - insiders - institutions
 
-        # Check for extracted summary
-        from pathlib import Path
-        import json
-        extracted_summary = None
-        try:
-             metrics_path = Path("uploads") / company_id / "metrics.json"
-             if metrics_path.exists():
-                 with open(metrics_path, "r") as f:
-                     saved_metrics = json.load(f)
-                     extracted_summary = saved_metrics.get("summary")
-        except: pass
-        
-        if extracted_summary:
-            profile["extracted_summary"] = extracted_summary
+        holders_data = [
+             {"name": "Promoters/Insiders", "value": round(insiders * 100, 1)},
+             {"name": "Institutions", "value": round(institutions * 100, 1)},
+             {"name": "Public/Others", "value": round(max(0, public * 100), 1)}
+        ]
+    except:
+         holders_data = []
+    return holders_data, snapshot.link("holders")
+
+def build_ratios(snapshot: TickerSnapshot) -> dict:
+    inf = snapshot.info
+    return {
+        "P/E Ratio": round(inf.get('trailingPE', 0), 1),
+        "P/B Ratio": round(inf.get('priceToBook', 0), 1),
+        "Debt/Equity": round(inf.get('debtToEquity', 0), 1),
+        "RoE (Latest)": f"{round(inf.get('returnOnEquity', 0) * 100, 1)}%",
+        "Gross Margin": f"{round(inf.get('grossMargins', 0) * 100, 1)}%",
+        "Op Margin": f"{round(inf.get('operatingMargins', 0) * 100, 1)}%"
+    }
+
+def build_profile(snapshot: TickerSnapshot, company_id: str) -> dict:
+    inf = snapshot.info
+    return {
+        "name": inf.get('longName', company_id),
+        "ticker": snapshot.symbol,
+        "description": inf.get('longBusinessSummary', 'No description available.'),
+        "industry": inf.get('industry', 'N/A'),
+        "sector": inf.get('sector', 'N/A'),
+        "website": inf.get('website', '#'),
+        "employees": inf.get('fullTimeEmployees', 'N/A'),
+        "founded": "N/A", # Yahoo often doesn't give founded date easily in 'info', can try 'start' or skip
+        "market_cap": inf.get('marketCap', 0),
+        "current_price": inf.get('currentPrice', 0) or inf.get('regularMarketPrice', 0),
+        "currency": snapshot.currency
+    }
+
+def build_metrics(snapshot: TickerSnapshot, company_id: str, extracted_summary: str | None = None) -> dict:
+    frame = build_statement_metrics(snapshot)
 
+    # 1-4. Revenue, EBIT, EPS, Operating Cash Flow (Crores, EPS per share)
+    revenue = to_points(frame, "revenue")
+    operating_profit = to_points(frame, "operating_profit")
+    eps = to_points(frame, "eps")
+    ocf = to_points(frame, "cash_flow")
+
+    # 5. RoE
+    roe_data = build_roe(snapshot, frame)
+
+    # 6. Major Holders
+    holders_data, comp_link = build_holders(snapshot)
+
+    # 7. Ratios Info / 8. Profile Data
+    ratios = build_ratios(snapshot)
+    profile = build_profile(snapshot, company_id)
+
+    # Check for extracted summary
+    if extracted_summary:
+        profile["extracted_summary"] = extracted_summary
+
+    # 9. Derived ratios from the statements (margins, growth)
+    growth = cagr(frame.loc[["revenue", "operating_profit"]]) if not frame.empty else pd.Series(dtype=float)
+    derived = {
+        "operating_margin": to_points(frame, "operating_margin"),
+        "net_margin": to_points(frame, "net_margin"),
+        "revenue_yoy": to_points(frame, "revenue_yoy"),
+        "revenue_cagr": round(float(growth["revenue"]), 1) if pd.notna(growth.get("revenue")) else None,
+        "operating_profit_cagr": round(float(growth["operating_profit"]), 1) if pd.notna(growth.get("operating_profit")) else None,
+    }
+
+    financials_link = snapshot.link("financials")
+    return {
+        "meta": { "currency_symbol": "₹", "currency_unit": "Cr", "link": snapshot.link() },
+        "profile": profile,
+        "revenue": { "data": revenue, "citation": "Yahoo Finance", "link": financials_link },
+        "operating_profit": { "data": operating_profit, "citation": "Yahoo Finance", "link": financials_link },
+        "eps": { "data": eps, "citation": "Yahoo Finance", "link": financials_link },
+        "cash_flow": { "data": ocf, "citation": "Yahoo Finance", "link": snapshot.link("cash-flow") },
+        "roe": { "data": roe_data, "citation": "Yahoo Finance (Calc)", "link": snapshot.link("key-statistics") },
+        "composition": { "data": holders_data, "citation": "Yahoo Finance", "link": comp_link },
+        "ratios": ratios,
+        "derived": derived
+    }
+
+@router.get("/company/{company_id}/metrics")
+async def get_company_metrics(company_id: str, t: int = 0):
+    # Retrieve financial metrics using yfinance (one snapshot per request, datasets fetched concurrently)
+    try:
+        snapshot, extracted_summary = await asyncio.gather(
+            load_snapshot(company_id),
+            run_blocking(load_extracted_summary, company_id),
+        )
+        return build_metrics(snapshot, company_id, extracted_summary)
+    except Exception as e:
+        # An error status, not an empty 200, so browsers and CDNs don't cache the failure (see http_cache)
+        logger.exception("Metrics failed", extra={"company_id": company_id})
+        raise HTTPException(status_code=502, detail="Market data is unavailable, try again shortly.")
+
+def build_trading_info(info: dict | None):
+    try:
+        # print(f"DEBUG INFO: {info.get('currency', 'No Currency')}")
         return {
-            "meta": { "currency_symbol": "₹", "currency_unit": "Cr", "link": f"https://finance.yahoo.com/quote/{ticker.ticker}" },
-            "profile": profile,
-            "revenue": { "data": revenue, "citation": "Yahoo Finance", "link": rev_link },
-            "operating_profit": { "data": operating_profit, "citation": "Yahoo Finance", "link": ebit_link },
-            "eps": { "data": eps, "citation": "Yahoo Finance", "link": eps_link },
-            "cash_flow": { "data": ocf, "citation": "Yahoo Finance", "link": ocf_link },
-            "roe": { "data": roe_data, "citation": "Yahoo Finance (Calc)", "link": roe_link },
-            "composition": { "data": holders_data, "citation": "Yahoo Finance", "link": comp_link },
-            "ratios": ratios
+            "52_week_high": info.get("fiftyTwoWeekHigh"),
+            "52_week_low": info.get("fiftyTwoWeekLow"),
+            "volume": info.get("volume"),  # Current/Avg volume
+            "pe_ratio": info.get("trailingPE"),
+            "market_cap": info.get("marketCap"),
+            "beta": info.get("beta")
         }
     except Exception as e:
-        print(f"Metrics Error: {e}")
-        return {}
+        logger.warning("Trading info unavailable", extra={"error": str(e)})
+        return None
+
+def build_stock(symbol: str, dates: list, closes: list, info: dict | None, fmt: str = "rows") -> dict:
+    link = f"https://finance.yahoo.com/quote/{symbol}"
+    prices = [round(c, 2) for c in closes]
+    trading_info = build_trading_info(info)
+    if fmt == "columnar":
+        return {"dates": dates, "prices": prices, "citation": "Yahoo Finance API", "link": link, "info": trading_info}
+    data = [{"date": d, "price": p} for d, p in zip(dates, prices)]
+    return {"data": data, "citation": "Yahoo Finance API", "link": link, "info": trading_info}
 
 @router.get("/company/{company_id}/stock")
-async def get_stock_data(company_id: str):
+async def get_stock_data(
+    company_id: str,
+    period: str = "1y",
+    resolution: str = "daily",
+    max_points: int | None = Query(None, ge=3, le=10000),
+    fmt: str = Query("rows", alias="format"),
+):
+    """
+    Daily closes for `period`. `resolution` (daily/weekly/monthly) and `max_points` (LTTB) shrink
+    the series server-side; format=columnar returns parallel date/price arrays instead of row dicts.
+    """
+    if period not in PERIOD_DAYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period '{period}'. Use one of: {', '.join(PERIOD_DAYS)}")
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported resolution '{resolution}'. Use one of: {', '.join(RESOLUTIONS)}")
+    if fmt not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be 'rows' or 'columnar'")
     try:
         ticker = get_ticker(company_id)
-        hist = ticker.history(period="1y")
-        data = [{"date": d.strftime("%Y-%m-%d"), "price": round(r['Close'], 2)} for d, r in hist.iterrows()]
-        link = f"https://finance.yahoo.com/quote/{ticker.ticker}"
-        try:
-            info = ticker.info
-            # print(f"DEBUG INFO: {info.get('currency', 'No Currency')}")
-            trading_info = {
-                "52_week_high": info.get("fiftyTwoWeekHigh"),
-                "52_week_low": info.get("fiftyTwoWeekLow"),
-                "volume": info.get("volume"),  # Current/Avg volume
-                "pe_ratio": info.get("trailingPE"),
-                "market_cap": info.get("marketCap"),
-                "beta": info.get("beta")
-            }
-        except Exception as e:
-            print(f"Trading Info Error: {e}")
-            trading_info = None
-
-        return {"data": data, "citation": "Yahoo Finance API", "link": link, "info": trading_info}
+        (dates, closes), info = await asyncio.gather(
+            load_prices(ticker, period),
+            fetch_dataset(ticker, "info"),
+        )
+        dates, closes = downsample(dates, closes, max_points, resolution)
+        return build_stock(ticker.ticker, dates, closes, info, fmt)
     except Exception as e:
-        print(f"Stock Data Critical Error: {e}")
-        return {"data": [], "citation": "Unavailable"}
+        logger.exception("Stock data failed", extra={"company_id": company_id})
+        raise HTTPException(status_code=502, detail="Price data is unavailable, try again shortly.")
+
+def build_news(news: list) -> list:
+    processed_news = []
+    for n in (news or [])[:10]: # Valid request for 10
+         # Based on debug output, structure is: {'id': '...', 'content': {'title': '...', ...}}
+         # OR sometimes flat dicts. We handle both.
+         
+         data = n.get('content', n) # Try to get 'content' dict, else use n itself
+         
+         title = data.get('title', 'No Title')
+         publisher = data.get('provider', {}).get('displayName', 'Yahoo Finance') if isinstance(data.get('provider'), dict) else data.get('publisher', 'Yahoo Finance')
+         
+         # Link handling
+         clickThroughUrl = data.get('clickThroughUrl')
+         link = clickThroughUrl.get('url') if clickThroughUrl else data.get('link', '#')
+         # Date handling: Prefer timestamp (seconds), fallback to 0
+         pub_time = data.get('providerPublishTime', 0)
+         if not pub_time or pub_time == 0:
+              # Fallback: Sometimes it's directly in the dict
+              pub_time = n.get('providerPublishTime', 0)
+
+         processed_news.append({
+            "title": title,
+            "publisher": publisher,
+            "link": link,
+            "time": pub_time 
+        })
+    return processed_news
 
 @router.get("/company/{company_id}/news")
 async def get_company_news(company_id: str):
     try:
         ticker = get_ticker(company_id)
-        news = ticker.news
-        
-        processed_news = []
-        for n in news[:10]: # Valid request for 10
-             # Based on debug output, structure is: {'id': '...', 'content': {'title': '...', ...}}
-             # OR sometimes flat dicts. We handle both.
-             
-             data = n.get('content', n) # Try to get 'content' dict, else use n itself
-             
-             title = data.get('title', 'No Title')
-             publisher = data.get('provider', {}).get('displayName', 'Yahoo Finance') if isinstance(data.get('provider'), dict) else data.get('publisher', 'Yahoo Finance')
-             
-             # Link handling
-             clickThroughUrl = data.get('clickThroughUrl')
-             link = clickThroughUrl.get('url') if clickThroughUrl else data.get('link', '#')
-             # Date handling: Prefer timestamp (seconds), fallback to 0
-             pub_time = data.get('providerPublishTime', 0)
-             if not pub_time or pub_time == 0:
-                  # Fallback: Sometimes it's directly in the dict
-                  pub_time = n.get('providerPublishTime', 0)
-
-             processed_news.append({
-                "title": title,
-                "publisher": publisher,
-                "link": link,
-                "time": pub_time 
-            })
-            
-        return processed_news
+        news = await fetch_dataset(ticker, "news", [])
+        return build_news(news)
     except Exception as e:
-        print(f"News Error: {e}")
-        return []
+        logger.exception("News failed", extra={"company_id": company_id})
+        raise HTTPException(status_code=502, detail="News is unavailable, try again shortly.")
+
+def build_status(company_id: str) -> dict:
+    # File system is best because upload is in background task
+    metrics_path = Path("uploads") / company_id / "metrics.json"
+    
+    if metrics_path.exists():
+        return {"status": "ready", "company_id": company_id}
+        
+    return {"status": "processing", "company_id": company_id}
 
 @router.get("/company/{company_id}/status")
 def get_company_status(company_id: str):
@@ -263,12 +519,9 @@ def get_company_status(company_id: str):
     """
     # 1. Check in-memory DB (fastest)
     # Using a relative import hack or just relying on file system for simplicity/reliability across workers
-    # File system is best because upload is in background task
-    from pathlib import Path
-    
-    metrics_path = Path("uploads") / company_id / "metrics.json"
-    
-    if metrics_path.exists():
-        return {"status": "ready", "company_id": company_id}
-        
-    return {"status": "processing", "company_id": company_id}
+    return build_status(company_id)
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit rates of the market data cache per dataset."""
+    return CACHE.stats()
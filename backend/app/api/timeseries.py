@@ -0,0 +1,50 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from app.services.filing_catalog import parse_periods
+from app.services.timeseries import TIMESERIES
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _periods(text: str | None, name: str) -> list:
+    """(fy, quarter) pairs named in `text`; a bare fiscal year ("FY24") stands for its four quarters."""
+    periods = [(fy, q) for fy, quarter in parse_periods(text or "") if fy for q in ([quarter] if quarter else (1, 2, 3, 4))]
+    if text and not periods:
+        raise HTTPException(status_code=422, detail=f"{name}: expected quarters or fiscal years like 'Q2 FY22', 'FY24'")
+    return periods
+
+@router.get("/company/{company_id}/timeseries")
+def get_timeseries(company_id: str, metrics: str | None = None, periods: str | None = None,
+                   start: str | None = None, end: str | None = None):
+    """
+    Quarterly KPI arrays from the company's fact sheets and press releases, for charts and period comparisons (no LLM).
+    `metrics`: comma-separated names or prefixes ("headcount,attrition_ltm_pct", "vertical.*", "market.india.*");
+    `periods`: quarters to compare ("Q2 FY22, Q2 FY25"); `start` / `end`: range bounds ("Q1 FY23").
+    """
+    wanted = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else None
+    start_period, end_period = _periods(start, "start"), _periods(end, "end")
+    series = TIMESERIES.series(
+        company_id, wanted, periods=_periods(periods, "periods"),
+        start=start_period[0] if start_period else None, end=end_period[-1] if end_period else None,
+    )
+    if series is None:
+        raise HTTPException(status_code=404, detail="No cataloged fact sheets or press releases for this company.")
+    if wanted and not series["metrics"]:
+        raise HTTPException(status_code=404, detail=f"No series match {metrics!r}; see /company/{company_id}/timeseries/metrics.")
+    return series
+
+@router.get("/company/{company_id}/timeseries/metrics")
+def list_timeseries_metrics(company_id: str):
+    """Series available for the company with how many quarters each covers."""
+    table = TIMESERIES.get(company_id)
+    if table is None:
+        raise HTTPException(status_code=404, detail="No cataloged fact sheets or press releases for this company.")
+    return {
+        "company_id": company_id,
+        "periods": table["periods"],
+        "metrics": [
+            {"name": name, "label": m["label"], "unit": m["unit"], "group": m["group"],
+             "quarters": sum(v is not None for v in m["values"])}
+            for name, m in table["metrics"].items()
+        ],
+    }
@@ -1,81 +1,158 @@
 
-from fastapi import APIRouter, UploadFile, File, Form, Depends, BackgroundTasks, HTTPException
-from sqlalchemy.orm import Session
-from app.services.ingestion import save_upload_file, process_filing
-from app.models.schema import Filing, Company # Need a DB dependency helper
+import hashlib
+import logging
+import re
+import uuid
+from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException, Request
+from pydantic import BaseModel
 from app.core.config import settings
-# Mock DB dependency
-def get_db():
-    yield None 
+from app.services.uploads import (
+    INCOMING_DIR, JOBS, UPLOAD_SESSIONS, UploadTooLarge,
+    safe_filename, clean_company_id, write_stream, iter_upload_file,
+    create_job, job_view, run_upload_job,
+    create_session, session_view, append_chunk, finish_session,
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+def job_response(job: dict, created: bool) -> dict:
+    return {
+        "message": "File uploaded. Processing in background." if created else "Same file already uploaded.",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/v1/upload/jobs/{job['job_id']}",
+        "company_id": job["company_id"], # None until detection has run, unless it was given
+        "duplicate": not created,
+    }
+
+def company_or_422(company_id: str | None) -> str | None:
+    try:
+        return clean_company_id(company_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def start_job(background_tasks: BackgroundTasks, path, filename: str, sha256: str, size: int, company_id: str | None,
+              period: str | None = None) -> dict:
+    job, created = create_job(path, filename, sha256, size, company_id, period)
+    if created:
+        # Ticker detection, parsing and extraction all happen here, after the response is sent
+        background_tasks.add_task(run_upload_job, job["job_id"])
+    return job_response(job, created)
 
 @router.post("/upload")
 async def upload_filing(
-    background_tasks: BackgroundTasks, 
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     company_id: str | None = Form(None),
     period: str | None = Form(None)
 ):
-    print(f"DEBUG: Received upload request. File: {file.filename}, Company: {company_id}")
-    # 1. Identify Company (Optimized for Free Tier)
-    # Critical Optimization: Trust the user-provided company_id first to avoid heavy AI processing on upload
-    # This prevents timeouts (Vercel 10s limit) and OOMs (Render 512MB limit)
-    detected_company_id = None
-    
-    if company_id and company_id != "undefined" and len(company_id) > 2:
-        print(f"DEBUG: Using provided company_id: {company_id}")
-        detected_company_id = company_id
-    else:
-        # Fallback to AI only if absolutely necessary
-        try:
-            import pdfplumber
-            from app.services.gemini import generate_content
-            
-            # Read LESS pages (only 2) to save RAM
-            text_preview = ""
-            with pdfplumber.open(file.file) as pdf:
-                for page in pdf.pages[:2]: 
-                    text_preview += page.extract_text() or ""
-            
-            file.file.seek(0)
-            
-            if len(text_preview) > 50:
-                prompt = f"""Identify the NSE Ticker (e.g. INFY, TCS) from this text. Return JSON {{ "ticker": "SYMBOL" }}. Text: {text_preview[:1000]}"""
-                response = await generate_content(prompt)
-                # ... simple extract ...
-                 
-                import json, re
-                json_match = re.search(r"\{.*\}", response, re.DOTALL)
-                if json_match:
-                   detected_company_id = json.loads(json_match.group(0)).get("ticker")
-
-        except Exception as e:
-            print(f"AI Detection skipped/failed: {e}")
-            detected_company_id = None # Try filename next
-
-    if not detected_company_id or detected_company_id == "UNKNOWN":
-        # Fallback to Filename (remove extension, upper case)
-        # e.g. "airtle.pdf" -> "AIRTLE"
-        clean_name = file.filename.rsplit('.', 1)[0].upper().replace(" ", "_")
-        detected_company_id = clean_name
-        print(f"DEBUG: Fallback to filename: {detected_company_id}")
-
-    if not detected_company_id:
-        detected_company_id = "UNKNOWN_COMPANY"
-
-    # 2. Save file with DETECTED ID
+    """
+    Copies the upload to disk in UPLOAD_CHUNK_BYTES chunks (hashing and size-checking as it goes)
+    and returns a job handle right away. Nothing is parsed and no LLM is called in the request.
+    """
+    logger.info("Upload received", extra={"upload_filename": file.filename, "company_id": company_id})
+    company_id = company_or_422(company_id)
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > settings.MAX_UPLOAD_BYTES + 64 * 1024: # multipart overhead
+        raise HTTPException(status_code=413, detail=f"File too large (max {settings.MAX_UPLOAD_BYTES} bytes).")
+
+    filename = safe_filename(file.filename)
+    INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    path = INCOMING_DIR / f"{uuid.uuid4().hex}_{filename}"
+    hasher = hashlib.sha256()
     try:
-        file_path = save_upload_file(file, detected_company_id)
+        with open(path, "wb") as fh:
+            size = await write_stream(iter_upload_file(file), fh, hasher, settings.MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=413, detail=f"File too large (max {settings.MAX_UPLOAD_BYTES} bytes).")
     except Exception as e:
-        print(f"File Save Error: {e}")
+        path.unlink(missing_ok=True)
+        logger.error("File save failed", extra={"error": str(e)})
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-    
-    # 3. Trigger processing in BACKGROUND to prevent timeout
-    # Charts (Yahoo) will load immediately. Chatbot (PDF) will be ready in ~1 min.
+
+    return start_job(background_tasks, path, filename, hasher.hexdigest(), size, company_id, period or None)
+
+@router.get("/upload/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """queued -> detecting (no company given) -> processing -> done | failed."""
+    job = JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job_view(job)
+
+# --- Resumable uploads: create a session, PUT byte ranges (resume from `received`), then complete ---
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+    company_id: str | None = None
+    sha256: str | None = None
+    period: str | None = None # "Q2 FY22"; otherwise read from the file name and text
+
+def get_session(session_id: str) -> dict:
+    session = UPLOAD_SESSIONS.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Unknown or expired upload session.")
+    return session
+
+@router.post("/upload/sessions")
+def create_upload_session(body: UploadSessionRequest):
+    if body.size <= 0:
+        raise HTTPException(status_code=400, detail="size must be positive.")
+    if body.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {settings.MAX_UPLOAD_BYTES} bytes).")
+    company_id = company_or_422(body.company_id)
+    return session_view(create_session(body.filename, body.size, company_id, body.sha256, body.period))
+
+@router.get("/upload/sessions/{session_id}")
+def get_upload_session(session_id: str):
+    """Where to resume: `received` is the next byte offset the server expects."""
+    return session_view(get_session(session_id))
+
+@router.put("/upload/sessions/{session_id}")
+async def put_upload_chunk(session_id: str, request: Request):
+    """
+    Raw chunk body with `Content-Range: bytes start-end/total`; streamed straight to the partial file.
+    Without the header the chunk is appended at the current offset.
+    """
+    session = get_session(session_id)
+    start = session["received"]
+    content_range = request.headers.get("content-range")
+    if content_range:
+        match = CONTENT_RANGE_RE.fullmatch(content_range.strip())
+        if not match:
+            raise HTTPException(status_code=400, detail="Malformed Content-Range.")
+        start, end = int(match.group(1)), int(match.group(2))
+        if match.group(3) != "*" and int(match.group(3)) != session["size"]:
+            raise HTTPException(status_code=400, detail="Content-Range total does not match the session size.")
+        if end < session["received"]:
+            return session_view(session) # Already have this range (retry after a lost response)
+
+    if session["lock"].locked():
+        raise HTTPException(status_code=409, detail="Another chunk for this session is in flight.")
+    async with session["lock"]:
+        try:
+            await append_chunk(session, request.stream(), start)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail={"error": str(e), "received": session["received"]})
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="Chunk goes past the declared size.")
+    return session_view(session)
+
+@router.post("/upload/sessions/{session_id}/complete")
+def complete_upload_session(session_id: str, background_tasks: BackgroundTasks):
+    session = get_session(session_id)
+    if session["lock"].locked():
+        raise HTTPException(status_code=409, detail="A chunk is still being written.")
+    if session["received"] != session["size"]:
+        raise HTTPException(status_code=409, detail={"error": "Upload incomplete.", "received": session["received"], "size": session["size"]})
     try:
-        background_tasks.add_task(process_filing, file_path, detected_company_id, 1, None)
-    except Exception as e:
-        print(f"Background Task Error: {e}")
-    
-    return {"message": "File uploaded. Processing in background.", "company_id": detected_company_id, "path": str(file_path)}
+        path, sha256 = finish_session(session)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return start_job(background_tasks, path, session["filename"], sha256, session["size"], session["company_id"], session["period"])
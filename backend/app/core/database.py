@@ -0,0 +1,217 @@
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.core.telemetry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Async SQLAlchemy layer: one pooled engine per process, created on first use.
+# All DB work happens in background jobs (ingestion), which get a session through `session_scope`;
+# request handlers read from the catalog and in-memory stores and never hold a connection.
+# Sessions only check a connection out of the pool when they first execute something.
+
+_engine = None
+_sessionmaker = None
+_init_lock = None
+
+DB_STATE = {
+    "status": "pending", # pending | ok | unavailable | disabled
+    "error": None,
+    "next_probe": 0.0,
+}
+
+POOL_COUNTERS = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidated": 0}
+
+
+# create_all only creates missing tables, so columns added to existing ones are applied here.
+# Every statement is idempotent and runs on each startup, after create_all.
+SCHEMA_UPGRADES = (
+    "ALTER TABLE filings ADD COLUMN IF NOT EXISTS fiscal_year VARCHAR",
+    "ALTER TABLE filings ADD COLUMN IF NOT EXISTS quarter INTEGER",
+    "ALTER TABLE filings ADD COLUMN IF NOT EXISTS doc_type VARCHAR",
+    "ALTER TABLE filings ADD COLUMN IF NOT EXISTS currency VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_filings_company_period ON filings (company_id, fiscal_year, quarter, doc_type)",
+)
+
+
+def async_database_url(url: str) -> str:
+    """postgresql:// and postgresql+psycopg2:// URLs -> the asyncpg driver."""
+    for prefix in ("postgresql+psycopg2://", "postgresql+psycopg://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _count(name):
+    def listener(*args):
+        POOL_COUNTERS[name] += 1
+    return listener
+
+
+def get_engine():
+    global _engine, _sessionmaker
+    if _engine is None:
+        from sqlalchemy import event
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        _engine = create_async_engine(
+            async_database_url(settings.DATABASE_URL),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args={"timeout": settings.DB_CONNECT_TIMEOUT},
+        )
+        pool = _engine.sync_engine.pool
+        event.listen(pool, "connect", _count("connects"))
+        event.listen(pool, "checkout", _count("checkouts"))
+        event.listen(pool, "checkin", _count("checkins"))
+        event.listen(pool, "invalidate", _count("invalidated"))
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    return _engine
+
+
+def get_sessionmaker():
+    get_engine()
+    return _sessionmaker
+
+
+async def ensure_db() -> bool:
+    """
+    Creates the pgvector extension and tables on first use. A failed probe is retried
+    after DB_RETRY_SECONDS instead of on every request, so a missing DB costs nothing per call.
+    """
+    global _init_lock
+    if DB_STATE["status"] == "ok":
+        return True
+    if not settings.DB_PERSIST:
+        DB_STATE["status"] = "disabled"
+        return False
+    if DB_STATE["status"] == "unavailable" and time.monotonic() < DB_STATE["next_probe"]:
+        return False
+
+    if _init_lock is None:
+        _init_lock = asyncio.Lock()
+    async with _init_lock:
+        if DB_STATE["status"] == "ok":
+            return True
+        if DB_STATE["status"] == "unavailable" and time.monotonic() < DB_STATE["next_probe"]:
+            return False
+        # Naive DB init for prototype
+        # In production use Alembic migrations
+        try:
+            from sqlalchemy import text
+            from app.models.schema import Base
+            async with get_engine().begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+                await conn.run_sync(Base.metadata.create_all)
+                for statement in SCHEMA_UPGRADES:
+                    await conn.execute(text(statement))
+            DB_STATE.update(status="ok", error=None)
+            logger.info("Database tables created")
+        except Exception as e:
+            DB_STATE.update(status="unavailable", error=str(e), next_probe=time.monotonic() + settings.DB_RETRY_SECONDS)
+            logger.warning("DB connection failed, running without persistence", extra={"error": str(e)})
+    return DB_STATE["status"] == "ok"
+
+
+@asynccontextmanager
+async def session_scope():
+    """Session for background work: commits on success, rolls back on error, None without a DB."""
+    if not await ensure_db():
+        yield None
+        return
+    async with get_sessionmaker()() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def create_filing(session, company_id: str, storage_path: str, period: str | None = None,
+                        filing_type: str | None = None, source_url: str | None = None,
+                        fiscal_year: str | None = None, quarter: int | None = None,
+                        doc_type: str | None = None, currency: str | None = None) -> int:
+    """Upserts the company row and inserts the filing; returns the new filing id."""
+    from sqlalchemy import insert
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from app.models.schema import Company, Filing
+
+    await session.execute(
+        pg_insert(Company).values(id=company_id, name=company_id).on_conflict_do_nothing(index_elements=["id"])
+    )
+    result = await session.execute(
+        insert(Filing).values(
+            company_id=company_id, storage_path=storage_path, period=period,
+            filing_type=filing_type, source_url=source_url,
+            fiscal_year=fiscal_year, quarter=quarter, doc_type=doc_type, currency=currency,
+        ).returning(Filing.id)
+    )
+    return result.scalar_one()
+
+
+async def bulk_insert_chunks(session, company_id: str, filing_id: int, chunks: list,
+                             embeddings: list | None = None, batch_size: int = 500) -> int:
+    """
+    Inserts chunk dicts ({"text", "metadata"}) as executemany batches (one round trip per batch,
+    not per row). `embeddings`, if given, lines up with `chunks`.
+    """
+    if not chunks:
+        return 0
+    from sqlalchemy import insert
+    from app.models.schema import DocumentChunk
+
+    rows = [
+        {
+            "company_id": company_id,
+            "filing_id": filing_id,
+            "content": chunk["text"],
+            "metadata_json": chunk.get("metadata"),
+            "embedding": embeddings[i] if embeddings else None,
+        }
+        for i, chunk in enumerate(chunks)
+        if chunk.get("text")
+    ]
+    for start in range(0, len(rows), batch_size):
+        await session.execute(insert(DocumentChunk), rows[start:start + batch_size])
+    return len(rows)
+
+
+async def dispose_engine():
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def pool_stats() -> dict:
+    stats = {"db": DB_STATE["status"], **POOL_COUNTERS}
+    if DB_STATE["error"]:
+        stats["error"] = DB_STATE["error"]
+    if _engine is not None:
+        pool = _engine.sync_engine.pool
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
+
+
+@REGISTRY.register_collector
+def pool_metrics():
+    stats = pool_stats()
+    families = [
+        ("db_available", "gauge", "1 if the database is reachable and initialized", [({}, 1 if stats["db"] == "ok" else 0)]),
+    ]
+    for key in ("connects", "checkouts", "checkins", "invalidated"):
+        families.append((f"db_pool_{key}_total", "counter", f"Pool {key} since start", [({}, stats[key])]))
+    for key in ("size", "checked_in", "checked_out", "overflow"):
+        if key in stats:
+            families.append((f"db_pool_{key}", "gauge", f"Pool {key.replace('_', ' ')}", [({}, stats[key])]))
+    return families
@@ -0,0 +1,188 @@
+
+import gzip
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError: # Optional: gzip only
+    brotli = None
+
+# Cache-Control per route (first match wins). Routes not listed get validators and compression
+# but no explicit freshness, so browsers always revalidate them.
+CACHE_POLICIES = [
+    (re.compile(r"^/api/v1/company/[^/]+/status$"), "no-cache"),
+    (re.compile(r"^/api/v1/company/[^/]+/dashboard$"), "no-cache"),
+    (re.compile(r"^/api/v1/company/[^/]+/(filings(/select)?|transcripts/turns|timeseries(/metrics)?)$"), "no-cache"),
+    (re.compile(r"^/api/v1/company/[^/]+/metrics$"), "public, max-age=300, stale-while-revalidate=3600"),
+    (re.compile(r"^/api/v1/company/[^/]+/stock$"), "public, max-age=30, stale-while-revalidate=120"),
+    (re.compile(r"^/api/v1/company/[^/]+/news$"), "public, max-age=300, stale-while-revalidate=600"),
+    (re.compile(r"^/api/v1/(cache/stats|llm/queue|analyze/cache/stats)$"), "no-store"),
+    (re.compile(r"^/(health|metrics|memory|db/stats)$"), "no-store"),
+]
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson", "application/javascript")
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def cache_policy(path: str):
+    for pattern, policy in CACHE_POLICIES:
+        if pattern.match(path):
+            return policy
+    return None
+
+
+def _etag_base(etag: str) -> str:
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    etag = etag.strip('"')
+    for suffix in ETAG_SUFFIXES.values():
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)]
+    return etag
+
+
+def _accepted_encoding(accept_encoding: str):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class HTTPCacheMiddleware:
+    """
+    Pure ASGI middleware for buffered (non-streaming) responses:
+    - strong ETag from a hash of the payload, Last-Modified from when that payload was first seen
+    - 304 Not Modified for matching If-None-Match / If-Modified-Since on GET
+    - per-route Cache-Control (CACHE_POLICIES)
+    - br/gzip compression above `minimum_size` bytes
+    Streaming responses (e.g. NDJSON dashboard) are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, max_tracked: int = 4096):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.max_tracked = max_tracked
+        self._first_seen = OrderedDict() # url -> (etag base, unix time first served)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def buffered_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                if message.get("more_body") and not body_parts:
+                    # Streaming response: don't buffer, send as-is
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                body_parts.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    await self._finish(scope, request_headers, start_message, b"".join(body_parts), send)
+            else:
+                await send(message)
+
+        await self.app(scope, receive, buffered_send)
+
+    def _last_modified(self, url: str, etag: str) -> float:
+        seen = self._first_seen.get(url)
+        if seen is None or seen[0] != etag:
+            seen = (etag, time.time())
+            self._first_seen[url] = seen
+            while len(self._first_seen) > self.max_tracked:
+                self._first_seen.popitem(last=False)
+        self._first_seen.move_to_end(url)
+        return seen[1]
+
+    def _not_modified(self, request_headers: Headers, etag: str, last_modified: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            return any(_etag_base(tag) == etag for tag in if_none_match.split(","))
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def _finish(self, scope, request_headers: Headers, start_message, body: bytes, send):
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        status = start_message["status"]
+        content_type = headers.get("content-type", "")
+        is_get = scope["method"] == "GET"
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES) and "content-encoding" not in headers
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+
+        encoding = None
+        if compressible and len(body) >= self.minimum_size:
+            encoding = _accepted_encoding(request_headers.get("accept-encoding", ""))
+
+        # Only successful responses get validators and freshness; errors must never be cached
+        etag = None
+        if is_get and status == 200:
+            policy = cache_policy(scope["path"])
+            if policy:
+                headers["cache-control"] = policy
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            url = scope["path"] + ("?" + scope["query_string"].decode("latin-1") if scope.get("query_string") else "")
+            last_modified = self._last_modified(url, etag)
+            headers["last-modified"] = formatdate(last_modified, usegmt=True)
+
+            if self._not_modified(request_headers, etag, last_modified):
+                not_modified = MutableHeaders()
+                for name in ("cache-control", "last-modified", "vary"):
+                    if name in headers:
+                        not_modified[name] = headers[name]
+                # Same validator as the representation the client holds
+                not_modified["etag"] = f'"{etag}{ETAG_SUFFIXES.get(encoding, "")}"'
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if encoding == "br":
+            body = brotli.compress(body, quality=4)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+        if encoding:
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+
+        if etag:
+            # Strong validators must differ per representation
+            headers["etag"] = f'"{etag}{ETAG_SUFFIXES.get(encoding, "")}"'
+
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,69 @@
+
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Heavy third-party modules are bound through lazy proxies so importing the app (and answering
+# /health) doesn't pay for pandas, yfinance, pdfplumber, Gemini or pgvector until a request needs them.
+
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "yfinance",
+    "pdfplumber",
+    "google.generativeai",
+    "sqlalchemy",
+    "pgvector.sqlalchemy",
+)
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def warm_imports(modules=HEAVY_MODULES) -> dict:
+    """Imports `modules` now; returns {module: seconds} (0 for ones already loaded, None on failure)."""
+    timings = {}
+    for name in modules:
+        if name in sys.modules:
+            timings[name] = 0.0
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            logger.warning("Warm-up import failed", extra={"import_name": name, "error": str(e)})
+            timings[name] = None
+    return timings
+
+
+def loaded_modules(modules=HEAVY_MODULES) -> list:
+    return [name for name in modules if name in sys.modules]
@@ -0,0 +1,271 @@
+
+import asyncio
+import ctypes
+import ctypes.util
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from app.core.config import settings
+from app.core.telemetry import REGISTRY, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Memory accounting and budget for ingestion and chat.
+# RSS is what the node's OOM killer sees, so it drives every decision; tracemalloc (optional, it slows
+# Python allocations down) says how much of a stage's peak was Python objects rather than native buffers.
+# With MEMORY_BUDGET_MB set, ingestion jobs and chat requests are admitted only while RSS is under the
+# ceiling, and PDF pages are read in batches sized from the remaining headroom.
+
+MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+INGEST_PEAK_RSS = Gauge("ingest_last_peak_rss_bytes", "Peak process RSS while processing the most recent filing")
+INGEST_STAGE_RSS_DELTA = Histogram(
+    "ingest_stage_rss_growth_bytes", "Peak RSS above the stage's starting RSS", ("stage",),
+    buckets=tuple(mb * MB for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000)),
+)
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux /proc), else the peak from getrusage."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MemoryPressure(Exception):
+    """Raised when a chat request can't be admitted within MEMORY_ADMISSION_TIMEOUT."""
+    pass
+
+
+_libc = None
+
+
+def release_memory():
+    """Collects garbage and hands freed heap pages back to the OS (glibc keeps them otherwise)."""
+    global _libc
+    gc.collect()
+    if _libc is None:
+        path = ctypes.util.find_library("c")
+        try:
+            _libc = ctypes.CDLL(path) if path else False
+        except OSError:
+            _libc = False
+    if _libc and hasattr(_libc, "malloc_trim"):
+        _libc.malloc_trim(0)
+
+
+class PeakSampler:
+    """Background thread sampling RSS every `interval` seconds; peaks between stage boundaries aren't missed."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def reset(self) -> int:
+        self.peak = rss_bytes()
+        return self.peak
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+class FilingMemoryReport:
+    """Per-stage RSS (and optionally tracemalloc) figures for one filing."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_rss = rss_bytes()
+        self.stages = {}
+        self.peak_rss = self.started_rss
+        self._sampler = PeakSampler()
+
+    def __enter__(self):
+        # Started once and left on: with concurrent filings the traced peak is process-wide
+        if settings.MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._sampler.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._sampler.__exit__(*exc)
+        self.peak_rss = max([self.peak_rss, self._sampler.peak] + [s["peak_rss"] for s in self.stages.values()])
+        INGEST_PEAK_RSS.set(self.peak_rss)
+        MEMORY.record_filing(self.view())
+
+    @contextmanager
+    def stage(self, name: str):
+        start_rss = self._sampler.reset()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            peak = max(self._sampler.peak, rss_bytes())
+            entry = {"start_rss": start_rss, "end_rss": rss_bytes(), "peak_rss": peak}
+            if tracemalloc.is_tracing():
+                entry["python_peak"] = tracemalloc.get_traced_memory()[1]
+            self.stages[name] = entry
+            INGEST_STAGE_RSS_DELTA.observe(max(peak - start_rss, 0), stage=name)
+
+    def view(self) -> dict:
+        return {
+            "filing": self.name,
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+            "start_rss_mb": round(self.started_rss / MB, 1),
+            "stages": {
+                name: {key.replace("rss", "rss_mb").replace("python_peak", "python_peak_mb"): round(value / MB, 1) for key, value in entry.items()}
+                for name, entry in self.stages.items()
+            },
+        }
+
+
+class MemoryBudget:
+    """
+    Admission for ingestion jobs and chat requests, plus the PDF page batch size.
+    Without a ceiling (MEMORY_BUDGET_MB=0) only the concurrency limits apply.
+    """
+
+    def __init__(self, ceiling_mb: int, max_jobs: int, max_chats: int, page_batch: int, admission_timeout: float):
+        self.ceiling = ceiling_mb * MB
+        self.max_jobs = max(max_jobs, 1)
+        self.max_chats = max(max_chats, 1)
+        self.max_page_batch = max(page_batch, 1)
+        self.admission_timeout = admission_timeout
+        self.active = {"jobs": 0, "chats": 0}
+        self.waiting = {"jobs": 0, "chats": 0}
+        self.rejected = {"jobs": 0, "chats": 0}
+        self.page_cost = 2 * MB # Running estimate of RSS growth per PDF page
+        self.filings = deque(maxlen=50)
+        self._condition = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ceiling > 0
+
+    def headroom(self) -> int | None:
+        return self.ceiling - rss_bytes() if self.enabled else None
+
+    def _admissible(self, kind: str, limit: int) -> bool:
+        if self.active[kind] >= limit:
+            return False
+        if not self.enabled or (self.active["jobs"] + self.active["chats"]) == 0:
+            return True # Something must always be able to run, or we'd wait forever
+        return rss_bytes() < self.ceiling
+
+    @asynccontextmanager
+    async def _slot(self, kind: str, limit: int, timeout: float | None):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        async with self._condition:
+            self.waiting[kind] += 1
+            try:
+                while not self._admissible(kind, limit):
+                    if self.enabled and rss_bytes() >= self.ceiling:
+                        release_memory()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.rejected[kind] += 1
+                        raise MemoryPressure(f"No memory for another {kind[:-1]} within {timeout}s")
+                    try:
+                        # RSS also drops without a release (GC, finished threads), so re-check periodically
+                        await asyncio.wait_for(self._condition.wait(), min(remaining or 0.5, 0.5))
+                    except asyncio.TimeoutError:
+                        pass
+                self.active[kind] += 1
+            finally:
+                self.waiting[kind] -= 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active[kind] -= 1
+                self._condition.notify_all()
+
+    def job_slot(self):
+        """Ingestion jobs wait (no timeout) until a slot and memory are free."""
+        return self._slot("jobs", self.max_jobs, None)
+
+    def chat_slot(self):
+        """Chat requests wait up to admission_timeout, then get MemoryPressure (the API answers 503)."""
+        return self._slot("chats", self.max_chats, self.admission_timeout)
+
+    def page_batch_size(self) -> int:
+        """Pages to parse before reopening the PDF: what fits in half the headroom, capped at INGEST_PAGE_BATCH."""
+        if not self.enabled:
+            return self.max_page_batch
+        headroom = self.headroom()
+        if headroom <= 0:
+            release_memory()
+            return 1
+        return max(1, min(self.max_page_batch, int(headroom / 2 / self.page_cost)))
+
+    def observe_batch(self, pages: int, rss_growth: int):
+        if pages > 0:
+            per_page = max(rss_growth / pages, 64 * 1024)
+            self.page_cost = 0.7 * self.page_cost + 0.3 * per_page
+
+    def record_filing(self, report: dict):
+        self.filings.append(report)
+
+    def stats(self) -> dict:
+        return {
+            "rss_mb": round(rss_bytes() / MB, 1),
+            "budget_mb": round(self.ceiling / MB) if self.enabled else None,
+            "headroom_mb": round(self.headroom() / MB, 1) if self.enabled else None,
+            "tracemalloc": settings.MEMORY_TRACEMALLOC,
+            "active": dict(self.active),
+            "waiting": dict(self.waiting),
+            "limits": {"jobs": self.max_jobs, "chats": self.max_chats, "page_batch": self.max_page_batch},
+            "rejected": dict(self.rejected),
+            "page_cost_mb": round(self.page_cost / MB, 2),
+            "recent_filings": list(self.filings)[-10:],
+        }
+
+
+MEMORY = MemoryBudget(
+    ceiling_mb=settings.MEMORY_BUDGET_MB,
+    max_jobs=settings.MAX_INGEST_JOBS,
+    max_chats=settings.MAX_CHAT_REQUESTS,
+    page_batch=settings.INGEST_PAGE_BATCH,
+    admission_timeout=settings.MEMORY_ADMISSION_TIMEOUT,
+)
+
+
+@REGISTRY.register_collector
+def memory_metrics():
+    stats = MEMORY.stats()
+    families = [
+        ("process_resident_memory_bytes", "gauge", "Resident set size", [({}, rss_bytes())]),
+        ("memory_active_slots", "gauge", "Ingestion jobs / chat requests holding a slot",
+         [({"kind": kind}, count) for kind, count in stats["active"].items()]),
+        ("memory_waiting_slots", "gauge", "Ingestion jobs / chat requests waiting for memory or a slot",
+         [({"kind": kind}, count) for kind, count in stats["waiting"].items()]),
+        ("memory_rejected_total", "counter", "Requests turned away by the memory gate",
+         [({"kind": kind}, count) for kind, count in stats["rejected"].items()]),
+    ]
+    if MEMORY.enabled:
+        families.append(("memory_budget_bytes", "gauge", "Configured RSS ceiling", [({}, MEMORY.ceiling)]))
+    return families
@@ -0,0 +1,55 @@
+
+import asyncio
+import logging
+import time
+from app.core.config import settings
+from app.core.lazy import warm_imports, loaded_modules
+from app.core.database import DB_STATE, ensure_db
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ("eager", "background", "lazy")
+
+# Reported by /health: what has been initialized so far
+STARTUP_STATE = {
+    "mode": settings.STARTUP_MODE,
+    "started_at": time.time(),
+    "ready": False,
+    "import_seconds": {},
+}
+
+_background_tasks = set()
+
+
+async def warm_up():
+    start = time.perf_counter()
+    # Imports hold the GIL for most of their time but at least don't block the loop's I/O waits
+    STARTUP_STATE["import_seconds"] = await asyncio.to_thread(warm_imports)
+    # The async engine is bound to the serving loop, so the DB probe runs here rather than in the thread
+    await ensure_db()
+    STARTUP_STATE["ready"] = True
+    logger.info("Warm-up finished", extra={"seconds": round(time.perf_counter() - start, 2), "mode": STARTUP_STATE["mode"]})
+
+
+async def run_startup(mode: str = settings.STARTUP_MODE):
+    if mode not in STARTUP_MODES:
+        logger.warning("Unknown STARTUP_MODE, using eager", extra={"mode": mode})
+        mode = "eager"
+    STARTUP_STATE["mode"] = mode
+    if mode == "eager":
+        await warm_up()
+    elif mode == "background":
+        task = asyncio.create_task(warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    # lazy: libraries load on first attribute access, the DB on the first session_scope
+
+
+def startup_status() -> dict:
+    return {
+        "mode": STARTUP_STATE["mode"],
+        "ready": STARTUP_STATE["ready"],
+        "db": DB_STATE["status"],
+        "uptime_seconds": round(time.time() - STARTUP_STATE["started_at"], 3),
+        "loaded_modules": loaded_modules(),
+    }
@@ -0,0 +1,264 @@
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from app.core.config import settings
+
+# Built-in telemetry: Prometheus-style counters/histograms/gauges rendered in the text
+# exposition format at GET /metrics, plus JSON structured logging.
+# No client library needed; the few metric types we use are small enough to keep here.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labelnames, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, fn):
+        """fn() -> [(name, type, help, [(labels dict, value), ...]), ...], called at scrape time."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                logging.getLogger(__name__).warning("Telemetry collector failed", extra={"collector": collect.__name__, "error": str(e)})
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, help_text, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(key, {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]}) for key, s in self._values.items()]
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0
+            overflow = state["count"] - sum(state["counts"])
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"] + [overflow]):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+# --- Hot-path metrics ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"),
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "ingest_stage_duration_seconds", "process_filing time per stage", ("stage",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+INGEST_PAGES = Counter("ingest_pages_total", "PDF pages extracted")
+INGEST_FILINGS = Counter("ingest_filings_total", "Filings processed", ("outcome",))
+INGEST_PAGES_PER_SECOND = Gauge("ingest_last_pages_per_second", "Text extraction throughput of the most recent filing")
+LLM_REQUESTS = Counter("llm_requests_total", "Gemini calls by call site", ("site", "model", "outcome"))
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Gemini call latency (excluding queueing and backoff)", ("site", "model"),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Gemini tokens by call site", ("site", "model", "kind"))
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_duration_seconds", "Market data upstream latency", ("source", "dataset", "outcome"),
+)
+
+
+@contextmanager
+def ingest_stage(stage: str):
+    with INGEST_STAGE_SECONDS.time(stage=stage):
+        yield
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# --- HTTP middleware ---
+
+def route_template(scope) -> str:
+    """
+    Full route path, e.g. /api/v1/company/{company_id}/stock. FastAPI copies an included router's
+    routes with the prefix applied, so `route.path` is the template; releases that include routers
+    lazily keep the original (unprefixed) route and put the prefixed one in the "fastapi" scope entry.
+    """
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    template = getattr(effective, "path", None) or getattr(scope.get("route"), "path", None)
+    return template or "unmatched"
+
+class TelemetryMiddleware:
+    """Records request latency per route template (/api/v1/company/{company_id}/stock), method and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status["code"],
+            )
+
+
+# --- Structured logging ---
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = settings.LOG_LEVEL, fmt: str = settings.LOG_FORMAT):
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
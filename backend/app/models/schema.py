@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, JSON, Boolean, Index
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
@@ -25,12 +25,18 @@ class Filing(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(String, ForeignKey("companies.id"))
-    period = Column(String) # e.g., "FY23", "Q1FY24"
-    filing_type = Column(String) # "Annual Report", "Quarterly Result"
+    period = Column(String) # e.g., "FY23", "Q1 FY24"
+    filing_type = Column(String) # "Annual Report", "Fact Sheet", "Earnings Call Transcript"
+    fiscal_year = Column(String) # "2023-24"
+    quarter = Column(Integer) # 1-4, None for annual filings
+    doc_type = Column(String) # fact_sheet, press_release, transcript, shareholding, capital_structure, statements, annual_report, other
+    currency = Column(String) # INR / USD where the filing is in one currency
     source_url = Column(String)
     storage_path = Column(String)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_filings_company_period", "company_id", "fiscal_year", "quarter", "doc_type"),)
+
     company = relationship("Company", back_populates="filings")
 
 class DocumentChunk(Base):
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.telemetry import REGISTRY
+from app.services.gemini import generate_embeddings
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Per-company semantic cache of reviewed chat answers.
+# A question is embedded once; a stored answer is reused when a previous question for the same
+# company is close enough (cosine >= ANSWER_CACHE_THRESHOLD) and has the same scope: the filings it is
+# answered from, the periods, document types and currency it asks about and the speakers it names
+# (FilingCatalog.answer_scope). "Q4FY23 margin" vs "Q4FY24 margin", "USD" vs "INR" revenue and "the CFO"
+# vs "the CEO" embed almost identically but need different answers. Other numbers in the question
+# ("10%") must match too. Every processed upload bumps the company's filings version, which drops its cached answers.
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SPECIFIC_RE = re.compile(r"(?<![a-z])(?:fy\s?'?\d{2,4}|q[1-4]|h[12]|(?<!\d)\d[\d,.]*%?)", re.I)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(TOKEN_RE.findall(question.lower()))
+
+
+def specifics(question: str) -> frozenset:
+    """Years, quarters and numbers named in the question ("FY24", "Q3", "2023", "10%")."""
+    return frozenset(re.sub(r"[\s',]", "", m.group(0).lower()).rstrip(".") for m in SPECIFIC_RE.finditer(question))
+
+
+class AnswerCache:
+    def __init__(self, threshold: float, max_per_company: int, ttl: float):
+        self.threshold = threshold
+        self.max_per_company = max_per_company
+        self.ttl = ttl
+        self.entries = {}  # company_id -> [entry dict], oldest first
+        self.versions = {} # company_id -> filings version the cached answers were built from
+        self.counts = {"lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0, "errors": 0, "stores": 0, "invalidations": 0}
+        # invalidate runs in worker threads (catalog registration and reloads), the rest on the event loop
+        self._lock = threading.Lock()
+
+    def version(self, company_id: str) -> int:
+        return self.versions.get(company_id, 0)
+
+    def invalidate(self, company_id: str):
+        """New filing text for the company: answers built from the old text are no longer valid."""
+        with self._lock:
+            self.versions[company_id] = self.version(company_id) + 1
+            dropped = self.entries.pop(company_id, None)
+            if dropped:
+                self.counts["invalidations"] += 1
+        if dropped:
+            logger.info("Answer cache invalidated", extra={"company_id": company_id, "filings_version": self.versions[company_id]})
+
+    def _live(self, company_id: str) -> list:
+        """Unexpired entries built from the current filings version. Call with the lock held."""
+        cutoff = time.time() - self.ttl
+        version = self.version(company_id)
+        entries = [e for e in self.entries.get(company_id, []) if e["created_at"] >= cutoff and e["version"] == version]
+        self.entries[company_id] = entries
+        return entries
+
+    async def lookup(self, company_id: str, question: str, scope: tuple = ()) -> tuple[dict | None, list | None]:
+        """
+        (entry, embedding). entry is the cached answer or None; the question's embedding is returned
+        so a miss can be stored without embedding twice (None if embedding failed).
+        """
+        self.counts["lookups"] += 1
+        with self._lock:
+            entries = [e for e in self._live(company_id) if e["scope"] == scope]
+        normalized = normalize_question(question)
+        for entry in entries:
+            if entry["normalized"] == normalized:
+                return self._hit(entry, 1.0, exact=True), None
+
+        try:
+            embedding = await generate_embeddings(question)
+        except Exception as e:
+            self.counts["errors"] += 1
+            logger.warning("Answer cache: question embedding failed", extra={"company_id": company_id, "error": str(e)})
+            return None, None
+
+        wanted = specifics(question)
+        candidates = [e for e in entries if e["specifics"] == wanted]
+        if candidates:
+            query = np.asarray(embedding, dtype=np.float32)
+            matrix = np.stack([e["embedding"] for e in candidates])
+            scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0) + 1e-12)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._hit(candidates[best], float(scores[best])), embedding
+
+        self.counts["misses"] += 1
+        return None, embedding
+
+    def _hit(self, entry: dict, similarity: float, exact: bool = False) -> dict:
+        self.counts["hits"] += 1
+        if exact:
+            self.counts["exact_hits"] += 1
+        entry["hits"] += 1
+        return {**entry, "similarity": round(similarity, 4)}
+
+    def store(self, company_id: str, question: str, embedding: list | None, answer: str, version: int, scope: tuple = ()):
+        """Only reviewed answers are stored, and only if no upload landed while they were being generated."""
+        with self._lock:
+            if embedding is None or version != self.version(company_id):
+                return
+            entries = self._live(company_id)
+            entries.append({
+                "question": question,
+                "normalized": normalize_question(question),
+                "specifics": specifics(question),
+                "scope": scope,
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "answer": answer,
+                "version": version,
+                "created_at": time.time(),
+                "hits": 0,
+            })
+            del entries[:-self.max_per_company]
+        self.counts["stores"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = list(self.entries.items())
+        served = self.counts["lookups"]
+        return {
+            **self.counts,
+            "hit_rate": round(self.counts["hits"] / served, 3) if served else 0.0,
+            "threshold": self.threshold,
+            "companies": {company: {"entries": len(entries), "filings_version": self.version(company)} for company, entries in snapshot},
+        }
+
+
+ANSWER_CACHE = AnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    max_per_company=settings.ANSWER_CACHE_MAX_PER_COMPANY,
+    ttl=settings.ANSWER_CACHE_TTL,
+)
+
+
+@REGISTRY.register_collector
+def answer_cache_metrics():
+    stats = ANSWER_CACHE.stats()
+    return [
+        ("answer_cache_events_total", "counter", "Chat answer cache lookups by result",
+         [({"result": key}, stats[key]) for key in ("hits", "exact_hits", "misses", "errors", "stores", "invalidations")]),
+        ("answer_cache_hit_ratio", "gauge", "Share of chat questions answered from the cache", [({}, stats["hit_rate"])]),
+        ("answer_cache_entries", "gauge", "Cached answers", [({}, sum(c["entries"] for c in stats["companies"].values()))]),
+    ]
@@ -0,0 +1,73 @@
+
+from __future__ import annotations
+
+from app.core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Server-side reduction of price series before they are serialized.
+# A chart can't show more points than it has pixels, so long windows (5y, max) are
+# resampled to a coarser resolution and/or reduced with LTTB, which keeps the visual shape
+# (peaks, troughs) far better than taking every n-th point.
+
+RESOLUTIONS = ("daily", "weekly", "monthly")
+
+
+def resample(dates: list, values: list, resolution: str = "daily") -> tuple[list, list]:
+    """Last value per ISO week / calendar month. `dates` are sorted "YYYY-MM-DD" strings."""
+    if resolution == "daily" or not dates:
+        return dates, values
+    days = np.array(dates, dtype="datetime64[D]")
+    if resolution == "weekly":
+        # Monday-based week number (1970-01-01 was a Thursday)
+        buckets = (days.astype(np.int64) + 3) // 7
+    elif resolution == "monthly":
+        buckets = days.astype("datetime64[M]").astype(np.int64)
+    else:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    # Index of the last element of each run of equal buckets
+    last = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+    return [dates[i] for i in last], [values[i] for i in last]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the `threshold` points to keep (first and last always kept)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    # Interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point for the final bucket)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Point in this bucket forming the largest triangle with the previous kept point and the next average
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(dates: list, values: list, max_points: int | None = None, resolution: str = "daily") -> tuple[list, list]:
+    dates, values = resample(dates, values, resolution)
+    if not max_points or len(dates) <= max_points:
+        return dates, values
+    x = np.array(dates, dtype="datetime64[D]").astype(np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    idx = lttb_indices(x, y, max_points)
+    return [dates[i] for i in idx], [values[i] for i in idx]
@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from app.services.answer_cache import ANSWER_CACHE
+from app.services.transcripts import TRANSCRIPTS, speaker_filter
+
+logger = logging.getLogger(__name__)
+
+# Filing catalog: company, fiscal period, document type and currency of every filing, plus its text.
+# Retrieval filters on it before anything reaches a prompt: "Q2 FY22 attrition" reads only the
+# Q2 2021-22 fact sheet and call transcript instead of whatever was uploaded last.
+#
+# Periods follow the Indian fiscal year (April-March): FY22 = 2021-22, Q1 ends June 30, Q4 March 31.
+# Stored per company under <root>/<company>/catalog.json with the text in <root>/<company>/text/<key>.txt,
+# so the catalog survives restarts and a corpus indexed from the CLI is picked up by a running server.
+
+DOC_TYPES = (
+    ("fact_sheet", "Fact Sheet", re.compile(r"fact ?sheet", re.I)),
+    ("press_release", "Press Release", re.compile(r"press release", re.I)),
+    ("transcript", "Earnings Call Transcript", re.compile(r"transcript|conference call", re.I)),
+    ("shareholding", "Shareholding Pattern", re.compile(r"shareholding", re.I)),
+    ("capital_structure", "Capital Structure", re.compile(r"capital structure", re.I)),
+    ("statements", "Financial Statements", re.compile(r"consolidated|standalone|balance sheet|statement of financial", re.I)),
+    ("annual_report", "Annual Report", re.compile(r"annual report|integrated report", re.I)),
+)
+DOC_TYPE_LABELS = {name: label for name, label, _ in DOC_TYPES}
+DOC_TYPE_ORDER = {name: i for i, (name, _, _) in enumerate(DOC_TYPES)}
+
+# Question wording -> document types worth reading
+QUERY_DOC_TYPES = (
+    (re.compile(r"attrition|headcount|employee|workforce|utili[sz]ation|vertical|geograph|segment|deal|\btcv\b|order book|client|fact ?sheet|constant currency", re.I),
+     ("fact_sheet", "transcript")),
+    (re.compile(r"\bsaid\b|\bsay|comment|\bcall\b|management|\bceo\b|\bcfo\b|\bcoo\b|\bchro\b|analyst|guidance|outlook|q&a", re.I),
+     ("transcript",)),
+    (re.compile(r"press release|headline|announce", re.I), ("press_release",)),
+    (re.compile(r"balance sheet|cash ?flow|income statement|profit (?:and|&) loss|\bp&l\b|assets|liabilit|receivable|standalone|consolidated", re.I),
+     ("statements", "annual_report")),
+    (re.compile(r"sharehold|promoter|\bfiis?\b|\bdiis?\b|institutional holding|public holding", re.I), ("shareholding",)),
+    (re.compile(r"capital structure|share capital|authori[sz]ed capital|paid.up capital", re.I), ("capital_structure",)),
+)
+
+MONTHS = {m: i + 1 for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))}
+QUARTER_ENDS = {(6, 30): 1, (9, 30): 2, (12, 31): 3, (3, 31): 4}
+ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4}
+
+_FY = r"(\d{4}\s*-\s*\d{2,4}|\d{2}\s*-\s*\d{2}|\d{4}|\d{2})"
+PERIOD_PATTERNS = (
+    # (kind, regex); matched text is blanked so later patterns don't read it again
+    ("quarter_fy", re.compile(rf"\bq([1-4])\s*(?:of\s+|in\s+)?(?:fy\s*'?\s*{_FY}|(\d{{4}}\s*-\s*\d{{2,4}}|\d{{4}}))\b", re.I)),
+    ("fy_quarter", re.compile(rf"\bfy\s*'?\s*{_FY}\s*,?\s*q([1-4])\b", re.I)),
+    ("roman", re.compile(r"\bquarter\s+(iv|i{1,3})\s*,?\s*fy\s*(\d{4}\s*-\s*\d{2,4}|\d{2})", re.I)),
+    ("fy_range", re.compile(r"\bbetween\s+fy\s*'?\s*(\d{4}|\d{2})\s+and\s+fy\s*'?\s*(\d{4}|\d{2})\b", re.I)),
+    ("fy_range", re.compile(r"\bfy\s*'?\s*(\d{4}|\d{2})\s*(?:-|–|to|through|until)\s*fy\s*'?\s*(\d{4}|\d{2})\b", re.I)),
+    ("fy", re.compile(rf"\bfy\s*'?\s*{_FY}\b", re.I)),
+    ("year_span", re.compile(r"\b(20\d{2})\s*-\s*(\d{2}|20\d{2})\b")),
+    ("date", re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2}),?\s+(20\d{2})\b", re.I)),
+    ("quarter", re.compile(r"\bq([1-4])\b", re.I)),
+)
+CURRENCY_RE = re.compile(r"\b(INR|USD)\b")
+QUERY_USD_RE = re.compile(r"\busd\b|\$|dollar", re.I)
+QUERY_INR_RE = re.compile(r"\binr\b|₹|rupee|crore|lakh", re.I)
+TEXT_USD_RE = re.compile(r"million of usd|\bin usd\b|usd million|\$\s?\d", re.I)
+TEXT_INR_RE = re.compile(r"crore|₹|`\s?\d", re.I)
+
+
+def fiscal_year(token: str) -> int | None:
+    """'2021-22', '2021-2022', '21-22' -> 2022; '2022' / '22' -> 2022 (the year the FY ends)."""
+    parts = [p for p in re.split(r"\s*-\s*", token.strip()) if p]
+    if len(parts) == 2:
+        start = int(parts[0]) + (2000 if len(parts[0]) == 2 else 0)
+        end = int(parts[1]) + (2000 if len(parts[1]) == 2 else 0)
+        if len(parts[1]) == 2 and len(parts[0]) == 4:
+            end = start // 100 * 100 + int(parts[1])
+        return end if end == start + 1 else None
+    year = int(parts[0])
+    return year + 2000 if year < 100 else year
+
+
+def period_from_date(month: int, day: int, year: int) -> tuple | None:
+    """Quarter-end date -> (fy, quarter): Sep 30, 2021 -> (2022, 2); other dates -> None."""
+    quarter = QUARTER_ENDS.get((month, day))
+    if quarter is None:
+        return None
+    return (year if quarter == 4 else year + 1, quarter)
+
+
+def period_label(fy: int | None, quarter: int | None) -> str | None:
+    if fy is None:
+        return None
+    return f"Q{quarter} FY{fy % 100:02d}" if quarter else f"FY{fy % 100:02d}"
+
+
+def parse_periods(text: str) -> list:
+    """
+    (fy, quarter) pairs named in `text`, in order of appearance; quarter is None for a whole year and
+    fy is None for a bare "Q2". "FY22-FY25" expands to each year; a bare quarter and bare years
+    ("Q2 ... in FY22 and FY23") combine into one pair per year.
+    """
+    found, blanked = [], text
+    for kind, pattern in PERIOD_PATTERNS:
+        for m in pattern.finditer(blanked):
+            g = m.groups()
+            pairs = []
+            if kind == "quarter_fy":
+                fy = fiscal_year(g[1] or g[2])
+                pairs = [(fy, int(g[0]))] if fy else []
+            elif kind == "fy_quarter":
+                fy = fiscal_year(g[0])
+                pairs = [(fy, int(g[1]))] if fy else []
+            elif kind == "roman":
+                fy = fiscal_year(g[1])
+                pairs = [(fy, ROMAN[g[0].lower()])] if fy else []
+            elif kind == "fy_range":
+                first, last = fiscal_year(g[0]), fiscal_year(g[1])
+                if first <= last <= first + 20:
+                    pairs = [(fy, None) for fy in range(first, last + 1)]
+            elif kind in ("fy", "year_span"):
+                fy = fiscal_year(g[0] if kind == "fy" else f"{g[0]}-{g[1]}")
+                pairs = [(fy, None)] if fy else []
+            elif kind == "date":
+                period = period_from_date(MONTHS[g[0][:3].lower()], int(g[1]), int(g[2]))
+                pairs = [period] if period else []
+            elif kind == "quarter":
+                pairs = [(None, int(g[0]))]
+            if pairs:
+                found.extend((m.start(), pair, kind) for pair in pairs)
+                blanked = blanked[:m.start()] + " " * (m.end() - m.start()) + blanked[m.end():]
+
+    found.sort(key=lambda item: item[0])
+    quarters = [pair[1] for _, pair, _ in found if pair[0] is None]
+    years = [pair[0] for _, pair, _ in found if pair[1] is None]
+    ordered = [pair for _, pair, _ in found if None not in pair]
+    if quarters and years:
+        ordered.extend((fy, q) for fy in years for q in quarters)
+    else:
+        ordered.extend((None, q) for q in quarters)
+        ordered.extend((fy, None) for fy in years)
+    return list(dict.fromkeys(ordered))
+
+
+def doc_type_of(name: str) -> str | None:
+    for doc_type, _, pattern in DOC_TYPES:
+        if pattern.search(name):
+            return doc_type
+    return None
+
+
+def _text_currency(text: str) -> str | None:
+    usd, inr = bool(TEXT_USD_RE.search(text)), bool(TEXT_INR_RE.search(text))
+    return "USD" if usd and not inr else "INR" if inr and not usd else None
+
+
+def classify_filing(path: str | Path, text: str = "", period_hint: str | None = None) -> dict:
+    """
+    Fiscal period, document type and currency of one filing. Sources, most trusted first:
+    the uploader's period hint, the file name ("Q2 2021-22 Fact Sheet", "as on Sep 30, 2021"),
+    the corpus folders (".../2021-2022/Quarterly Statements/Q2/"), then the first pages' text.
+    """
+    path = Path(path)
+    name = path.stem
+    fy = quarter = None
+
+    candidates = []
+    if period_hint:
+        candidates.append(parse_periods(period_hint))
+    candidates.append(parse_periods(name))
+    folder_fy = folder_q = None
+    for part in path.parts[:-1]:
+        if re.fullmatch(r"(20\d{2})\s*-\s*(20\d{2}|\d{2})", part):
+            folder_fy = fiscal_year(part)
+        elif re.fullmatch(r"[Qq]([1-4])", part):
+            folder_q = int(part[1])
+    if folder_fy:
+        candidates.append([(folder_fy, folder_q)])
+    candidates.append(parse_periods(text[:3000]))
+
+    for pairs in candidates:
+        complete = [p for p in pairs if p[0] is not None]
+        if complete:
+            # A quarter beats a whole year from the same source
+            fy, quarter = next((p for p in complete if p[1] is not None), complete[0])
+            break
+
+    match = CURRENCY_RE.search(name)
+    return {
+        "title": name,
+        "fy": fy,
+        "fiscal_year": f"{fy - 1}-{fy % 100:02d}" if fy else None,
+        "quarter": quarter,
+        "period": period_label(fy, quarter),
+        "doc_type": doc_type_of(name) or doc_type_of(text[:2000]) or "other",
+        "currency": match.group(1) if match else _text_currency(text[:5000]),
+    }
+
+
+def parse_query(question: str) -> dict:
+    """Periods, document types and currency a question asks about (each empty/None when not named)."""
+    doc_types = []
+    for pattern, types in QUERY_DOC_TYPES:
+        if pattern.search(question):
+            doc_types.extend(t for t in types if t not in doc_types)
+    usd, inr = bool(QUERY_USD_RE.search(question)), bool(QUERY_INR_RE.search(question))
+    return {
+        "periods": parse_periods(question),
+        "doc_types": doc_types,
+        "currency": "USD" if usd and not inr else "INR" if inr and not usd else None,
+    }
+
+
+def _matches(entry: dict, periods: list) -> bool:
+    return any(
+        (fy is None or entry["fy"] == fy) and (quarter is None or entry["quarter"] == quarter)
+        for fy, quarter in periods
+    )
+
+
+def _sort_key(entry: dict) -> tuple:
+    return (entry["fy"] or 0, entry["quarter"] or 0, DOC_TYPE_ORDER.get(entry["doc_type"], 99), entry["title"])
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:80] or "filing"
+
+
+class FilingCatalog:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.filings = {}   # company_id -> {key: entry}
+        self.texts = {}     # (company_id, key) -> filing text, read from disk on first use
+        self._mtimes = {}   # company_id -> catalog.json mtime when last read
+        self._lock = threading.Lock() # register runs in ingestion worker threads, one catalog.json write at a time
+
+    def _catalog_path(self, company_id: str) -> Path:
+        return self.root / company_id / "catalog.json"
+
+    def _text_path(self, company_id: str, key: str) -> Path:
+        return self.root / company_id / "text" / f"{key}.txt"
+
+    def company_filings(self, company_id: str) -> dict:
+        """The company's filings, re-read when catalog.json changed on disk (e.g. after a CLI index run)."""
+        path = self._catalog_path(company_id)
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return self.filings.get(company_id, {})
+        if self._mtimes.get(company_id) != mtime:
+            try:
+                self.filings[company_id] = {entry["key"]: entry for entry in json.loads(path.read_text())["filings"]}
+                self._mtimes[company_id] = mtime
+                for key in [k for k in self.texts if k[0] == company_id]:
+                    del self.texts[key]
+                ANSWER_CACHE.invalidate(company_id)
+                logger.info("Filing catalog loaded", extra={"company_id": company_id, "filings": len(self.filings[company_id])})
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Filing catalog unreadable", extra={"company_id": company_id, "error": str(e)})
+        return self.filings.get(company_id, {})
+
+    def _save(self, company_id: str):
+        path = self._catalog_path(company_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entries = sorted(self.filings.get(company_id, {}).values(), key=_sort_key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"company_id": company_id, "filings": entries}, indent=1))
+        os.replace(tmp, path)
+        self._mtimes[company_id] = path.stat().st_mtime
+
+    def is_current(self, company_id: str, path: Path, source: str) -> bool:
+        """Already indexed from this exact file (same source, size and mtime)."""
+        stat = path.stat()
+        return any(
+            e["source"] == source and e.get("size") == stat.st_size and e.get("mtime") == stat.st_mtime
+            for e in self.company_filings(company_id).values()
+        )
+
+    def register(self, company_id: str, path: Path, text_pages: list, period_hint: str | None = None,
+                 source: str | None = None) -> dict:
+        """
+        Classifies and stores one filing's text. `source` is the path used for classification and
+        de-duplication (defaults to the file name; the corpus indexer passes the path below the corpus root).
+        """
+        source = source or path.name
+        text = "\n".join(page["text"] for page in text_pages)
+        info = classify_filing(source, text, period_hint)
+        key = f"{_slug(info['period'] or 'undated')}_{_slug(info['title'])}"
+        try:
+            stat = path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+        entry = {
+            "key": key,
+            "company_id": company_id,
+            **info,
+            "doc_label": DOC_TYPE_LABELS.get(info["doc_type"], "Filing"),
+            "source": source,
+            "pages": len(text_pages),
+            "chars": len(text),
+            "size": size,
+            "mtime": mtime,
+            "indexed_at": time.time(),
+        }
+        text_path = self._text_path(company_id, key)
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+        text_path.write_text(text)
+        with self._lock:
+            filings = self.company_filings(company_id)
+            self.filings[company_id] = {**filings, key: entry}
+            self.texts[(company_id, key)] = text
+            self._save(company_id)
+        ANSWER_CACHE.invalidate(company_id) # Cached answers were built without this filing
+        logger.info("Filing cataloged", extra={
+            "company_id": company_id, "filing_key": key, "period": entry["period"],
+            "doc_type": entry["doc_type"], "currency": entry["currency"],
+        })
+        return entry
+
+    def text(self, company_id: str, key: str) -> str:
+        if (company_id, key) not in self.texts:
+            try:
+                self.texts[(company_id, key)] = self._text_path(company_id, key).read_text()
+            except OSError:
+                self.texts[(company_id, key)] = ""
+        return self.texts[(company_id, key)]
+
+    def select(self, company_id: str, question: str, doc_types: list | None = None) -> tuple[list, dict]:
+        """
+        (filings, query) for a question. Named periods restrict the filings first; without one the latest
+        period is read (plus filings with no known period). Document types named by the question (or
+        `doc_types`) narrow further when any such filing exists, and the INR/USD twins of a document keep
+        only one currency.
+        """
+        filings = list(self.company_filings(company_id).values())
+        query = parse_query(question)
+        if doc_types:
+            query["doc_types"] = doc_types
+        query["period_found"] = True
+        if not filings:
+            return [], query
+
+        selected = [f for f in filings if _matches(f, query["periods"])] if query["periods"] else []
+        if not selected:
+            query["period_found"] = not query["periods"]
+            dated = [f for f in filings if f["fy"]]
+            latest = max((_sort_key(f)[:2] for f in dated), default=None)
+            selected = [f for f in filings if not f["fy"] or _sort_key(f)[:2] == latest]
+
+        if query["doc_types"]:
+            narrowed = [f for f in selected if f["doc_type"] in query["doc_types"]]
+            selected = narrowed or selected
+
+        preferred = query["currency"] or "INR"
+        groups = {}
+        for f in selected:
+            groups.setdefault((f["fy"], f["quarter"], f["doc_type"]), []).append(f)
+        selected = []
+        for group in groups.values():
+            currencies = {f["currency"] for f in group if f["currency"]}
+            if len(currencies) > 1 and preferred in currencies:
+                group = [f for f in group if f["currency"] in (preferred, None)]
+            selected.extend(group)
+        return sorted(selected, key=_sort_key), query
+
+    def answer_scope(self, company_id: str, question: str) -> tuple:
+        """
+        What an answer to `question` is built from, parsed the same way retrieval parses it: the filings
+        selected, the periods / document types / currency asked about and the speaker titles / roles
+        for call excerpts. Questions with different scopes never share a cached answer.
+        """
+        selected, query = self.select(company_id, question)
+        wanted = speaker_filter(question, [])
+        return (
+            tuple(sorted(f["key"] for f in selected)),
+            tuple(sorted(set(query["periods"]), key=str)),
+            tuple(sorted(query["doc_types"])),
+            query["currency"],
+            tuple(sorted(wanted["titles"])),
+            tuple(sorted(wanted["roles"])),
+        )
+
+    def context(self, company_id: str, question: str, max_chars: int) -> str | None:
+        """
+        Text of the selected filings, each under a [DOCUMENT ...] header, sharing `max_chars` fairly
+        (short filings are kept whole, long ones cut to what's left). Call transcripts are reduced to
+        the speaker turns that match the question when any do. None if the company has no catalog.
+        """
+        selected, query = self.select(company_id, question)
+        if not selected:
+            return None
+        texts = {f["key"]: self.text(company_id, f["key"]) for f in selected}
+        excerpts = TRANSCRIPTS.excerpts(company_id, selected, texts, question)
+        if excerpts:
+            # Calls with no matching turn have nothing to add
+            selected = [f for f in selected if f["doc_type"] != "transcript" or f["key"] in excerpts]
+            texts.update(excerpts)
+        note = None
+        if not query["period_found"]:
+            wanted = ", ".join(period_label(fy, q) or f"Q{q}" for fy, q in query["periods"])
+            note = f"[NOTE: No filings for {wanted} are indexed; the documents below are the most recent available.]"
+        headers = {
+            f["key"]: "[DOCUMENT: " + " | ".join(x for x in (f["title"], f["period"], f["doc_label"], f["currency"]) if x) + "]\n"
+            for f in selected
+        }
+        # The note, headers and separators come out of the same budget as the filing text
+        overhead = sum(map(len, headers.values())) + (len(note) if note else 0) + 2 * (len(selected) - (0 if note else 1))
+        budget, remaining = {}, max(max_chars - overhead, 0)
+        for i, f in enumerate(sorted(selected, key=lambda f: len(texts[f["key"]]))):
+            share = remaining // (len(selected) - i)
+            budget[f["key"]] = min(len(texts[f["key"]]), share)
+            remaining -= budget[f["key"]]
+
+        parts = [note] if note else []
+        parts += [headers[f["key"]] + texts[f["key"]][:budget[f["key"]]] for f in selected]
+        context = "\n\n".join(parts)
+        logger.info("Context selected", extra={
+            "company_id": company_id,
+            "periods": [period_label(fy, q) or f"Q{q}" for fy, q in query["periods"]],
+            "doc_types": query["doc_types"],
+            "filings": [f["key"] for f in selected],
+            "context_chars": len(context),
+        })
+        return context
+
+    def stats(self) -> dict:
+        companies = {}
+        for company_id, filings in self.filings.items():
+            by_type = {}
+            for f in filings.values():
+                by_type[f["doc_type"]] = by_type.get(f["doc_type"], 0) + 1
+            periods = sorted({_sort_key(f)[:2] for f in filings.values() if f["fy"]})
+            companies[company_id] = {
+                "filings": len(filings),
+                "doc_types": by_type,
+                "first_period": period_label(*periods[0]) if periods else None,
+                "last_period": period_label(*periods[-1]) if periods else None,
+            }
+        return {"companies": companies}
+
+
+FILING_CATALOG = FilingCatalog("uploads")
+
+
+def index_corpus(root: Path, company_id: str, force: bool = False, jobs: int = 1, progress=None) -> dict:
+    """
+    Catalogs every PDF under `root` (e.g. the TCS/ tree) for `company_id`: text extraction only, no LLM.
+    Files already indexed unchanged are skipped unless `force`. Returns counts.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from app.services.ingestion import extract_text_from_pdf
+
+    root = Path(root)
+    pdfs = sorted(root.rglob("*.pdf"))
+    todo = [p for p in pdfs if force or not FILING_CATALOG.is_current(company_id, p, str(p.relative_to(root)))]
+    counts = {"found": len(pdfs), "indexed": 0, "skipped": len(pdfs) - len(todo), "empty": 0}
+
+    def record(path: Path, text_pages: list):
+        if not text_pages:
+            counts["empty"] += 1
+            return
+        entry = FILING_CATALOG.register(company_id, path, text_pages, source=str(path.relative_to(root)))
+        counts["indexed"] += 1
+        if progress:
+            progress(entry)
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for path, text_pages in zip(todo, pool.map(extract_text_from_pdf, todo)):
+                record(path, text_pages)
+    else:
+        for path in todo:
+            record(path, extract_text_from_pdf(path))
+    return counts
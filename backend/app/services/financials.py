@@ -0,0 +1,149 @@
+
+from __future__ import annotations
+
+from app.core.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Vectorized statement metrics.
+# Every trend and derived ratio is computed in one pass over a "panel": a frame indexed by
+# (symbol, metric) with one column per fiscal year. A single ticker is a panel of one, so the
+# /metrics endpoint and batch comparisons across hundreds of tickers share the same code.
+
+CRORE = 10000000
+
+# First row label present wins (Yahoo naming differs between tickers)
+INCOME_ROWS = {
+    "revenue": ("Total Revenue",),
+    "operating_profit": ("EBIT", "Operating Income"),
+    "eps": ("Basic EPS",),
+    "net_income": ("Net Income", "Net Income Common Stockholders"),
+}
+CASHFLOW_ROWS = {
+    "cash_flow": ("Operating Cash Flow",),
+}
+BALANCE_ROWS = {
+    "equity": ("Stockholders Equity", "Total Equity Gross Minority Interest"),
+}
+
+# Per-share values get FX conversion but no crore scaling
+PER_SHARE = {"eps"}
+
+
+def select_long(frames: dict, aliases: dict, periods: int = 4) -> pd.DataFrame:
+    """
+    Long (symbol, metric, year, date, value) rows for one statement type across all symbols.
+    Keeps the first alias present per symbol and the latest `periods` statement dates per symbol.
+    """
+    frames = {symbol: df for symbol, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "metric", "year", "date", "value"])
+
+    metric_of = {row: metric for metric, rows in aliases.items() for row in rows}
+    priority_of = {row: rank for rows in aliases.values() for rank, row in enumerate(rows)}
+
+    wide = pd.concat(frames, names=["symbol", "row"])
+    wide = wide[wide.index.get_level_values("row").isin(list(metric_of))]
+    long = wide.stack().dropna().reset_index()
+    long.columns = ["symbol", "row", "date", "value"]
+    long["metric"] = long["row"].map(metric_of)
+    long["priority"] = long["row"].map(priority_of)
+
+    # First alias present wins, then latest statement dates per symbol
+    long = long[long["priority"] == long.groupby(["symbol", "metric"])["priority"].transform("min")]
+    long["date"] = pd.to_datetime(long["date"])
+    long = long[long.groupby("symbol")["date"].rank(method="dense", ascending=False) <= periods]
+    # FY ending Mar 2024 -> "FY24"
+    long["year"] = long["date"].dt.strftime("FY%y")
+    return long[["symbol", "metric", "year", "date", "value"]]
+
+
+def raw_panel(statements: dict, periods: int = 4) -> pd.DataFrame:
+    """
+    statements: {symbol: (financials, cashflow, balance_sheet)} as returned by yfinance.
+    Returns the unscaled (symbol, metric) x fiscal-year panel.
+    """
+    if not statements:
+        return pd.DataFrame()
+    long = pd.concat([
+        select_long({s: frames[0] for s, frames in statements.items()}, INCOME_ROWS, periods),
+        select_long({s: frames[1] for s, frames in statements.items()}, CASHFLOW_ROWS, periods),
+        select_long({s: frames[2] for s, frames in statements.items()}, BALANCE_ROWS, periods),
+    ])
+    # One value per fiscal year (most recent statement date wins), then pivot to wide
+    long = long.sort_values("date", ascending=False).drop_duplicates(["symbol", "metric", "year"])
+    panel = long.set_index(["symbol", "metric", "year"])["value"].astype(float).unstack("year")
+
+    # Every symbol gets every metric row, even if Yahoo had none of it
+    all_metrics = list(INCOME_ROWS) + list(CASHFLOW_ROWS) + list(BALANCE_ROWS)
+    full_index = pd.MultiIndex.from_product([list(statements), all_metrics], names=["symbol", "metric"])
+    return panel.reindex(full_index).sort_index(axis=1)
+
+
+def compute_panel(statements: dict, fx_rates: dict | None = None, scale: float = CRORE, periods: int = 4) -> pd.DataFrame:
+    """
+    Trends (FX converted, crore scaled) plus derived ratios for every symbol in one pass:
+    operating/net margin (%), revenue and profit YoY growth (%) and RoE (%).
+    """
+    raw = raw_panel(statements, periods)
+    if raw.empty:
+        return raw
+    fx_rates = fx_rates or {}
+
+    # FX + unit scaling as a single broadcast over rows
+    symbols = raw.index.get_level_values("symbol")
+    metrics = raw.index.get_level_values("metric")
+    fx = np.array([fx_rates.get(s, 1.0) for s in symbols], dtype=float)
+    divisor = np.where(metrics.isin(list(PER_SHARE)), 1.0, scale)
+    scaled = raw.mul(fx / divisor, axis=0)
+
+    # Ratios are unit free, so compute them on the raw values
+    def metric(name):
+        return raw.xs(name, level="metric")
+
+    revenue, operating_profit, net_income, equity = (metric(m) for m in ("revenue", "operating_profit", "net_income", "equity"))
+    derived = {
+        "roe": net_income / equity.where(equity != 0) * 100,
+        "operating_margin": operating_profit / revenue.where(revenue != 0) * 100,
+        "net_margin": net_income / revenue.where(revenue != 0) * 100,
+        "revenue_yoy": (revenue / revenue.shift(1, axis=1) - 1) * 100,
+        "operating_profit_yoy": (operating_profit / operating_profit.shift(1, axis=1) - 1) * 100,
+    }
+    derived = pd.concat(derived, names=["metric", "symbol"]).swaplevel().sort_index()
+    return pd.concat([scaled, derived]).sort_index()
+
+
+def compute_metrics(financials, cashflow, balance_sheet, fx_rate: float = 1.0, scale: float = CRORE, periods: int = 4) -> pd.DataFrame:
+    """Single ticker convenience wrapper -> metric x fiscal-year frame."""
+    panel = compute_panel({"_": (financials, cashflow, balance_sheet)}, {"_": fx_rate}, scale, periods)
+    if panel.empty:
+        return panel
+    return panel.xs("_", level="symbol")
+
+
+def cagr(frame: pd.DataFrame) -> pd.Series:
+    """Compound annual growth (%) per row between its first and last non-null, positive year."""
+    values = frame.where(frame > 0).to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=1)
+    first_idx = np.argmax(valid, axis=1)
+    last_idx = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(values.shape[0])
+    first = values[rows, first_idx]
+    last = values[rows, last_idx]
+    # Distance in fiscal years from the "FYxx" labels (columns may skip a year)
+    fiscal_years = np.array([int(str(c)[2:]) if str(c)[2:].isdigit() else i for i, c in enumerate(frame.columns)], dtype=float)
+    years = fiscal_years[last_idx] - fiscal_years[first_idx] if len(fiscal_years) else np.zeros(len(rows))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (np.power(last / first, 1.0 / years) - 1) * 100
+    growth[~has_data | (years <= 0)] = np.nan
+    return pd.Series(growth, index=frame.index)
+
+
+def to_points(frame: pd.DataFrame, metric: str, decimals: int = 1) -> list:
+    """[{"year": "FY24", "value": 123.4}, ...] for one metric row, skipping missing years."""
+    if frame.empty or metric not in frame.index:
+        return []
+    series = frame.loc[metric].dropna().round(decimals)
+    return [{"year": year, "value": value} for year, value in zip(series.index, series.tolist())]
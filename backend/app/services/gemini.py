@@ -1,48 +1,103 @@
 
-import google.generativeai as genai
+import asyncio
+import logging
+import threading
+import time
 from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.telemetry import LLM_REQUESTS, LLM_REQUEST_SECONDS, LLM_TOKENS, REGISTRY
+from app.services.llm_providers import get_llm, get_embedder
+from app.services.scheduler import PriorityDispatcher, PRIORITY_INTERACTIVE, PRIORITY_BATCH
 
-# Configure API
-genai.configure(api_key=settings.GEMINI_API_KEY)
+logger = logging.getLogger(__name__)
+
+genai = lazy_import("google.generativeai")
+_configure_lock = threading.Lock()
+_configured = False
+
+def get_client():
+    """The Gemini SDK, imported and configured on first use rather than at app import."""
+    global _configured
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                _configured = True
+    return genai
 
 # Defaults
 MODEL_PRO = "gemini-2.0-flash" # Updated to available model
 MODEL_FLASH = "gemini-2.0-flash-exp"
 MODEL_EMBED = "text-embedding-004"
 
+# Shared Gemini quota: interactive chat goes ahead of background ingestion
+dispatcher = PriorityDispatcher(
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    batch_min_share=settings.GEMINI_BATCH_MIN_SHARE,
+)
+
 def get_model(model_name: str = MODEL_PRO):
-    return genai.GenerativeModel(model_name)
+    return get_client().GenerativeModel(model_name)
 
-async def generate_content(prompt: str, model_name: str = MODEL_PRO) -> str:
-    model = get_model(model_name)
+def record_usage(response, site: str, model_name: str):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, site=site, model=model_name, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, site=site, model=model_name, kind="response")
+
+async def generate_content(prompt: str, model_name: str = MODEL_PRO, priority: str = PRIORITY_INTERACTIVE, site: str = "other") -> str:
+    """
+    `site` names the caller (e.g. "analyze.draft") for per-call-site telemetry.
+    The call itself goes to the configured provider (LLM_PROVIDER: Gemini or the local fake).
+    """
+    provider = get_llm()
     
     # Retry logic for 429 Resource Exhausted
-    import asyncio
+    # The slot is only held for the call itself so backoff sleeps don't block other requests
     base_delay = 2
     for attempt in range(4):
         try:
-            response = await model.generate_content_async(prompt)
+            async with dispatcher.slot(priority):
+                start = time.perf_counter()
+                try:
+                    response = await provider.generate(prompt, model_name)
+                finally:
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, site=site, model=model_name)
+            LLM_REQUESTS.inc(site=site, model=model_name, outcome="ok")
+            record_usage(response, site, model_name)
             return response.text
         except Exception as e:
             if "429" in str(e) or "Resource exhausted" in str(e):
+                LLM_REQUESTS.inc(site=site, model=model_name, outcome="rate_limited")
                 if attempt == 3:
                      raise e
-                print(f"Gemini 429 Rate Limit. Retrying in {base_delay}s...")
+                logger.warning("Gemini 429 rate limit, retrying", extra={"site": site, "retry_in_s": base_delay})
                 await asyncio.sleep(base_delay)
                 base_delay *= 2
             else:
-                print(f"Error generating content with {model_name}: {e}")
+                LLM_REQUESTS.inc(site=site, model=model_name, outcome="error")
+                logger.error("Gemini generate_content failed", extra={"site": site, "model": model_name, "error": str(e)})
                 raise e
     return "Error: Could not generate content."
 
 async def generate_embeddings(text: str, model_name: str = MODEL_EMBED):
     try:
-        result = genai.embed_content(
-            model=model_name,
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
+        return await get_embedder().embed(text, model_name)
     except Exception as e:
-        print(f"Error generating embeddings: {e}")
+        logger.error("Gemini embedding failed", extra={"model": model_name, "error": str(e)})
         raise e
+
+@REGISTRY.register_collector
+def llm_queue_metrics():
+    stats = dispatcher.stats()
+    families = [("llm_active_calls", "gauge", "Gemini calls in flight", [({}, stats["active"])])]
+    for name, key, kind, help_text in (
+        ("llm_queue_waiting", "queued", "gauge", "Gemini calls waiting for a slot"),
+        ("llm_queue_granted_total", "granted", "counter", "Gemini slots granted"),
+        ("llm_queue_wait_avg_ms", "wait_avg_ms", "gauge", "Average wait for a slot"),
+        ("llm_queue_wait_max_ms", "wait_max_ms", "gauge", "Longest wait for a slot"),
+    ):
+        samples = [({"priority": priority}, values[key]) for priority, values in stats["classes"].items()]
+        families.append((name, kind, help_text, samples))
+    return families
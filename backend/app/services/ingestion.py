@@ -1,16 +1,32 @@
 
+from __future__ import annotations
+
+import asyncio
 import os
-import shutil
 import json
+import logging
 import re
 import csv
+import time
+from contextlib import contextmanager
 from pathlib import Path
-import pdfplumber
-import pypdf
-from app.services.gemini import generate_embeddings, generate_content
-from app.models.schema import DocumentChunk, Filing
+from typing import TYPE_CHECKING
+from app.core.lazy import lazy_import
+from app.services.gemini import generate_embeddings, generate_content, PRIORITY_BATCH
 from app.core.prompts import METRICS_EXTRACTION_PROMPT, VERIFICATION_PROMPT
-from sqlalchemy.orm import Session
+from app.services.verification import verify_metrics_locally, suspect_subset, source_for_pages
+from app.core.database import session_scope, create_filing, bulk_insert_chunks
+from app.core.telemetry import ingest_stage, INGEST_PAGES, INGEST_FILINGS, INGEST_PAGES_PER_SECOND
+from app.services.filing_catalog import FILING_CATALOG
+from app.services.transcripts import TRANSCRIPTS, turn_chunks
+from app.core.memory import MB, MEMORY, FilingMemoryReport, rss_bytes, release_memory
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+pdfplumber = lazy_import("pdfplumber")
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -19,28 +35,33 @@ EXTRACTED_METRICS_DB = {}
 FULL_TEXT_DB = {} # Store raw text for RAG
 VERIFICATION_SHEETS_DB = {} 
 
-def save_upload_file(upload_file, company_ticker: str) -> Path:
-    company_dir = UPLOAD_DIR / company_ticker
-    company_dir.mkdir(exist_ok=True, parents=True)
-    file_path = company_dir / upload_file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-    return file_path
-
 def extract_text_from_pdf(file_path: Path):
+    """
+    Text of every page as [{"page", "text"}]. Pages are closed as soon as their text is out
+    (pdfplumber otherwise keeps every parsed page's layout objects until the file is closed), and the
+    file is reopened every MEMORY.page_batch_size() pages so pdfminer's document caches are dropped too.
+    """
     text_content = []
     try:
         with pdfplumber.open(file_path) as pdf:
-            # User requsted 100% High-Quality Parsing (Requires >1GB RAM)
-            # Analysing entire document with pdfplumber
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    content = f"[Page {i+1}]\n{text}"
-                    text_content.append({"page": i + 1, "text": content})
-                    
+            page_count = len(pdf.pages)
+        start = 0
+        while start < page_count:
+            batch = MEMORY.page_batch_size()
+            rss_before = rss_bytes()
+            with pdfplumber.open(file_path) as pdf:
+                for i in range(start, min(start + batch, page_count)):
+                    page = pdf.pages[i]
+                    text = page.extract_text()
+                    page.close()
+                    if text:
+                        content = f"[Page {i+1}]\n{text}"
+                        text_content.append({"page": i + 1, "text": content})
+            MEMORY.observe_batch(min(batch, page_count - start), rss_bytes() - rss_before)
+            start += batch
+
     except Exception as e:
-        print(f"Error extracting PDF: {e}")
+        logger.error("PDF text extraction failed", extra={"file": str(file_path), "error": str(e)})
     return text_content
 
 def chunk_text(text_pages, chunk_size=1000, overlap=100):
@@ -65,49 +86,79 @@ def chunk_text(text_pages, chunk_size=1000, overlap=100):
         chunks.append({"text": current_chunk, "metadata": current_meta})
     return chunks
 
+def chunk_filing(company_id: str, entry: dict, text_pages: list) -> list:
+    """Transcripts: one chunk per speaker turn, tagged with speaker / role / Q&A exchange. Other filings: chunk_text."""
+    if entry["doc_type"] == "transcript":
+        chunks = turn_chunks(TRANSCRIPTS.turns(company_id, entry, FILING_CATALOG.text(company_id, entry["key"])))
+        if chunks:
+            return chunks
+    return chunk_text(text_pages)
+
 async def extract_financial_metrics(text_chunks, company_id, filename="Annual Report"):
     full_text = "\n".join([c["text"] for c in text_chunks])
     prompt = f"{METRICS_EXTRACTION_PROMPT}\n\n[CONTEXT DOCUMENT: {filename}]\n[TEXT_CONTENT]\n{full_text[:300000]}"
     
     try:
-        response_text = await generate_content(prompt)
+        response_text = await generate_content(prompt, priority=PRIORITY_BATCH, site="ingest.extract_metrics")
         json_match = re.search(r"\{.*\}", response_text, re.DOTALL)
         if json_match:
             metrics = json.loads(json_match.group(0))
             return metrics, full_text
     except Exception as e:
-        print(f"Metrics extraction failed: {e}")
+        logger.error("Metrics extraction failed", extra={"company_id": company_id, "error": str(e)})
         return None, full_text
     return None, full_text
 
-async def verify_extraction(metrics, full_text, company_id):
+def _store_metrics(company_id, metrics):
+    EXTRACTED_METRICS_DB[company_id] = metrics
+    # PERSISTENCE: Save metrics to file so it survives restart
+    try:
+        metrics_path = UPLOAD_DIR / company_id / "metrics.json"
+        with open(metrics_path, "w") as f:
+            json.dump(metrics, f, indent=2)
+        logger.info("Metrics saved", extra={"company_id": company_id, "path": str(metrics_path)})
+    except Exception as e:
+        logger.error("Failed to save metrics.json", extra={"company_id": company_id, "error": str(e)})
+
+async def verify_extraction(metrics, full_text, company_id, text_pages=None):
     if not metrics: return
     
-    # Send metrics + first 50k tokens (likely enough for verification)
-    prompt = f"{VERIFICATION_PROMPT}\n\n[EXTRACTED JSON]\n{json.dumps(metrics, indent=2)}\n\n[SOURCE TEXT]\n{full_text[:50000]}"
+    # 1. Local pass: find each value on its cited page (no LLM call)
+    report = verify_metrics_locally(metrics, text_pages or [])
+    suspect = suspect_subset(metrics, report)
+    metrics["verification"] = report
+    
+    if not suspect:
+        logger.info("All extracted values verified locally, skipping LLM verification", extra={"company_id": company_id})
+        metrics["verified"] = True
+        _store_metrics(company_id, metrics)
+        return
+    
+    # 2. LLM pass on the suspect subset only, with its cited pages at the front of the source
+    suspect_pages = set()
+    for key in suspect:
+        suspect_pages.update(report.get(key, {}).get("pages", []))
+    if text_pages:
+        source_text = source_for_pages(text_pages, suspect_pages)
+    else:
+        source_text = full_text[:50000]
+    prompt = f"{VERIFICATION_PROMPT}\n\n[EXTRACTED JSON]\n{json.dumps(suspect, indent=2)}\n\n[SOURCE TEXT]\n{source_text}"
     
     try:
-        response_text = await generate_content(prompt)
+        response_text = await generate_content(prompt, priority=PRIORITY_BATCH, site="ingest.verify")
         json_match = re.search(r"\{.*\}", response_text, re.DOTALL)
         if json_match:
-            verified_metrics = json.loads(json_match.group(0))
-            verified_metrics["verified"] = True
-            EXTRACTED_METRICS_DB[company_id] = verified_metrics
+            corrected = json.loads(json_match.group(0))
+            for key in suspect:
+                if key != "meta" and isinstance(corrected.get(key), dict):
+                    metrics[key] = corrected[key]
+            metrics["verified"] = True
         else:
             metrics["verified"] = False
-            EXTRACTED_METRICS_DB[company_id] = metrics
-            
-        # PERSISTENCE: Save metrics to file so it survives restart
-        try:
-            metrics_path = UPLOAD_DIR / company_id / "metrics.json"
-            with open(metrics_path, "w") as f:
-                json.dump(EXTRACTED_METRICS_DB[company_id], f, indent=2)
-            print(f"Metrics saved to {metrics_path}")
-        except Exception as e:
-            print(f"Failed to save metrics.json: {e}")
+        _store_metrics(company_id, metrics)
 
     except Exception as e:
-         print(f"Verification failed: {e}")
+         logger.error("Verification failed", extra={"company_id": company_id, "error": str(e)})
          metrics["verified"] = False
          EXTRACTED_METRICS_DB[company_id] = metrics
 
@@ -136,6 +187,8 @@ def generate_evidence_csv(file_path: Path, company_id: str, metrics: dict):
                 if page_num <= len(pdf.pages):
                     page = pdf.pages[page_num - 1] 
                     tables = page.extract_tables()
+                    page_text = page.extract_text() if not tables else None
+                    page.close()
                     
                     if tables:
                          evidence_data.append([f"--- TABLES FROM PAGE {page_num} ({metrics.get('revenue',{}).get('citation','')}) ---"])
@@ -145,10 +198,10 @@ def generate_evidence_csv(file_path: Path, company_id: str, metrics: dict):
                              evidence_data.append([]) # Empty row
                     else:
                         evidence_data.append([f"--- TEXT FROM PAGE {page_num} ---"])
-                        evidence_data.append([page.extract_text()[:500] + "..."])
+                        evidence_data.append([(page_text or "")[:500] + "..."])
                 
     except Exception as e:
-        print(f"Evidence generation failed: {e}")
+        logger.error("Evidence generation failed", extra={"company_id": company_id, "error": str(e)})
 
     # Save CSV
     if evidence_data:
@@ -160,23 +213,96 @@ def generate_evidence_csv(file_path: Path, company_id: str, metrics: dict):
         
         VERIFICATION_SHEETS_DB[company_id] = str(csv_path)
 
-async def process_filing(file_path: Path, company_id: str, filing_id: int, db: Session | None):
-    text_pages = extract_text_from_pdf(file_path)
-    chunks = chunk_text(text_pages)
-    
-    # 1. Extract
-    metrics, full_text = await extract_financial_metrics(chunks, company_id, file_path.name)
-    
+async def persist_filing(session: AsyncSession, file_path: Path, company_id: str, filing_id: int | None, chunks: list,
+                         entry: dict | None = None) -> int:
+    """Filing row (unless the caller already created one, tagged from its catalog `entry`) plus all chunks in executemany batches."""
+    if filing_id is None:
+        entry = entry or {}
+        filing_id = await create_filing(
+            session, company_id, str(file_path), period=entry.get("period"), filing_type=entry.get("doc_label"),
+            fiscal_year=entry.get("fiscal_year"), quarter=entry.get("quarter"),
+            doc_type=entry.get("doc_type"), currency=entry.get("currency"),
+        )
+    inserted = await bulk_insert_chunks(session, company_id, filing_id, chunks)
+    logger.info("Persisted filing", extra={"company_id": company_id, "filing_id": filing_id, "chunks": inserted})
+    return filing_id
 
-    # 2. Verify
-    await verify_extraction(metrics, full_text, company_id)
-    if full_text:
-        FULL_TEXT_DB[company_id] = full_text
-    
-    # 3. Generate Evidence
-    if metrics:
-        generate_evidence_csv(file_path, company_id, metrics)
+@contextmanager
+def _stage(name: str, memory: FilingMemoryReport):
+    with ingest_stage(name), memory.stage(name):
+        yield
+
+async def process_filing(file_path: Path, company_id: str, filing_id: int | None = None, db: AsyncSession | None = None,
+                         stats: dict | None = None, period: str | None = None):
+    """
+    Extract, catalog, chunk, LLM-extract + verify, evidence, persist. Returns the chunk count;
+    `stats`, if given, receives the per-stage memory report under "memory" and the catalog entry under "filing".
+    `period` ("Q2 FY22") overrides the fiscal period read from the file name and text.
+    PDF parsing runs in a worker thread so a large filing doesn't stall the event loop.
+    """
+    started = time.perf_counter()
+    with FilingMemoryReport(file_path.name) as memory:
+        try:
+            with _stage("extract_text", memory):
+                extract_started = time.perf_counter()
+                text_pages = await asyncio.to_thread(extract_text_from_pdf, file_path)
+                extract_seconds = time.perf_counter() - extract_started
+            INGEST_PAGES.inc(len(text_pages))
+            if extract_seconds > 0:
+                INGEST_PAGES_PER_SECOND.set(round(len(text_pages) / extract_seconds, 2))
+            # Period / document type / currency, so retrieval can read just the filings a question is about.
+            # Cataloging writes the text and catalog.json, and transcript segmentation is CPU-bound: both off the loop.
+            entry = await asyncio.to_thread(FILING_CATALOG.register, company_id, file_path, text_pages, period_hint=period)
+            with _stage("chunk", memory):
+                chunks = await asyncio.to_thread(chunk_filing, company_id, entry, text_pages)
+            for chunk in chunks:
+                chunk["metadata"].update(filing_key=entry["key"], period=entry["period"], doc_type=entry["doc_type"])
+
+            # 1. Extract
+            with _stage("extract_metrics", memory):
+                metrics, full_text = await extract_financial_metrics(chunks, company_id, file_path.name)
+
+            # 2. Verify
+            with _stage("verify", memory):
+                await verify_extraction(metrics, full_text, company_id, text_pages)
+            if full_text:
+                FULL_TEXT_DB[company_id] = full_text
+
+            # 3. Generate Evidence
+            if metrics:
+                with _stage("evidence", memory):
+                    await asyncio.to_thread(generate_evidence_csv, file_path, company_id, metrics)
+
+            # 4. Persist (through the caller's session, else our own pooled one; skipped without a DB)
+            with _stage("persist", memory):
+                try:
+                    if db is not None:
+                        await persist_filing(db, file_path, company_id, filing_id, chunks, entry)
+                    else:
+                        async with session_scope() as session:
+                            if session is not None:
+                                await persist_filing(session, file_path, company_id, filing_id, chunks, entry)
+                except Exception as e:
+                    logger.error("Persisting filing failed", extra={"company_id": company_id, "error": str(e)})
+        except Exception:
+            INGEST_FILINGS.inc(outcome="error")
+            raise
+        finally:
+            release_memory() # Hand the parsed pages' memory back before the next job is admitted
 
-    if db:
-        pass
+    INGEST_FILINGS.inc(outcome="ok")
+    if stats is not None:
+        stats["memory"] = memory.view()
+        stats["filing"] = entry
+    logger.info("Filing processed", extra={
+        "company_id": company_id,
+        "file": file_path.name,
+        "period": entry["period"],
+        "doc_type": entry["doc_type"],
+        "pages": len(text_pages),
+        "chunks": len(chunks),
+        "pages_per_second": round(len(text_pages) / extract_seconds, 2) if extract_seconds > 0 else None,
+        "peak_rss_mb": round(memory.peak_rss / MB, 1),
+        "seconds": round(time.perf_counter() - started, 3),
+    })
     return len(chunks)
@@ -0,0 +1,169 @@
+
+import asyncio
+import hashlib
+import json
+import math
+import re
+import types
+from app.core.config import settings
+from app.core.prompts import METRICS_EXTRACTION_PROMPT, VERIFICATION_PROMPT
+
+# Text generation and embedding backends behind app.services.gemini.
+# generate_content keeps the dispatcher, retries and telemetry; the provider only makes the call.
+# "fake" stands in for Gemini without quota or network: deterministic answers shaped like the
+# real ones (metrics JSON with page citations, ticker JSON, markdown prose) after a configurable delay.
+
+EMBED_DIM = 768 # text-embedding-004, and the DocumentChunk.embedding column
+
+
+class GeminiLLM:
+    name = "gemini"
+
+    async def generate(self, prompt: str, model_name: str):
+        """SDK response: `.text` plus `.usage_metadata` token counts."""
+        from app.services.gemini import get_model
+        return await get_model(model_name).generate_content_async(prompt)
+
+
+class GeminiEmbeddings:
+    name = "gemini"
+
+    async def embed(self, text: str, model_name: str) -> list:
+        from app.services.gemini import get_client
+        result = await asyncio.to_thread(get_client().embed_content, model=model_name, content=text, task_type="retrieval_document")
+        return result["embedding"]
+
+
+# --- Local stand-ins ---
+
+PAGE_RE = re.compile(r"\[Page (\d+)\]\n(.*?)(?=\[Page \d+\]|\Z)", re.S)
+NUMBER_RE = re.compile(r"\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+\.\d+")
+METRIC_KEYWORDS = (
+    ("revenue", "revenue"),
+    ("operating_profit", "operating"),
+    ("eps", "earnings per share"),
+    ("cash_flow", "cash"),
+    ("roe", "equity"),
+)
+KNOWN_ISSUERS = {"tata consultancy": "TCS", "infosys": "INFY", "wipro": "WIPRO", "reliance": "RELIANCE"}
+
+
+def fake_metrics(prompt: str) -> dict:
+    """Metrics JSON in the METRICS_EXTRACTION_PROMPT shape: first number on the first page mentioning each metric."""
+    metrics = {"meta": {"currency_symbol": "₹", "currency_unit": "Crores"}, "summary": "Generated by the fake LLM provider."}
+    pages = PAGE_RE.findall(prompt)
+    for key, keyword in METRIC_KEYWORDS:
+        metrics[key] = {"data": [], "citation": ""}
+        for page, text in pages:
+            if keyword in text.lower() and (number := NUMBER_RE.search(text)):
+                metrics[key] = {
+                    "data": [{"year": "FY25", "value": float(number.group(0).replace(",", ""))}],
+                    "citation": f"Filing Page {page}",
+                }
+                break
+    return metrics
+
+
+def fake_ticker(prompt: str) -> dict:
+    lowered = prompt.lower()
+    for name, ticker in KNOWN_ISSUERS.items():
+        if name in lowered:
+            return {"ticker": ticker}
+    return {"ticker": "UNKNOWN"}
+
+
+def fake_prose(prompt: str, tokens: int) -> str:
+    cited = PAGE_RE.search(prompt)
+    page = cited.group(1) if cited else "1"
+    body = ("The filing shows steady growth, with margins supported by operating leverage and a stable deal pipeline. " * (tokens // 18 + 1)).split()
+    return (
+        "**Direct Answer**\n\n" + " ".join(body[: max(tokens - 20, 10)]) + "\n\n"
+        f"**📚 Detailed Sources**\n\n**Source**: Filing (Page {page})"
+    )
+
+
+class FakeLLM:
+    """
+    Deterministic Gemini stand-in. A call takes `latency` seconds plus output tokens / `tokens_per_second`
+    (0 = instant output), so load tests see realistic queueing on the dispatcher without spending quota.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.4, tokens_per_second: float = 150, response_tokens: int = 250):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+
+    def respond(self, prompt: str) -> str:
+        if "[EXTRACTED JSON]" in prompt and VERIFICATION_PROMPT.strip()[:40] in prompt:
+            # Verification: "if the JSON is correct, return it as is"
+            extracted = prompt.split("[EXTRACTED JSON]", 1)[1].split("[SOURCE TEXT]", 1)[0]
+            return extracted.strip()
+        if METRICS_EXTRACTION_PROMPT.strip()[:40] in prompt:
+            return json.dumps(fake_metrics(prompt))
+        if "NSE Ticker" in prompt:
+            return json.dumps(fake_ticker(prompt))
+        return fake_prose(prompt, self.response_tokens)
+
+    async def generate(self, prompt: str, model_name: str):
+        text = self.respond(prompt)
+        output_tokens = max(len(text) // 4, 1)
+        delay = self.latency + (output_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        usage = types.SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=output_tokens)
+        return types.SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class FakeEmbeddings:
+    """Hashed bag-of-words vectors (unit length): deterministic, and texts sharing words land close together."""
+    name = "fake"
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    async def embed(self, text: str, model_name: str) -> list:
+        vector = [0.0] * self.dim
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+# --- Selection (settings), with overrides for benchmarks and tests ---
+
+_llm = None
+_embedder = None
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        if settings.LLM_PROVIDER == "fake":
+            _llm = FakeLLM(
+                latency=settings.FAKE_LLM_LATENCY_MS / 1000,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+                response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+            )
+        else:
+            _llm = GeminiLLM()
+    return _llm
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        _embedder = FakeEmbeddings() if settings.EMBEDDINGS_PROVIDER == "fake" else GeminiEmbeddings()
+    return _embedder
+
+
+def set_llm(provider):
+    global _llm
+    _llm = provider
+
+
+def set_embedder(provider):
+    global _embedder
+    _embedder = provider
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.services.price_store import window_start
+
+yf = lazy_import("yfinance")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Market data backends behind app.api.metrics / compare. A source hands out ticker objects with the
+# slice of yfinance.Ticker the app reads (financials, cashflow, balance_sheet, info, major_holders,
+# news, history()) plus a bulk `download` of closes. All calls are blocking; callers run them in YF_EXECUTOR.
+#
+#   yfinance  live Yahoo data
+#   record    yfinance, saving every dataset read to MARKET_FIXTURES_DIR/<SYMBOL>/<dataset>.json
+#   fixtures  replays those files; tickers without fixtures get deterministic synthetic data,
+#             so load tests run anywhere without network
+
+TICKER_DATASETS = ("financials", "cashflow", "balance_sheet", "info", "major_holders", "news")
+
+
+class YFinanceSource:
+    name = "yfinance"
+
+    def ticker(self, symbol: str):
+        return yf.Ticker(symbol)
+
+    def download(self, symbols: list[str], period: str) -> pd.DataFrame:
+        return yf.download(symbols, period=period, progress=False, threads=True, auto_adjust=True)
+
+
+# --- Fixture files ---
+
+def dump_dataset(value) -> dict:
+    if isinstance(value, pd.DataFrame):
+        return {"kind": "frame", "data": json.loads(value.to_json(orient="split", date_format="iso"))}
+    return {"kind": "json", "data": value}
+
+
+def load_dataset(payload: dict):
+    if payload["kind"] == "frame":
+        return pd.read_json(StringIO(json.dumps(payload["data"])), orient="split", convert_dates=False)
+    return payload["data"]
+
+
+class RecordingTicker:
+    """yfinance Ticker that writes each dataset it returns to the fixtures dir."""
+
+    def __init__(self, ticker, root: Path):
+        self._ticker = ticker
+        self._dir = root / ticker.ticker
+        self.ticker = ticker.ticker
+
+    def _save(self, name: str, value):
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            (self._dir / f"{name}.json").write_text(json.dumps(dump_dataset(value), default=str))
+        except Exception as e:
+            logger.warning("Fixture recording failed", extra={"symbol": self.ticker, "dataset": name, "error": str(e)})
+
+    def __getattr__(self, name):
+        value = getattr(self._ticker, name)
+        if name in TICKER_DATASETS:
+            self._save(name, value)
+        return value
+
+    def history(self, **kwargs):
+        frame = self._ticker.history(**kwargs)
+        if "period" in kwargs: # Whole windows only; incremental start= syncs would overwrite them with a few bars
+            self._save("history", frame)
+        return frame
+
+
+class RecordingSource(YFinanceSource):
+    name = "record"
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def ticker(self, symbol: str):
+        return RecordingTicker(super().ticker(symbol), self.root)
+
+
+# --- Replay ---
+
+def _rng(symbol: str, salt: str) -> random.Random:
+    return random.Random(int.from_bytes(hashlib.sha256(f"{symbol}:{salt}".encode()).digest()[:8], "big"))
+
+
+def synthetic_dataset(symbol: str, name: str):
+    """Plausible, stable values per symbol in yfinance's shapes (absolute INR, newest fiscal year first)."""
+    rng = _rng(symbol, name if name in ("info", "news") else "statements")
+    today = date.today()
+    last_fy = today.year if today.month > 3 else today.year - 1
+    years = [pd.Timestamp(last_fy - i, 3, 31) for i in range(4)]
+    revenue = rng.uniform(5e10, 2.5e12)
+    growth = rng.uniform(0.03, 0.15)
+    margin = rng.uniform(0.12, 0.3)
+    shares = rng.uniform(2e8, 4e9)
+    revenues = [revenue / (1 + growth) ** i for i in range(4)]
+
+    if name == "financials":
+        ebit = [r * margin for r in revenues]
+        net = [e * 0.75 for e in ebit]
+        return pd.DataFrame(
+            [revenues, ebit, net, [n / shares for n in net]],
+            index=["Total Revenue", "EBIT", "Net Income", "Basic EPS"], columns=years,
+        )
+    if name == "cashflow":
+        return pd.DataFrame([[r * margin * 0.9 for r in revenues]], index=["Operating Cash Flow"], columns=years)
+    if name == "balance_sheet":
+        return pd.DataFrame([[r * rng.uniform(0.4, 0.8) for r in revenues]], index=["Stockholders Equity"], columns=years)
+    if name == "major_holders":
+        return pd.DataFrame()
+    if name == "info":
+        price = rng.uniform(100, 5000)
+        return {
+            "longName": f"{symbol.split('.')[0]} Ltd (synthetic)",
+            "currency": "INR",
+            "currentPrice": round(price, 2),
+            "marketCap": round(price * shares),
+            "trailingPE": round(rng.uniform(10, 45), 1),
+            "priceToBook": round(rng.uniform(1, 15), 1),
+            "debtToEquity": round(rng.uniform(0, 120), 1),
+            "returnOnEquity": round(rng.uniform(0.08, 0.45), 3),
+            "grossMargins": round(margin + 0.15, 3),
+            "operatingMargins": round(margin, 3),
+            "heldPercentInsiders": round(rng.uniform(0.3, 0.7), 3),
+            "heldPercentInstitutions": round(rng.uniform(0.1, 0.4), 3),
+            "fiftyTwoWeekHigh": round(price * 1.2, 2),
+            "fiftyTwoWeekLow": round(price * 0.8, 2),
+            "volume": rng.randint(10**5, 10**7),
+            "beta": round(rng.uniform(0.5, 1.5), 2),
+            "sector": "Technology",
+            "industry": "Information Technology Services",
+            "longBusinessSummary": "Synthetic company used for local load testing.",
+        }
+    if name == "news":
+        now = int(time.time())
+        return [
+            {"title": f"{symbol} synthetic headline {i + 1}", "publisher": "Fixture Wire", "link": "#", "providerPublishTime": now - i * 3600}
+            for i in range(5)
+        ]
+    raise KeyError(name)
+
+
+def synthetic_history(symbol: str) -> pd.DataFrame:
+    """Ten years of business-day OHLCV as a seeded random walk."""
+    rng = _rng(symbol, "history")
+    index = pd.bdate_range(end=pd.Timestamp(date.today()), periods=2600)
+    close, rows = rng.uniform(100, 5000), []
+    for _ in index:
+        close *= 1 + rng.gauss(0.0004, 0.015)
+        rows.append((close * 0.995, close * 1.01, close * 0.99, close, rng.randint(10**5, 10**7)))
+    return pd.DataFrame(rows, index=index, columns=["Open", "High", "Low", "Close", "Volume"])
+
+
+class FixtureTicker:
+    def __init__(self, symbol: str, source: FixtureSource):
+        self.ticker = symbol
+        self._source = source
+
+    def __getattr__(self, name):
+        if name in TICKER_DATASETS:
+            return self._source.dataset(self.ticker, name)
+        raise AttributeError(name)
+
+    def history(self, period: str | None = None, start: str | None = None, end: str | None = None, **kwargs) -> pd.DataFrame:
+        frame = self._source.dataset(self.ticker, "history")
+        if period:
+            since = window_start(period)
+            start = since.isoformat() if since else None
+        if start:
+            frame = frame[frame.index >= pd.Timestamp(start)]
+        if end:
+            frame = frame[frame.index < pd.Timestamp(end)]
+        return frame
+
+
+class FixtureSource:
+    name = "fixtures"
+
+    def __init__(self, root: str | Path, latency: float = 0.0, synthesize: bool = True):
+        self.root = Path(root)
+        self.latency = latency
+        self.synthesize = synthesize
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _read(self, symbol: str, name: str):
+        path = self.root / symbol / f"{name}.json"
+        if path.exists():
+            value = load_dataset(json.loads(path.read_text()))
+            if name == "history":
+                value.index = pd.to_datetime(value.index)
+            return value
+        if not self.synthesize:
+            raise LookupError(f"No fixture for {symbol} {name}")
+        return synthetic_history(symbol) if name == "history" else synthetic_dataset(symbol, name)
+
+    def dataset(self, symbol: str, name: str):
+        if self.latency:
+            time.sleep(self.latency) # Blocking like yfinance; runs in the executor
+        key = (symbol, name)
+        with self._lock:
+            if key not in self._loaded:
+                self._loaded[key] = self._read(symbol, name)
+            value = self._loaded[key]
+        return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def ticker(self, symbol: str) -> FixtureTicker:
+        return FixtureTicker(symbol, self)
+
+    def download(self, symbols: list[str], period: str) -> pd.DataFrame:
+        # yf.download layout: (field, symbol) column levels
+        closes = pd.DataFrame({symbol: self.ticker(symbol).history(period=period)["Close"] for symbol in symbols})
+        return pd.concat({"Close": closes}, axis=1)
+
+
+_source = None
+
+
+def market_data():
+    global _source
+    if _source is None:
+        provider = settings.MARKET_DATA_PROVIDER
+        if provider == "fixtures":
+            _source = FixtureSource(settings.MARKET_FIXTURES_DIR, latency=settings.MARKET_FIXTURE_LATENCY_MS / 1000)
+        elif provider == "record":
+            _source = RecordingSource(settings.MARKET_FIXTURES_DIR)
+        else:
+            _source = YFinanceSource()
+    return _source
+
+
+def set_market_data(source):
+    global _source
+    _source = source
@@ -1,5 +1,6 @@
 
 import json
+import logging
 import re
 from app.services.gemini import generate_content, MODEL_PRO
 from app.core.prompts import (
@@ -7,6 +8,8 @@ from app.core.prompts import (
     CONTRADICTION_SYSTEM_PROMPT, GAP_SYSTEM_PROMPT, FINAL_SYSTEM_PROMPT
 )
 
+logger = logging.getLogger(__name__)
+
 def parse_json(text: str):
     """Clean and parse JSON from LLM output."""
     try:
@@ -15,16 +18,16 @@ def parse_json(text: str):
         cleaned_text = re.sub(r"```", "", cleaned_text)
         return json.loads(cleaned_text.strip())
     except Exception as e:
-        print(f"Error parsing JSON: {e}. Text: {text[:100]}...")
+        logger.warning("Could not parse JSON from LLM output", extra={"error": str(e), "text_head": text[:100]})
         return {}
 
 async def run_analysis_agent(context_text: str):
     prompt = f"{ANALYSIS_SYSTEM_PROMPT}\n\n[CONTEXT]\n{context_text}"
-    return await generate_content(prompt)
+    return await generate_content(prompt, site="orchestrator.analysis")
 
 async def run_review_agent(context_text: str, draft_analysis: str):
     prompt = f"{REVIEW_SYSTEM_PROMPT}\n\n[CONTEXT]\n{context_text}\n\n[DRAFT_ANALYSIS]\n{draft_analysis}"
-    response_text = await generate_content(prompt)
+    response_text = await generate_content(prompt, site="orchestrator.review")
     
     # Heuristic: The agent is asked to output REVISED_ANALYSIS, QUALITY_SCORES (json), COMMENTS.
     # It might not be pure JSON. We might need to split.
@@ -47,12 +50,12 @@ async def run_review_agent(context_text: str, draft_analysis: str):
 
 async def run_contradiction_agent(context_text: str, reviewed_analysis: str):
     prompt = f"{CONTRADICTION_SYSTEM_PROMPT}\n\n[CONTEXT]\n{context_text}\n\n[REVIEWED_ANALYSIS]\n{reviewed_analysis}"
-    response_text = await generate_content(prompt)
+    response_text = await generate_content(prompt, site="orchestrator.contradiction")
     return parse_json(response_text)
 
 async def run_gap_agent(context_text: str, reviewed_analysis: str):
     prompt = f"{GAP_SYSTEM_PROMPT}\n\n[CONTEXT]\n{context_text}\n\n[REVIEWED_ANALYSIS]\n{reviewed_analysis}"
-    response_text = await generate_content(prompt)
+    response_text = await generate_content(prompt, site="orchestrator.gap")
     return parse_json(response_text)
 
 async def run_final_agent(context_text: str, reviewed_analysis: str, quality_scores: dict, contradiction_report: dict, gap_report: dict):
@@ -63,7 +66,7 @@ async def run_final_agent(context_text: str, reviewed_analysis: str, quality_sco
         "gap_report": gap_report,
     }
     prompt = f"{FINAL_SYSTEM_PROMPT}\n\n[CONTEXT]\n{context_text}\n\n[AGENT_INPUT]\n{json.dumps(payload, default=str)}"
-    response_text = await generate_content(prompt)
+    response_text = await generate_content(prompt, site="orchestrator.final")
     return parse_json(response_text)
 
 async def orchestrate_analysis(company_name: str, context_data: str):
@@ -0,0 +1,152 @@
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Local daily price history, one SQLite file per ticker.
+# Upstream is only asked for the bars we don't have yet (plus older bars the first time a
+# longer window is requested), so /stock requests become local range reads.
+
+PERIOD_DAYS = {
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+    "max": None,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    date TEXT PRIMARY KEY,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL NOT NULL,
+    volume INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def window_start(period: str):
+    days = PERIOD_DAYS[period]
+    return None if days is None else date.today() - timedelta(days=days)
+
+
+class PriceStore:
+    def __init__(self, root: str | Path, refresh_seconds: float = 30):
+        self.root = Path(root)
+        self.refresh_seconds = refresh_seconds
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol}.sqlite"
+
+    @contextmanager
+    def _connect(self, symbol: str):
+        self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._path(symbol))
+        try:
+            conn.executescript(SCHEMA)
+            with conn: # Commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _meta(self, conn, key: str):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _write(self, conn, df) -> int:
+        """Upserts a yfinance history frame. The latest bar is rewritten because it may have been intraday."""
+        if df is None or df.empty:
+            return 0
+        dates = df.index.strftime("%Y-%m-%d")
+        volume = df["Volume"] if "Volume" in df.columns else [None] * len(df)
+        rows = zip(dates, df["Open"].tolist(), df["High"].tolist(), df["Low"].tolist(), df["Close"].tolist(), volume)
+        conn.executemany(
+            "INSERT OR REPLACE INTO bars (date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?)",
+            [(d, o, h, l, c, int(v) if v == v and v is not None else None) for d, o, h, l, c, v in rows if c == c],
+        )
+        return len(df)
+
+    def sync(self, symbol: str, period: str, fetch_history):
+        """
+        Brings the local store up to date for `period`.
+        `fetch_history(**kwargs)` is the upstream call (e.g. yf.Ticker.history) and receives
+        either `period=` or `start=`/`end=` date strings.
+        """
+        with self._lock(symbol):
+            # Unknown or delisted symbols (upstream returns nothing) don't get a store file
+            initial = None
+            if not self._path(symbol).exists():
+                initial = fetch_history(period=period)
+                if initial is None or initial.empty:
+                    return
+            self._sync(symbol, period, fetch_history, initial)
+
+    def _sync(self, symbol: str, period: str, fetch_history, initial):
+        start = window_start(period)
+        with self._connect(symbol) as conn:
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM bars").fetchone()
+            covered_from = self._meta(conn, "covered_from")
+
+            if first is None:
+                self._write(conn, initial if initial is not None else fetch_history(period=period))
+                self._set_meta(conn, "covered_from", start.isoformat() if start else "max")
+                self._set_meta(conn, "synced_at", time.time())
+                return
+
+            # Backfill once when a longer window than we've ever loaded is requested
+            if covered_from != "max" and (start is None or covered_from is None or start.isoformat() < covered_from):
+                if start is None:
+                    self._write(conn, fetch_history(period="max"))
+                else:
+                    self._write(conn, fetch_history(start=start.isoformat(), end=first))
+                self._set_meta(conn, "covered_from", start.isoformat() if start else "max")
+
+            # Append only what's new since the last bar (throttled to once per refresh interval)
+            synced_at = float(self._meta(conn, "synced_at") or 0)
+            if time.time() - synced_at >= self.refresh_seconds:
+                self._write(conn, fetch_history(start=last))
+                self._set_meta(conn, "synced_at", time.time())
+
+    def read(self, symbol: str, period: str) -> tuple[list, list]:
+        """Columnar (dates, closes) for the window, oldest first. Never creates a store for an unknown symbol."""
+        start = window_start(period)
+        if not self._path(symbol).exists():
+            return [], []
+        with self._connect(symbol) as conn:
+            if start is None:
+                rows = conn.execute("SELECT date, close FROM bars ORDER BY date").fetchall()
+            else:
+                rows = conn.execute("SELECT date, close FROM bars WHERE date >= ? ORDER BY date", (start.isoformat(),)).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def load(self, symbol: str, period: str, fetch_history) -> tuple[list, list]:
+        """Sync then read. If upstream fails we still serve whatever is stored locally."""
+        try:
+            self.sync(symbol, period, fetch_history)
+        except Exception as e:
+            logger.warning("Price store sync failed", extra={"symbol": symbol, "error": str(e)})
+        return self.read(symbol, period)
@@ -0,0 +1,120 @@
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Priority classes for LLM traffic.
+# Interactive = user is waiting on the response (/analyze, upload detection).
+# Batch = background ingestion (metrics extraction, verification).
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class PriorityDispatcher:
+    """
+    Hands out a fixed number of concurrent LLM slots.
+    Queued interactive requests are served before queued batch requests, but while
+    batch work is waiting it is guaranteed at least `batch_min_share` of the grants
+    so ingestion is never starved by a busy chat session.
+    """
+
+    def __init__(self, max_concurrency: int = 4, batch_min_share: float = 0.2):
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_min_share = min(max(batch_min_share, 0.0), 1.0)
+        # After this many interactive grants in a row (with batch waiting) a batch request goes next
+        self._interactive_burst = math.ceil(1 / self.batch_min_share) - 1 if self.batch_min_share > 0 else None
+        self._interactive_streak = 0
+        self._active = 0
+        self._waiters = {p: deque() for p in PRIORITIES}
+        self._stats = {p: {"granted": 0, "wait_total": 0.0, "wait_max": 0.0} for p in PRIORITIES}
+
+    def _record_wait(self, priority: str, waited: float):
+        stats = self._stats[priority]
+        stats["granted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def _next_priority(self):
+        interactive_waiting = bool(self._waiters[PRIORITY_INTERACTIVE])
+        batch_waiting = bool(self._waiters[PRIORITY_BATCH])
+        if not batch_waiting:
+            return PRIORITY_INTERACTIVE if interactive_waiting else None
+        if not interactive_waiting:
+            return PRIORITY_BATCH
+        # Both classes queued: interactive wins unless batch has used up its patience
+        if self._interactive_burst is not None and self._interactive_streak >= self._interactive_burst:
+            return PRIORITY_BATCH
+        return PRIORITY_INTERACTIVE
+
+    def _grant(self, priority: str):
+        if priority == PRIORITY_INTERACTIVE:
+            self._interactive_streak += 1
+        else:
+            self._interactive_streak = 0
+        self._active += 1
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            future, enqueued_at = self._waiters[priority].popleft()
+            if future.done():  # Cancelled while queued
+                continue
+            self._grant(priority)
+            self._record_wait(priority, time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE):
+        if priority not in self._waiters:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        # Fast path: free slot and nobody ahead of us
+        if self._active < self.max_concurrency and not any(self._waiters.values()):
+            self._grant(priority)
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic())
+        self._waiters[priority].append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation, hand it back
+                self.release()
+            else:
+                try:
+                    self._waiters[priority].remove(entry)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        report = {"active": self._active, "max_concurrency": self.max_concurrency, "classes": {}}
+        for priority in PRIORITIES:
+            stats = self._stats[priority]
+            granted = stats["granted"]
+            report["classes"][priority] = {
+                "queued": len(self._waiters[priority]),
+                "granted": granted,
+                "wait_avg_ms": round(stats["wait_total"] / granted * 1000, 1) if granted else 0.0,
+                "wait_max_ms": round(stats["wait_max"] * 1000, 1),
+            }
+        return report
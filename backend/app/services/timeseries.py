@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from app.services.filing_catalog import FILING_CATALOG, parse_periods, period_label
+
+logger = logging.getLogger(__name__)
+
+# Quarterly KPI time series read from the recurring parts of fact sheets and press releases:
+# the "Performance Highlights" bullets (revenue, margins, headcount, attrition, TCV) and the
+# vertical / market tables (revenue mix and constant-currency growth). Charts and period
+# comparisons are served from these arrays without an LLM call.
+#
+# Tables are read from text lines (the PDF charts extract as scrambled glyphs, the tables as rows);
+# where a quarter's table is not legible the press release's "BFSI grew 3.1%" sentences fill growth in.
+# Stored per company as <root>/<company>/timeseries.json next to the filing catalog: one period axis
+# and, per metric, a value array and a source-filing array aligned to it. Rebuilt when the catalog changes.
+
+SOURCE_TYPES = ("fact_sheet", "press_release") # In order of preference when both give a value
+
+NUM = r"(\(?-?\s?[\d,]+(?:\.\d+)?\)?)"
+KPIS = (
+    ("revenue_inr_mn", "Revenue (INR Mn)", "INR Mn", re.compile(r"INR Revenue of \D{0,4}" + NUM + r" ?Mn")),
+    ("revenue_inr_yoy_pct", "Revenue growth YoY (INR)", "%", re.compile(r"INR Revenue of .*?\b(up|down) ([\d.]+)% ?YoY")),
+    ("revenue_usd_mn", "Revenue (USD Mn)", "USD Mn", re.compile(r"USD Revenue of \D{0,4}" + NUM + r" ?Mn")),
+    ("revenue_usd_yoy_pct", "Revenue growth YoY (USD)", "%", re.compile(r"USD Revenue of .*?\b(up|down) ([\d.]+)% ?YoY")),
+    ("cc_growth_yoy_pct", "Constant currency growth YoY", "%", re.compile(r"Constant currency revenue .*?\b(up|down) ([\d.]+)% ?YoY")),
+    ("cc_growth_qoq_pct", "Constant currency growth QoQ", "%", re.compile(r"Constant currency revenue .*?\b(up|down) ([\d.]+)% ?QoQ")),
+    ("operating_margin_pct", "Operating margin", "%", re.compile(r"Operating Margin (?:at|of) ([\d.]+)%")),
+    ("net_margin_pct", "Net margin", "%", re.compile(r"Net Margin (?:at|of) ([\d.]+)%")),
+    ("cash_conversion_pct", "Operating cash flow / net profit", "%", re.compile(r"Cash flow from operations at ([\d.]+)% of net profit")),
+    ("tcv_usd_bn", "Order book TCV (USD Bn)", "USD Bn", re.compile(r"Order book TCV at \$ ?([\d.]+) ?Bn")),
+    ("headcount", "Closing headcount", "employees", re.compile(r"(?:closing headcount|Employee Headcount):? " + NUM, re.I)),
+    ("net_additions", "Net additions in the quarter", "employees", re.compile(r"Net addition of " + NUM + r" associates(?! YoY)")),
+    ("attrition_ltm_pct", "LTM attrition (IT services)", "%", re.compile(r"LTM (?:IT Services )?attrition (?:rate )?at ([\d.]+)%", re.I)),
+)
+SEGMENTS = (
+    ("vertical", "bfsi", "BFSI", r"BFSI"),
+    ("vertical", "retail_cpg", "Retail & CPG", r"Retail (?:&|and) CPG"),
+    ("vertical", "consumer_business", "Consumer Business", r"Consumer Business(?: Group)?(?: \(CBG\))?"),
+    ("vertical", "life_sciences_healthcare", "Life Sciences & Healthcare", r"Life Sciences (?:&|and) Healthcare"),
+    ("vertical", "manufacturing", "Manufacturing", r"Manufacturing"),
+    ("vertical", "technology_services", "Technology & Services", r"Technology (?:&|and) Services"),
+    ("vertical", "communication_media", "Communication & Media", r"Communications? (?:&|and) Media"),
+    ("vertical", "energy_resources_utilities", "Energy, Resources & Utilities", r"Energy,? Resources,? (?:(?:&|and) Utilities|and|&)"),
+    ("vertical", "regional_markets", "Regional Markets & Others", r"Regional Markets(?: (?:&|and) Others)?"),
+    ("market", "north_america", "North America", r"North America"),
+    ("market", "latin_america", "Latin America", r"Latin America"),
+    ("market", "uk", "UK", r"UK|United Kingdom"),
+    ("market", "continental_europe", "Continental Europe", r"Continental Europe"),
+    ("market", "asia_pacific", "Asia Pacific", r"Asia Pacific"),
+    ("market", "india", "India", r"India"),
+    ("market", "mea", "Middle East & Africa", r"MEA|Middle East (?:&|and) Africa"),
+)
+SEGMENT_RE = re.compile("|".join(f"(?P<{key}>{pattern})" for _, key, _, pattern in SEGMENTS))
+TABLE_ROW_RE = re.compile(rf"^(?:{SEGMENT_RE.pattern})(?=(?:\s+-?\s?\d+(?:\.\d+)?){{3,}}\s*$)")
+GROWTH_CUE_RE = re.compile(r"grew|grow|declin|led with|\(")
+GROWTH_RE = re.compile(r"([+-]?\s?\d+(?:\.\d+)?)%\s*(QoQ|YoY)?")
+ANNUAL_RE = re.compile(r"full[- ]year|for the year|\bFY ?20\d\d\b|fiscal 20\d\d", re.I)
+HIGHLIGHTS_RE = re.compile(r"^Q[1-4] FY ?\d{2} Performance Highlights")
+
+
+def _number(text: str) -> float | None:
+    text = text.replace(",", "").replace(" ", "")
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        value = float(text.strip("()"))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def metric_catalog() -> dict:
+    """Every metric name -> (label, unit, group)."""
+    metrics = {name: (label, unit, "kpi") for name, label, unit, _ in KPIS}
+    for kind, key, label, _ in SEGMENTS:
+        metrics[f"{kind}.{key}.share_pct"] = (f"{label} share of revenue", "%", kind)
+        metrics[f"{kind}.{key}.cc_growth_yoy_pct"] = (f"{label} constant currency growth YoY", "%", kind)
+    return metrics
+
+
+def _highlight_lines(text: str, doc_type: str) -> list:
+    """The quarter's highlight bullets: the "Qn FYxx Performance Highlights" page of a fact sheet, the first page of a press release."""
+    lines = text.splitlines()
+    if doc_type == "fact_sheet":
+        start = next((i for i, line in enumerate(lines) if HIGHLIGHTS_RE.match(line.strip())), None)
+        if start is None:
+            return []
+        end = next((i for i in range(start + 1, len(lines)) if lines[i].startswith("[Page")), len(lines))
+        return lines[start:end]
+    end = next((i for i, line in enumerate(lines[1:], 1) if line.startswith("[Page")), len(lines))
+    return lines[:end]
+
+
+def extract_kpis(text: str, doc_type: str) -> dict:
+    values = {}
+    for line in _highlight_lines(text, doc_type):
+        for name, _, _, pattern in KPIS:
+            if name in values:
+                continue
+            match = pattern.search(line)
+            if not match:
+                continue
+            if len(match.groups()) == 2: # (up|down, magnitude)
+                value = float(match.group(2)) * (-1 if match.group(1) == "down" else 1)
+            else:
+                value = _number(match.group(1))
+            if value is not None:
+                values[name] = value
+    return values
+
+
+def _segment_key(match) -> str:
+    return next(key for key, value in match.groupdict().items() if value)
+
+
+def extract_segment_tables(text: str, period: str | None = None) -> dict:
+    """
+    {(kind, key): (share_pct, cc_growth_yoy_pct)} from vertical / market table rows ("BFSI 30.8 32.0 32.2 1.1 1.0").
+    Columns follow the table header: one mix column per quarter it lists (the one for `period`, else the
+    latest, is read), then the growth columns, Q-o-Q first when there is one.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        # A label wrapped over its numbers ("Energy, Resources and" / "5.6 5.7 7.0" / "Utilities")
+        if lines and re.fullmatch(r"[-\d.\s]+", line) and not re.search(r"\d$", lines[-1]):
+            lines[-1] = f"{lines[-1]} {line}"
+        else:
+            lines.append(line)
+    kinds = {key: kind for kind, key, _, _ in SEGMENTS}
+    rows, columns, qoq = {}, [], False
+    for line in lines:
+        match = TABLE_ROW_RE.match(line)
+        if not match:
+            quarters = re.findall(r"Q[1-4] FY ?\d{2}", line)
+            if len(quarters) > 1:
+                columns = [q.replace("FY ", "FY") for q in quarters]
+            if "Y-o-Y" in line:
+                qoq = "Q-o-Q" in line
+            continue
+        numbers = [_number(n) for n in re.findall(r"-?\d+(?:\.\d+)?", re.sub(r"-\s+(?=\d)", "-", line[match.end(_segment_key(match)):]))]
+        shares = len(columns) or 2
+        if len(numbers) < shares + 1:
+            continue
+        share = numbers[columns.index(period) if period in columns else shares - 1]
+        growth = numbers[shares + 1] if qoq and len(numbers) > shares + 1 else numbers[shares]
+        key = _segment_key(match)
+        rows.setdefault((kinds[key], key), (share, growth))
+    return rows
+
+
+def extract_segment_growth(text: str) -> dict:
+    """
+    {(kind, key): cc_growth_yoy_pct} from press release sentences: "BFSI grew +13.9%",
+    "Manufacturing which grew 5.8%", "BFSI (+3.1% QoQ, +19.3% YoY)". Full-year sentences are skipped.
+    """
+    start = text.find("Segment Highlights") # Headline bullets of a Q4 release mix in full-year figures
+    flat = re.sub(r"Page \d+ of \d+\s*\[Page \d+\]", " ", text[max(start, 0):])
+    flat = re.sub(r"\s+", " ", flat)
+    flat = re.sub(r"(\d)\. (\d)", r"\1.\2", flat) # Decimals broken across lines
+    flat = re.sub(r"\(ex [^)]*\)", "", flat) # "Industry Verticals (ex Regional Markets & Others) grow ..."
+    kinds = {key: kind for kind, key, _, _ in SEGMENTS}
+    growth = {}
+    for sentence in re.split(r"(?<=[.;])\s+(?=[A-Z])|\s[-•➢]\s", flat): # Sentences and headline bullets
+        if ANNUAL_RE.search(sentence):
+            continue
+        labels = list(SEGMENT_RE.finditer(sentence))
+        for i, match in enumerate(labels):
+            key = _segment_key(match)
+            if (kinds[key], key) in growth:
+                continue
+            window = sentence[match.end(): labels[i + 1].start() if i + 1 < len(labels) else len(sentence)]
+            cue = GROWTH_CUE_RE.search(window)
+            if not cue:
+                continue
+            found = [(_number(m.group(1)), m.group(2)) for m in GROWTH_RE.finditer(window, cue.start())]
+            found = [f for f in found if f[0] is not None and f[1] != "QoQ"]
+            if not found:
+                continue
+            value = next((f for f in found if f[1] == "YoY"), found[0])[0]
+            growth[(kinds[key], key)] = -abs(value) if cue.group(0) == "declin" else value
+    return growth
+
+
+def extract_filing(entry: dict, text: str) -> dict:
+    """{metric: value} for one fact sheet or press release."""
+    values = extract_kpis(text, entry["doc_type"])
+    for (kind, key), (share, growth) in extract_segment_tables(text, entry["period"]).items():
+        values[f"{kind}.{key}.share_pct"] = share
+        values[f"{kind}.{key}.cc_growth_yoy_pct"] = growth
+    if entry["doc_type"] == "press_release":
+        for (kind, key), growth in extract_segment_growth(text).items():
+            values.setdefault(f"{kind}.{key}.cc_growth_yoy_pct", growth)
+    return {name: value for name, value in values.items() if value is not None}
+
+
+class TimeSeriesStore:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._tables = {} # company_id -> table, see build()
+
+    def _path(self, company_id: str) -> Path:
+        return self.catalog.root / company_id / "timeseries.json"
+
+    def _signature(self, filings: dict) -> str:
+        sources = sorted((f["key"], f["indexed_at"]) for f in filings.values() if f["doc_type"] in SOURCE_TYPES)
+        return f"{len(sources)}:{max((at for _, at in sources), default=0)}"
+
+    def get(self, company_id: str) -> dict | None:
+        """The company's table, rebuilt (and saved) when its fact sheets / press releases changed. None without any."""
+        filings = self.catalog.company_filings(company_id)
+        if not any(f["doc_type"] in SOURCE_TYPES and f["quarter"] for f in filings.values()):
+            return None
+        signature = self._signature(filings)
+        table = self._tables.get(company_id)
+        if table is None and self._path(company_id).exists():
+            try:
+                table = json.loads(self._path(company_id).read_text())
+            except (OSError, ValueError):
+                table = None
+        if table is None or table.get("signature") != signature:
+            table = self.build(company_id, filings, signature)
+            path = self._path(company_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(table))
+            tmp.replace(path)
+        self._tables[company_id] = table
+        return table
+
+    def build(self, company_id: str, filings: dict, signature: str) -> dict:
+        """
+        {company_id, signature, built_at, periods: ["Q1 FY22", ...], metrics: {name: {label, unit, group,
+        values: [...], sources: [filing key, ...]}}}, arrays aligned to `periods`, oldest first.
+        """
+        started = time.perf_counter()
+        sources = sorted(
+            (f for f in filings.values() if f["doc_type"] in SOURCE_TYPES and f["fy"] and f["quarter"]),
+            # Fact sheet before press release, INR before USD twin: the first value found for a period wins
+            key=lambda f: (f["fy"], f["quarter"], SOURCE_TYPES.index(f["doc_type"]), f["currency"] != "INR", f["key"]),
+        )
+        axis = sorted({(f["fy"], f["quarter"]) for f in sources})
+        index = {period: i for i, period in enumerate(axis)}
+        catalog = metric_catalog()
+        metrics = {}
+        for f in sources:
+            i = index[(f["fy"], f["quarter"])]
+            for name, value in extract_filing(f, self.catalog.text(company_id, f["key"])).items():
+                label, unit, group = catalog[name]
+                metric = metrics.setdefault(name, {"label": label, "unit": unit, "group": group,
+                                                   "values": [None] * len(axis), "sources": [None] * len(axis)})
+                if metric["values"][i] is None:
+                    metric["values"][i] = value
+                    metric["sources"][i] = f["key"]
+        ordered = {name: metrics[name] for name in catalog if name in metrics}
+        logger.info("Time series built", extra={
+            "company_id": company_id,
+            "filings": len(sources),
+            "periods": len(axis),
+            "metrics": len(ordered),
+            "values": sum(v is not None for m in ordered.values() for v in m["values"]),
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+        return {
+            "company_id": company_id,
+            "signature": signature,
+            "built_at": time.time(),
+            "periods": [period_label(fy, q) for fy, q in axis],
+            "metrics": ordered,
+        }
+
+    def series(self, company_id: str, metrics: list | None = None, periods: list | None = None,
+               start: tuple | None = None, end: tuple | None = None) -> dict | None:
+        """
+        Slice of the table. `metrics` are names or "group.*" / "vertical.bfsi.*" prefixes (default: the KPIs);
+        `periods` ((fy, quarter) pairs) picks quarters to compare, `start` / `end` bound a range. Each metric
+        also gets its change from the first to the last value in the slice. None if the company has no table.
+        """
+        table = self.get(company_id)
+        if table is None:
+            return None
+        wanted = metrics or ["kpi.*"]
+        names = [
+            name for name, metric in table["metrics"].items()
+            if any(name == w or (w.endswith(".*") and (name.startswith(w[:-1]) or metric["group"] == w[:-2])) for w in wanted)
+        ]
+        axis = [parse_periods(label)[0] for label in table["periods"]]
+        keep = [
+            i for i, period in enumerate(axis)
+            if (not periods or period in periods) and (not start or period >= start) and (not end or period <= end)
+        ]
+        sliced = {}
+        for name in names:
+            metric = table["metrics"][name]
+            values = [metric["values"][i] for i in keep]
+            present = [(table["periods"][i], v) for i, v in zip(keep, values) if v is not None]
+            sliced[name] = {
+                **{k: v for k, v in metric.items() if k not in ("values", "sources")},
+                "values": values,
+                "sources": [metric["sources"][i] for i in keep],
+                "change": {
+                    "from": present[0][0],
+                    "to": present[-1][0],
+                    "change": round(present[-1][1] - present[0][1], 2),
+                } if len(present) > 1 else None,
+            }
+        return {"company_id": company_id, "periods": [table["periods"][i] for i in keep], "metrics": sliced}
+
+
+TIMESERIES = TimeSeriesStore(FILING_CATALOG)
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+from collections import Counter
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Earnings call transcripts split into speaker turns, each tagged with its role (management / analyst /
+# moderator), the speaker's title (CEO, CFO, ...) or firm, the section (presentation / Q&A), the Q&A
+# exchange it belongs to and its page. Questions about a call are answered from the few turns that
+# match instead of the whole document: "what did the CFO say about margins across FY22-FY25" reads
+# the CFO's margin turns from 16 calls rather than 16 full transcripts.
+
+SPEAKER_RE = re.compile(r"^(?:(?:Mr|Ms|Mrs|Dr)\.?\s+)?([A-Z][A-Za-z.'’-]*(?:\s+[A-Z][A-Za-z.'’-]*){0,4})\s*:\s*(.*)$")
+NOT_SPEAKERS = {"Note", "Page", "Sub", "Encl", "Symbol", "Tel", "Disclaimer", "Source", "Date", "Time", "Subject"}
+MODERATORS = {"Moderator", "Operator"}
+PAGE_RE = re.compile(r"^\[Page (\d+)\]$")
+PAGE_FOOTER_RE = re.compile(r"^:?\s*Page \d+ of \d+\s*$")
+QA_START_RE = re.compile(r"question[- ]and[- ]answer|question & answer|\bq\s*&\s*a\b|first question", re.I)
+ANALYST_INTRO_RE = re.compile(
+    r"(?:line of|question (?:is )?from)\s+(?:(?:Mr|Ms|Mrs|Dr)\.?\s+)?"
+    r"([A-Z][\w.'’-]*(?:\s+[A-Z][\w.'’-]*){0,3})\s+(?:from|of|with)\s+([A-Z][\w&.'’ -]*?)\s*(?:[.,]|please|$)",
+)
+HONORIFIC_RE = re.compile(r"\b(?:mr|ms|mrs|dr) ")
+TITLES = (
+    ("CEO", re.compile(r"\bchief executive officer|\bceo\b", re.I)),
+    ("CFO", re.compile(r"\bchief financial officer|\bcfo\b", re.I)),
+    ("COO", re.compile(r"\bchief operating officer|\bcoo\b", re.I)),
+    ("CHRO", re.compile(r"\bchief (?:hr|human resources?) officer|\bchro\b|\bhead,? (?:of )?hr\b", re.I)),
+    ("CTO", re.compile(r"\bchief technology officer|\bcto\b", re.I)),
+    ("IR", re.compile(r"investor relations", re.I)),
+    ("President", re.compile(r"\bpresident\b", re.I)),
+)
+QUERY_TITLES = tuple((title, pattern) for title, pattern in TITLES if title != "President") + (
+    ("CHRO", re.compile(r"\bhr head\b|\bhuman resources\b", re.I)),
+)
+QUERY_MANAGEMENT_RE = re.compile(r"\bmanagement\b|\bleadership\b|\bexecutives?\b", re.I)
+QUERY_ANALYST_RE = re.compile(r"\banalysts?\b|\bbrokers?\b|\basked\b", re.I)
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9&'-]+")
+STOPWORDS = set("""
+a an and are as at be been but by can could did do does for from had has have how i in into is it its
+let me more most much my no not of on or our over so some such than that the their them then there these
+they this those to up us very was we were what when where which while who why will with would you your
+about across also any between during each just like over per since through under until upon
+say says said saying talk talked talking tell told mention mentioned comment comments commentary discuss discussed
+call calls conference earnings transcript quarter quarters year years fiscal fy q1 q2 q3 q4 h1 h2
+management leadership executive executives analyst analysts asked ask question questions answer answers
+ceo cfo coo chro cto ir
+""".split())
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> list:
+    return [_stem(w) for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS and not any(c.isdigit() for c in w)]
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"[^\w&]+", " ", text).strip().lower()
+
+
+def _running_lines(pages: list) -> set:
+    """Page headers: lines found at the top of at least half the pages (company name, call date)."""
+    counts = Counter()
+    for lines in pages:
+        counts.update({line.strip() for line in lines[:3] if line.strip()})
+    threshold = max(3, len(pages) // 2)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def segment_transcript(text: str) -> list:
+    """
+    Turns of a transcript as dicts: n, speaker, role, title, firm, section, exchange, page, text.
+    Anything before the first moderator/operator turn (cover letters, headers) is skipped.
+    """
+    pages, current = [], None
+    for line in text.splitlines():
+        match = PAGE_RE.match(line.strip())
+        if match:
+            current = (int(match.group(1)), [])
+            pages.append(current)
+        elif current is not None:
+            current[1].append(line)
+        else:
+            current = (1, [line])
+            pages.append(current)
+    headers = _running_lines([lines for _, lines in pages])
+
+    turns, started = [], False
+    for page, lines in pages:
+        for line in lines:
+            line = line.strip()
+            if not line or line in headers or PAGE_FOOTER_RE.match(line):
+                continue
+            match = SPEAKER_RE.match(line)
+            speaker = re.sub(r"\.\s*|\s+", " ", match.group(1)).strip() if match else None
+            if speaker and speaker not in NOT_SPEAKERS and not any(c.isdigit() for c in speaker):
+                if speaker in MODERATORS:
+                    started = True
+                if started:
+                    turns.append({"speaker": "Moderator" if speaker in MODERATORS else speaker, "page": page, "label": line, "lines": [match.group(2)]})
+                    continue
+            if started and turns:
+                turns[-1]["lines"].append(line)
+
+    # A label is a speaker if the moderator or the host (the first to speak after them, usually
+    # investor relations) names them; anything else ("BFSI:", "Scaling AI:" in a list of
+    # highlights) is part of the turn it sits in
+    host = next((t["speaker"] for t in turns if t["speaker"] != "Moderator"), None)
+    named = " " + _norm(" ".join(line for t in turns if t["speaker"] in ("Moderator", host) for line in t["lines"])) + " "
+    words = set(named.split())
+
+    def is_speaker(label: str) -> bool:
+        # Exact, a misspelt surname after a first name the moderator used ("Nitin Padmanbhan"),
+        # or an initial before a surname they used ("D Mazumdar" for Debashish Mazumdar)
+        parts = _norm(label).split()
+        if f" {' '.join(parts)} " in named:
+            return True
+        return len(parts) > 1 and (len(parts[0]) > 2 and parts[0] in words or len(parts[0]) == 1 and parts[-1] in words)
+
+    merged = []
+    for turn in turns:
+        speaker = turn["speaker"]
+        if merged and speaker != "Moderator" and not is_speaker(speaker):
+            merged[-1]["lines"].extend([turn["label"]] + turn["lines"][1:])
+        elif merged and merged[-1]["speaker"] == speaker: # Label repeated after a page break
+            merged[-1]["lines"].extend(turn["lines"])
+        else:
+            merged.append(turn)
+    for turn in merged:
+        del turn["label"]
+    return _tag(merged)
+
+
+def _tag(turns: list) -> list:
+    intro, qa_start = [], None
+    for i, turn in enumerate(turns):
+        turn["text"] = re.sub(r"\s+", " ", " ".join(turn.pop("lines"))).strip()
+        if qa_start is None and turn["speaker"] == "Moderator" and i > 0 and QA_START_RE.search(turn["text"]):
+            qa_start = i
+        if qa_start is None:
+            intro.append(turn["text"])
+    intro = f" {_norm(' '.join(intro))} "
+
+    # Analysts are announced by the moderator ("the next question is from the line of X from Y")
+    firms = {}
+    for turn in turns:
+        if turn["speaker"] == "Moderator":
+            for name, firm in ANALYST_INTRO_RE.findall(turn["text"]):
+                firms[_norm(name)] = firm.strip()
+
+    presenters = {t["speaker"] for t in turns[:qa_start] if t["speaker"] != "Moderator"} if qa_start else set()
+    titles = {}
+    for speaker in {t["speaker"] for t in turns} - {"Moderator"}:
+        position = intro.find(f" {_norm(speaker)} ")
+        if position < 0:
+            continue
+        window = intro[position + len(_norm(speaker)) + 2:][:160]
+        cut = HONORIFIC_RE.search(window)
+        window = window[:cut.start()] if cut else window[:100]
+        found = [(m.start(), title) for title, pattern in TITLES for m in [pattern.search(window)] if m]
+        if found:
+            titles[speaker] = min(found)[1]
+
+    exchange = 0
+    for n, turn in enumerate(turns):
+        speaker = turn["speaker"]
+        in_qa = qa_start is not None and n >= qa_start
+        if speaker == "Moderator":
+            role = "moderator"
+            if in_qa:
+                exchange += 1
+        elif _norm(speaker) in firms and speaker not in titles:
+            role = "analyst"
+        elif speaker in titles or speaker in presenters:
+            role = "management"
+        else:
+            role = "analyst"
+        turn.update(
+            n=n,
+            role=role,
+            title=titles.get(speaker),
+            firm=firms.get(_norm(speaker)) if role == "analyst" else None,
+            section="qa" if in_qa else "presentation",
+            exchange=exchange if in_qa else None,
+        )
+    return turns
+
+
+def turn_chunks(turns: list, max_chars: int = 4000) -> list:
+    """Chunks for persistence, one per turn (long turns split at sentence ends), with the turn's tags as metadata."""
+    chunks = []
+    for turn in turns:
+        if turn["role"] == "moderator" or len(turn["text"]) < 40: # Greetings and thanks
+            continue
+        meta = {k: turn[k] for k in ("speaker", "role", "title", "firm", "section", "exchange")}
+        meta.update(pages=[turn["page"]], turn=turn["n"])
+        text, parts = turn["text"], []
+        while len(text) > max_chars:
+            cut = text.rfind(". ", 0, max_chars) + 1 or max_chars
+            parts.append(text[:cut])
+            text = text[cut:].lstrip()
+        parts.append(text)
+        for part in parts:
+            chunks.append({"text": f"{turn['speaker']}: {part}", "metadata": dict(meta)})
+    return chunks
+
+
+def speaker_filter(question: str, turns: list) -> dict:
+    """Titles, speaker names and roles the question restricts to ("the CFO", "Krithivasan", "analysts")."""
+    words = set(re.findall(r"[a-z]+", question.lower()))
+    names = {
+        t["speaker"] for t in turns
+        if t["role"] != "moderator" and any(len(part) >= 4 and part in words for part in _norm(t["speaker"]).split())
+    }
+    titles = {title for title, pattern in QUERY_TITLES if pattern.search(question)}
+    roles = set()
+    if QUERY_MANAGEMENT_RE.search(question):
+        roles.add("management")
+    if QUERY_ANALYST_RE.search(question):
+        roles.add("analyst")
+    return {"titles": titles, "names": names, "roles": roles}
+
+
+def _allowed(turn: dict, wanted: dict) -> bool:
+    if turn["role"] == "moderator":
+        return False
+    if wanted["titles"] or wanted["names"]:
+        return turn["title"] in wanted["titles"] or turn["speaker"] in wanted["names"]
+    return not wanted["roles"] or turn["role"] in wanted["roles"]
+
+
+class TranscriptIndex:
+    """Segmented turns per cataloged transcript, cached until the filing is re-indexed."""
+
+    def __init__(self, max_turns: int):
+        self.max_turns = max_turns
+        self._turns = {} # (company_id, filing key) -> (indexed_at, turns)
+
+    def turns(self, company_id: str, entry: dict, text: str) -> list:
+        key = (company_id, entry["key"])
+        cached = self._turns.get(key)
+        if cached is None or cached[0] != entry.get("indexed_at"):
+            turns = segment_transcript(text)
+            for turn in turns:
+                turn["terms"] = Counter(terms(turn["text"]))
+            cached = (entry.get("indexed_at"), turns)
+            self._turns[key] = cached
+        return cached[1]
+
+    def search(self, question: str, calls: list, max_turns: int | None = None,
+               speaker: str | None = None, role: str | None = None) -> tuple[list, dict]:
+        """
+        Best turns for `question` across `calls` ([(entry, turns)]) as [(entry, turn, score)], plus the
+        speaker filter applied. BM25 over turn text; speaker constraints (from the question, or `speaker`
+        as a name or title and `role`) are hard filters. With a speaker constraint but no topic words,
+        that speaker's turns are returned in call order.
+        """
+        max_turns = max_turns or self.max_turns
+        every = [turn for _, turns in calls for turn in turns]
+        wanted = speaker_filter(question, every)
+        if speaker:
+            wanted["titles"] |= {title for title, _ in TITLES if title.lower() == speaker.lower()}
+            wanted["names"] |= {t["speaker"] for t in every if _norm(speaker) in _norm(t["speaker"]) and t["role"] != "moderator"}
+            if not wanted["titles"] and not wanted["names"]:
+                return [], wanted
+        if role:
+            wanted["roles"] = {role}
+        candidates = [(entry, turn) for entry, turns in calls for turn in turns if _allowed(turn, wanted)]
+        query = set(terms(question)) - {t for name in wanted["names"] for t in terms(name)}
+        if not candidates:
+            return [], wanted
+
+        scored = []
+        if query:
+            lengths = [sum(turn["terms"].values()) for _, turn in candidates]
+            avg = sum(lengths) / len(lengths) or 1.0
+            df = Counter(term for _, turn in candidates for term in query if term in turn["terms"])
+            idf = {term: math.log(1 + (len(candidates) - df[term] + 0.5) / (df[term] + 0.5)) for term in query}
+            for (entry, turn), length in zip(candidates, lengths):
+                score = 0.0
+                for term in query:
+                    tf = turn["terms"].get(term, 0)
+                    if tf:
+                        score += idf[term] * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg))
+                if score > 0:
+                    scored.append((entry, turn, score))
+            scored.sort(key=lambda item: -item[2])
+        if not scored and (wanted["titles"] or wanted["names"] or wanted["roles"]):
+            scored = [(entry, turn, 0.0) for entry, turn in candidates]
+        return scored[:max_turns], wanted
+
+    def excerpts(self, company_id: str, entries: list, texts: dict, question: str) -> dict:
+        """
+        {filing key: excerpt} for the transcripts among `entries`: the matching turns of each call in
+        transcript order, with the analyst question in front of each management answer.
+        Empty when nothing in the calls matches (the caller then reads the transcripts whole).
+        """
+        calls = [(e, self.turns(company_id, e, texts[e["key"]])) for e in entries if e["doc_type"] == "transcript"]
+        if not calls:
+            return {}
+        hits, wanted = self.search(question, calls)
+        if not hits:
+            return {}
+
+        picked = {}
+        for entry, turn, _ in hits:
+            picked.setdefault(entry["key"], {})[turn["n"]] = turn
+        excerpts = {}
+        for entry, turns in calls:
+            chosen = picked.get(entry["key"])
+            if not chosen:
+                continue
+            for turn in list(chosen.values()):
+                if turn["role"] == "management" and turn["section"] == "qa":
+                    asked = next((t for t in reversed(turns[:turn["n"]]) if t["exchange"] == turn["exchange"] and t["role"] == "analyst"), None)
+                    if asked and asked["n"] not in chosen:
+                        chosen[asked["n"]] = {**asked, "text": asked["text"][:600] + ("..." if len(asked["text"]) > 600 else "")}
+            lines = [f"({len(chosen)} of {len(turns)} turns)"]
+            for n in sorted(chosen):
+                turn = chosen[n]
+                who = ", ".join(x for x in (turn["title"] or turn["role"], turn["firm"]) if x)
+                section = "Q&A" if turn["section"] == "qa" else "Presentation"
+                lines.append(f"[{section}] {turn['speaker']} ({who}), Page {turn['page']}: {turn['text']}")
+            excerpts[entry["key"]] = "\n".join(lines)
+        logger.info("Transcript turns selected", extra={
+            "company_id": company_id,
+            "calls": len(calls),
+            "turns": len(hits),
+            "speakers": sorted(wanted["titles"] | wanted["names"] | wanted["roles"]),
+        })
+        return excerpts
+
+
+TRANSCRIPTS = TranscriptIndex(max_turns=settings.TRANSCRIPT_MAX_TURNS)
@@ -0,0 +1,270 @@
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from app.core.config import settings
+from app.core.memory import MEMORY
+from app.services.gemini import generate_content, PRIORITY_BATCH
+from app.services.ingestion import UPLOAD_DIR, process_filing
+
+logger = logging.getLogger(__name__)
+
+# Upload jobs and resumable upload sessions (in-memory, like the other *_DB stores).
+# The request only streams bytes to disk; ticker detection, parsing and extraction all run
+# in the background job, whose progress is polled through GET /upload/jobs/{job_id}.
+
+INCOMING_DIR = UPLOAD_DIR / "_incoming"
+PARTIAL_DIR = UPLOAD_DIR / "_partial"
+
+JOBS = {}             # job_id -> job dict (see create_job)
+HASH_INDEX = {}       # sha256 -> job_id, so re-uploading the same PDF reuses its job
+UPLOAD_SESSIONS = {}  # session_id -> resumable upload state
+
+JOB_ACTIVE = ("queued", "detecting", "processing", "done")
+JOB_FINISHED = ("done", "failed")
+
+# Company ids become directory names under uploads/, so no separators and no "." / ".."
+COMPANY_ID_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_filename(filename: str | None) -> str:
+    name = Path(filename or "upload.pdf").name
+    return re.sub(r"[^A-Za-z0-9._ -]", "_", name) or "upload.pdf"
+
+
+def valid_company_id(company_id: str) -> bool:
+    return bool(COMPANY_ID_RE.match(company_id)) and company_id.strip(".") != ""
+
+
+def clean_company_id(company_id: str | None) -> str | None:
+    """None when no usable id was given; raises ValueError for an id that isn't safe as a folder name."""
+    company_id = (company_id or "").strip()
+    if not company_id or company_id == "undefined" or len(company_id) <= 2:
+        return None
+    if not valid_company_id(company_id):
+        raise ValueError("company_id may only contain letters, digits, '.', '_' and '-'.")
+    return company_id
+
+
+async def write_stream(chunks, fh, hasher, limit: int, written: int = 0) -> int:
+    """Appends an async byte stream to `fh`, updating `hasher`; raises UploadTooLarge past `limit` bytes."""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if written + len(chunk) > limit:
+            raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+        hasher.update(chunk)
+        fh.write(chunk)
+        written += len(chunk)
+    return written
+
+
+async def iter_upload_file(upload_file, chunk_size: int = settings.UPLOAD_CHUNK_BYTES):
+    while chunk := await upload_file.read(chunk_size):
+        yield chunk
+
+
+# --- Jobs ---
+
+def job_view(job: dict) -> dict:
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+def create_job(path: Path, filename: str, sha256: str, size: int, company_id: str | None = None,
+               period: str | None = None) -> tuple[dict, bool]:
+    """
+    Registers a job for a file already on disk. Returns (job, created); an identical file
+    (same hash, same or no company) that is queued, running or done returns the existing job.
+    `period` ("Q2 FY22") overrides the fiscal period read from the file.
+    """
+    purge_jobs()
+    existing = JOBS.get(HASH_INDEX.get(sha256))
+    if existing and existing["status"] in JOB_ACTIVE and (company_id is None or existing["company_id"] == company_id):
+        path.unlink(missing_ok=True)
+        return existing, False
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "filename": filename,
+        "company_id": company_id,
+        "period": period,
+        "sha256": sha256,
+        "size": size,
+        "chunks": None,
+        "filing": None, # Catalog entry (period, document type, currency) once processed
+        "memory": None, # Per-stage RSS report once processed
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "_path": path,
+    }
+    JOBS[job_id] = job
+    HASH_INDEX[sha256] = job_id
+    return job, True
+
+
+def purge_jobs(ttl: int = settings.UPLOAD_JOB_TTL):
+    """Drops finished jobs not updated for `ttl` seconds, and hash entries pointing at them."""
+    cutoff = time.time() - ttl
+    for job_id, job in list(JOBS.items()):
+        if job["status"] in JOB_FINISHED and job["updated_at"] < cutoff:
+            JOBS.pop(job_id, None)
+    for sha256, job_id in list(HASH_INDEX.items()):
+        if job_id not in JOBS:
+            HASH_INDEX.pop(sha256, None)
+
+
+def _update(job: dict, **fields):
+    job.update(fields, updated_at=time.time())
+
+
+def _read_preview(path: Path, pages: int = 2) -> str:
+    from app.services.ingestion import pdfplumber
+    text = ""
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages[:pages]:
+            text += page.extract_text() or ""
+            page.close()
+    return text
+
+
+async def detect_company(path: Path, filename: str) -> str:
+    """NSE ticker from the first pages via the LLM, falling back to the filename."""
+    detected = None
+    try:
+        # Read LESS pages (only 2) to save RAM
+        text_preview = await asyncio.to_thread(_read_preview, path)
+        if len(text_preview) > 50:
+            prompt = f"""Identify the NSE Ticker (e.g. INFY, TCS) from this text. Return JSON {{ "ticker": "SYMBOL" }}. Text: {text_preview[:1000]}"""
+            response = await generate_content(prompt, priority=PRIORITY_BATCH, site="upload.detect_ticker")
+            json_match = re.search(r"\{.*\}", response, re.DOTALL)
+            if json_match:
+                detected = json.loads(json_match.group(0)).get("ticker")
+    except Exception as e:
+        logger.warning("Ticker detection skipped/failed", extra={"upload_filename": filename, "error": str(e)})
+
+    if not detected or detected == "UNKNOWN":
+        # Fallback to Filename (remove extension, upper case)
+        # e.g. "airtle.pdf" -> "AIRTLE"
+        detected = filename.rsplit('.', 1)[0].upper().replace(" ", "_")
+        logger.info("Ticker from filename", extra={"upload_filename": filename, "company_id": detected})
+    # The LLM's answer is a folder name too
+    return detected if detected and valid_company_id(detected) else "UNKNOWN_COMPANY"
+
+
+async def run_upload_job(job_id: str):
+    # Stays "queued" until the memory budget admits it (MAX_INGEST_JOBS at a time, and under MEMORY_BUDGET_MB)
+    async with MEMORY.job_slot():
+        await _run_upload_job(job_id)
+
+
+async def _run_upload_job(job_id: str):
+    job = JOBS[job_id]
+    try:
+        company_id = job["company_id"]
+        if not company_id:
+            _update(job, status="detecting")
+            company_id = await detect_company(job["_path"], job["filename"])
+
+        # Move out of the incoming area into the company folder the rest of the app reads from
+        company_dir = UPLOAD_DIR / company_id
+        company_dir.mkdir(parents=True, exist_ok=True)
+        final_path = company_dir / job["filename"]
+        shutil.move(str(job["_path"]), final_path)
+        _update(job, status="processing", company_id=company_id, _path=final_path)
+
+        stats = {}
+        chunks = await process_filing(final_path, company_id, stats=stats, period=job["period"])
+        _update(job, status="done", chunks=chunks, filing=stats.get("filing"), memory=stats.get("memory"))
+    except Exception as e:
+        logger.exception("Upload job failed", extra={"job_id": job_id})
+        _update(job, status="failed", error=str(e))
+
+
+# --- Resumable sessions ---
+
+def purge_sessions(ttl: int = settings.UPLOAD_SESSION_TTL):
+    cutoff = time.time() - ttl
+    for session_id, session in list(UPLOAD_SESSIONS.items()):
+        if session["updated_at"] < cutoff:
+            session["path"].unlink(missing_ok=True)
+            UPLOAD_SESSIONS.pop(session_id, None)
+
+
+def create_session(filename: str, size: int, company_id: str | None = None, sha256: str | None = None,
+                   period: str | None = None) -> dict:
+    purge_sessions()
+    PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+    session_id = uuid.uuid4().hex
+    now = time.time()
+    session = {
+        "session_id": session_id,
+        "filename": safe_filename(filename),
+        "size": size,
+        "company_id": clean_company_id(company_id),
+        "period": period,
+        "expected_sha256": sha256.lower() if sha256 else None,
+        "received": 0,
+        "created_at": now,
+        "updated_at": now,
+        "path": PARTIAL_DIR / f"{session_id}.part",
+        "hasher": hashlib.sha256(),
+        "lock": asyncio.Lock(),
+    }
+    session["path"].touch()
+    UPLOAD_SESSIONS[session_id] = session
+    return session
+
+
+def session_view(session: dict) -> dict:
+    return {
+        "session_id": session["session_id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "received": session["received"],
+        "chunk_size": settings.UPLOAD_CHUNK_BYTES,
+        "upload_url": f"/api/v1/upload/sessions/{session['session_id']}",
+    }
+
+
+async def append_chunk(session: dict, chunks, start: int) -> int:
+    """
+    Appends one chunk at byte offset `start`, which must equal what has been received so far.
+    Bytes of an interrupted chunk that did arrive are kept (and hashed), so the client resumes from `received`.
+    """
+    if start != session["received"]:
+        raise ValueError(f"Expected offset {session['received']}, got {start}")
+    with open(session["path"], "ab") as fh:
+        try:
+            await write_stream(chunks, fh, session["hasher"], session["size"], session["received"])
+        finally:
+            fh.flush()
+            session["received"] = fh.tell()
+            session["updated_at"] = time.time()
+    return session["received"]
+
+
+def finish_session(session: dict) -> tuple[Path, str]:
+    """Moves a fully received upload to the incoming area; returns (path, sha256)."""
+    sha256 = session["hasher"].hexdigest()
+    UPLOAD_SESSIONS.pop(session["session_id"], None)
+    if session["expected_sha256"] and session["expected_sha256"] != sha256:
+        session["path"].unlink(missing_ok=True)
+        raise ValueError("sha256 mismatch: upload corrupted, start a new session")
+    INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    path = INCOMING_DIR / f"{session['session_id']}_{session['filename']}"
+    shutil.move(str(session["path"]), path)
+    return path, sha256
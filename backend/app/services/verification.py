@@ -0,0 +1,171 @@
+
+import re
+
+# Deterministic cross-check of LLM-extracted metrics against the cited PDF pages.
+# Values that can be found on their cited page (at its printed precision, after unit normalization;
+# next to the metric's label for EPS, RoE and small values) are marked "verified"; everything else is "suspect" and is the only part sent to the LLM verifier.
+
+METRIC_KEYS = ["revenue", "operating_profit", "eps", "cash_flow", "roe"]
+
+# Metrics that are not currency amounts and must never be unit-scaled
+UNSCALED_METRICS = {"eps", "roe"}
+
+# Multipliers to absolute units
+UNIT_FACTORS = {
+    "thousand": 1e3,
+    "lakh": 1e5,
+    "million": 1e6,
+    "crore": 1e7,
+    "billion": 1e9,
+}
+
+UNIT_PATTERNS = {
+    "thousand": r"\bthousands?\b",
+    "lakh": r"\blakhs?\b|\blacs?\b",
+    "million": r"\bmillions?\b|\bmn\b",
+    "crore": r"\bcrores?\b|\bcr\b",
+    "billion": r"\bbillions?\b|\bbn\b",
+}
+
+# Numbers as printed in Indian filings: 2,25,458 / 1,234.5 / (1,234) for negatives
+NUMBER_RE = re.compile(r"(?<![\w.])\(?-?\d[\d,]*(?:\.\d+)?\)?(?![\w])")
+PAGE_RE = re.compile(r"Pages?\s*(\d+)(?:\s*(?:-|–|to|,|&|and)\s*(\d+))?", re.IGNORECASE)
+
+REL_TOLERANCE = 0.005  # 0.5% covers rounding when converting between units
+SMALL_VALUE = 100      # below this, incidental numbers on a page (counts, percentages) match too easily
+
+# Row labels that must share a line with the number for per-share / percentage metrics and small values
+METRIC_LABELS = {
+    "revenue": re.compile(r"revenue|income from operations|total income|sales", re.IGNORECASE),
+    "operating_profit": re.compile(r"operating|ebit", re.IGNORECASE),
+    "eps": re.compile(r"\beps\b|earnings per|per (equity )?share", re.IGNORECASE),
+    "cash_flow": re.compile(r"cash", re.IGNORECASE),
+    "roe": re.compile(r"\broe\b|return on (average )?(equity|net ?worth)", re.IGNORECASE),
+}
+
+
+def normalize_unit(unit_label: str | None):
+    """Map a free-text unit ("Crores", "₹ Cr", "USD Mn") to a UNIT_FACTORS key."""
+    if not unit_label:
+        return None
+    label = unit_label.lower()
+    for unit, pattern in UNIT_PATTERNS.items():
+        if re.search(pattern, label):
+            return unit
+    return None
+
+
+def parse_number(token: str):
+    negative = token.startswith("(") and token.endswith(")")
+    cleaned = token.strip("()").replace(",", "")
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def cited_pages(citation: str) -> set:
+    pages = set()
+    for match in PAGE_RE.finditer(citation or ""):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else start
+        if end < start or end - start > 5:  # "Page 22, 2024" style noise - keep only the first number
+            end = start
+        pages.update(range(start, end + 1))
+    return pages
+
+
+def _page_numbers(text: str) -> list:
+    """(value, half of the last printed digit, the line it is on) for every number on the page."""
+    numbers = []
+    for line in text.splitlines():
+        for token in NUMBER_RE.findall(line):
+            value = parse_number(token)
+            if value is not None:
+                decimals = len(token.strip("()").partition(".")[2])
+                numbers.append((value, 0.5 * 10 ** -decimals, line))
+    return numbers
+
+
+def _page_units(text: str) -> set:
+    lowered = text.lower()
+    return {unit for unit, pattern in UNIT_PATTERNS.items() if re.search(pattern, lowered)}
+
+
+def _matches(value: float, candidates: list, ratio: float, label=None) -> bool:
+    """
+    Same unit: the printed number and `value` agree to the coarser of their two precisions (123,800 doesn't verify 123,456).
+    Across units the conversion itself rounds, so REL_TOLERANCE applies. With `label`, the number's line must name the metric.
+    """
+    # The extracted value may itself be rounded (34.2 for a printed 34.21)
+    value_step = 0.5 * 10 ** -len(repr(float(value)).partition(".")[2].rstrip("0"))
+    for number, half_step, line in candidates:
+        tolerance = abs(value) * REL_TOLERANCE if ratio != 1.0 else max(half_step, value_step) + 1e-9
+        if abs(number * ratio - value) <= tolerance and (label is None or label.search(line)):
+            return True
+    return False
+
+
+def verify_metrics_locally(metrics: dict, text_pages: list) -> dict:
+    """
+    Cross-checks every extracted data point against the text of its cited page(s).
+    Returns {metric_key: {"status": "verified"|"suspect", "pages": [...], "values": [{"year", "value", "status"}]}}
+    """
+    page_text = {p["page"]: p["text"] for p in text_pages}
+    page_cache = {}
+    metric_unit = normalize_unit(metrics.get("meta", {}).get("currency_unit"))
+
+    report = {}
+    for key in METRIC_KEYS:
+        entry = metrics.get(key)
+        if not isinstance(entry, dict) or not entry.get("data"):
+            continue
+
+        pages = sorted(p for p in cited_pages(entry.get("citation", "")) if p in page_text)
+        numbers = []
+        units = set()
+        for page in pages:
+            if page not in page_cache:
+                page_cache[page] = (_page_numbers(page_text[page]), _page_units(page_text[page]))
+            page_numbers, page_units = page_cache[page]
+            numbers.extend(page_numbers)
+            units |= page_units
+
+        # Conversion ratios from the page's unit(s) into the unit the LLM reported in
+        ratios = {1.0}
+        if key not in UNSCALED_METRICS and metric_unit:
+            for unit in units:
+                ratios.add(UNIT_FACTORS[unit] / UNIT_FACTORS[metric_unit])
+
+        values = []
+        for point in entry["data"]:
+            value = point.get("value") if isinstance(point, dict) else None
+            status = "suspect"
+            if isinstance(value, (int, float)) and numbers:
+                label = METRIC_LABELS[key] if key in UNSCALED_METRICS or abs(value) < SMALL_VALUE else None
+                if any(_matches(float(value), numbers, ratio, label) for ratio in ratios):
+                    status = "verified"
+            values.append({"year": point.get("year") if isinstance(point, dict) else None, "value": value, "status": status})
+
+        report[key] = {
+            "status": "verified" if all(v["status"] == "verified" for v in values) else "suspect",
+            "pages": pages,
+            "values": values,
+        }
+    return report
+
+
+def suspect_subset(metrics: dict, report: dict) -> dict:
+    """Metric entries with at least one unverified value (plus meta for unit context)."""
+    subset = {key: metrics[key] for key, result in report.items() if result["status"] == "suspect"}
+    if subset and "meta" in metrics:
+        subset["meta"] = metrics["meta"]
+    return subset
+
+
+def source_for_pages(text_pages: list, pages: set, limit: int = 50000) -> str:
+    """Cited pages first, then the start of the document, capped at `limit` characters."""
+    cited = [p["text"] for p in text_pages if p["page"] in pages]
+    rest = [p["text"] for p in text_pages if p["page"] not in pages]
+    return "\n".join(cited + rest)[:limit]
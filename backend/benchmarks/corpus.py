@@ -0,0 +1,34 @@
+
+import hashlib
+from pathlib import Path
+from app.services.filing_catalog import doc_type_of
+
+# The bundled TCS corpus (../TCS): quarterly fact sheets, press releases, statements,
+# shareholding / capital structure filings and earnings call transcripts, ~4200 pages in total.
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "TCS"
+
+
+def doc_kind(path: Path) -> str:
+    return doc_type_of(path.name) or "other"
+
+
+def list_pdfs(corpus: Path = DEFAULT_CORPUS) -> list:
+    return sorted(corpus.rglob("*.pdf"))
+
+
+def sample_pdfs(pdfs: list, per_kind: int = 1) -> list:
+    """
+    Deterministic stratified sample: the `per_kind` most recent files of every document kind,
+    so a default run covers each layout (tables, prose, Q&A) without parsing all 4000+ pages.
+    """
+    by_kind = {}
+    for path in sorted(pdfs, reverse=True): # Newest fiscal year folders first
+        by_kind.setdefault(doc_kind(path), []).append(path)
+    return sorted(path for paths in by_kind.values() for path in paths[:per_kind])
+
+
+def sample_id(paths: list, corpus: Path) -> str:
+    """Stable key for a file selection, so history is only compared like for like."""
+    names = "\n".join(str(p.relative_to(corpus)) for p in sorted(paths))
+    return hashlib.sha1(names.encode()).hexdigest()[:12]
@@ -0,0 +1,275 @@
+"""
+Open-loop load generator for /upload, /analyze, /metrics and /stock, reporting p50/p95/p99 per endpoint.
+
+    cd backend
+    python -m benchmarks.loadtest --spawn --rps 20 --duration 30
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --mix metrics=3,stock=3,analyze=1
+
+--spawn starts uvicorn in a temp dir with the local stand-ins (LLM_PROVIDER=fake,
+EMBEDDINGS_PROVIDER=fake, MARKET_DATA_PROVIDER=fixtures, DB_PERSIST=false), so a run needs
+no quota or network. The chat answer cache is off there, since /analyze repeats a handful of
+questions and would otherwise measure cache hits; --answer-cache turns it back on. Requests are sent on a fixed schedule whether or not earlier ones have
+finished, and latency is measured from the scheduled send time, so a server that falls
+behind shows up in the percentiles instead of quietly lowering the request rate.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_PDF = BACKEND_DIR.parent / "TCS" / "2023-2024" / "Quarterly Statements" / "Q1" / "Capital Structure as on Jun 30, 2023.pdf"
+CONTEXT_COMPANY = "LOADTEST"
+QUESTIONS = (
+    "How did revenue grow this quarter?",
+    "What drove the change in operating margin?",
+    "Summarize the capital structure.",
+    "What are the key risks mentioned?",
+)
+
+FAKE_ENV = {
+    "LLM_PROVIDER": "fake",
+    "EMBEDDINGS_PROVIDER": "fake",
+    "MARKET_DATA_PROVIDER": "fixtures",
+    "MARKET_FIXTURES_DIR": str(BACKEND_DIR / "data" / "fixtures" / "market"),
+    "DB_PERSIST": "false",
+    "ANSWER_CACHE_ENABLED": "false", # QUESTIONS repeat, so /analyze would measure cache hits after the first few
+    "STARTUP_MODE": "eager",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def percentile(sorted_values: list, pct: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown endpoint '{name}'. Use: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# --- Scenarios: one request each, returning the response ---
+
+async def hit_metrics(client, ctx, n):
+    return await client.get(f"/api/v1/company/{ctx['symbols'][n % len(ctx['symbols'])]}/metrics")
+
+
+async def hit_stock(client, ctx, n):
+    return await client.get(f"/api/v1/company/{ctx['symbols'][n % len(ctx['symbols'])]}/stock", params={"period": "1y"})
+
+
+async def hit_analyze(client, ctx, n):
+    return await client.post("/api/v1/analyze", json={"company_id": CONTEXT_COMPANY, "question": QUESTIONS[n % len(QUESTIONS)]})
+
+
+async def hit_upload(client, ctx, n):
+    # A unique trailer per request so the server's duplicate detection doesn't short-circuit the upload
+    body = ctx["pdf"] + f"\n%loadtest {ctx['run']} {n}\n".encode()
+    files = {"file": (f"loadtest_{n}.pdf", body, "application/pdf")}
+    return await client.post("/api/v1/upload", files=files, data={"company_id": f"{CONTEXT_COMPANY}_UP"})
+
+
+SCENARIOS = {"upload": hit_upload, "analyze": hit_analyze, "metrics": hit_metrics, "stock": hit_stock}
+
+
+async def seed_context(client, pdf: bytes, timeout: float = 120):
+    """Uploads one filing for CONTEXT_COMPANY and waits for it, so /analyze answers from real context."""
+    response = await client.post(
+        "/api/v1/upload",
+        files={"file": ("loadtest_seed.pdf", pdf, "application/pdf")},
+        data={"company_id": CONTEXT_COMPANY},
+    )
+    response.raise_for_status()
+    status_url = response.json()["status_url"]
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = (await client.get(status_url)).json()
+        if job["status"] in ("done", "failed"):
+            return job["status"]
+        await asyncio.sleep(0.25)
+    return "timeout"
+
+
+async def generate_load(base_url: str, rps: float, duration: float, weights: dict, ctx: dict, timeout: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    names, cumulative = list(weights), []
+    total = 0.0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+
+    results = {name: [] for name in names}
+    counters = {name: 0 for name in names}
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        if "analyze" in weights:
+            print(f"Seeding context for {CONTEXT_COMPANY}: {await seed_context(client, ctx['pdf'])}")
+
+        async def one(name: str, n: int, scheduled: float):
+            status = "error"
+            try:
+                response = await SCENARIOS[name](client, ctx, n)
+                status = response.status_code
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError:
+                status = "error"
+            results[name].append((time.perf_counter() - scheduled, status))
+
+        tasks = []
+        start = time.perf_counter()
+        total_requests = int(rps * duration)
+        for i in range(total_requests):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pick = rng.random() * total
+            name = next(n for n, edge in zip(names, cumulative) if pick < edge)
+            counters[name] += 1
+            tasks.append(asyncio.create_task(one(name, counters[name], scheduled)))
+        sent_seconds = time.perf_counter() - start
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    report = {"rps_target": rps, "duration": duration, "sent_seconds": round(sent_seconds, 2), "elapsed_seconds": round(elapsed, 2), "endpoints": {}}
+    for name, samples in results.items():
+        latencies = sorted(s[0] * 1000 for s in samples)
+        ok = sum(1 for _, status in samples if isinstance(status, int) and status < 400)
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report["endpoints"][name] = {
+            "requests": len(samples),
+            "ok": ok,
+            "error_rate": round(1 - ok / len(samples), 4) if samples else 0.0,
+            "rps": round(len(samples) / sent_seconds, 2) if sent_seconds else None,
+            "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+            "max_ms": round(latencies[-1], 1) if latencies else None,
+            "statuses": statuses,
+        }
+    return report
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(workdir: str, extra_env: dict, timeout: float = 60) -> tuple[subprocess.Popen, str]:
+    """uvicorn with the local stand-ins, run from a temp dir so uploads and price data don't land in the repo."""
+    port = free_port()
+    env = {**os.environ, **FAKE_ENV, **extra_env, "PYTHONPATH": str(BACKEND_DIR)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            sys.exit("Server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    sys.exit(f"/health did not answer within {timeout}s")
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<10} {'reqs':>6} {'ok':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for name, e in report["endpoints"].items():
+        cells = [f"{e[key]:>9}" if e[key] is not None else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<10} {e['requests']:>6} {e['ok']:>6} {e['rps'] or 0:>7} {' '.join(cells)}  {e['statuses']}")
+    print(f"\nsent for {report['sent_seconds']}s (target {report['duration']}s at {report['rps_target']} rps), all answered after {report['elapsed_seconds']}s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="server to test (default: --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start a local server with fake LLM and fixture market data")
+    parser.add_argument("--rps", type=float, default=10, help="total requests per second across endpoints")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of sending")
+    parser.add_argument("--mix", default="metrics=4,stock=4,analyze=1,upload=1", help="endpoint weights")
+    parser.add_argument("--symbols", default="TCS,INFY,WIPRO,HCLTECH,TECHM")
+    parser.add_argument("--pdf", type=Path, default=DEFAULT_PDF, help="filing used for uploads and the /analyze context")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, help="FAKE_LLM_LATENCY_MS for the spawned server")
+    parser.add_argument("--llm-tokens-per-second", type=float, help="FAKE_LLM_TOKENS_PER_SECOND for the spawned server")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the chat answer cache on in the spawned server")
+    parser.add_argument("--max-p99-ms", type=float, help="exit 1 if any endpoint's p99 is above this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit 1 if any endpoint fails more often")
+    parser.add_argument("--json", type=Path, help="also write the report here")
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    ctx = {
+        "symbols": [s.strip() for s in args.symbols.split(",") if s.strip()],
+        "pdf": args.pdf.read_bytes() if ("upload" in weights or "analyze" in weights) else b"",
+        "run": int(time.time()),
+    }
+    server_env = {}
+    if args.llm_latency_ms is not None:
+        server_env["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    if args.llm_tokens_per_second is not None:
+        server_env["FAKE_LLM_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    if args.answer_cache:
+        server_env["ANSWER_CACHE_ENABLED"] = "true"
+
+    with tempfile.TemporaryDirectory(prefix="loadtest_") as workdir:
+        server = None
+        base_url = args.base_url
+        if args.spawn or not base_url:
+            server, base_url = spawn_server(workdir, server_env)
+        try:
+            cache_note = f", answer cache {'on' if args.answer_cache else 'off'}" if server is not None else ""
+            print(f"Load: {args.rps} rps for {args.duration}s against {base_url} ({args.mix}{cache_note})")
+            report = asyncio.run(generate_load(base_url, args.rps, args.duration, weights, ctx, args.timeout, args.seed))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    failures = []
+    for name, e in report["endpoints"].items():
+        if e["requests"] and e["error_rate"] > args.max_error_rate:
+            failures.append(f"{name}: error rate {e['error_rate']:.1%}")
+        if args.max_p99_ms is not None and e["p99_ms"] is not None and e["p99_ms"] > args.max_p99_ms:
+            failures.append(f"{name}: p99 {e['p99_ms']} ms > {args.max_p99_ms} ms")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Offline benchmark of the ingestion and retrieval hot paths over the bundled TCS filings.
+
+    cd backend
+    python -m benchmarks.run              # stratified sample (one filing per document kind)
+    python -m benchmarks.run --full       # all ~195 filings / ~4200 pages (takes a while)
+
+The LLM is the local fake provider (optionally with --llm-latency-ms), the DB is
+disabled and evidence CSVs go to a temp dir, so nothing needs network access or credentials.
+Each run is appended to benchmarks/results/history.jsonl and checked against
+benchmarks/thresholds.json; the exit code is 1 on a regression (skip with --no-check).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import DEFAULT_CORPUS, doc_kind, list_pdfs, sample_pdfs, sample_id
+from app.services.llm_providers import FakeLLM, set_llm, fake_metrics
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+HISTORY_FILE = RESULTS_DIR / "history.jsonl"
+THRESHOLDS_FILE = Path(__file__).resolve().parent / "thresholds.json"
+
+# Every benchmarked filing is also cataloged under this company, and retrieval is timed with
+# questions like the ones /analyze gets: a period and a document type, a speaker on the calls,
+# a topic with no period, and a period the sample doesn't have
+CATALOG_COMPANY = "BENCH_CATALOG"
+QUESTIONS = (
+    "What was revenue and constant currency growth in the latest quarter?",
+    "What did the CFO say about margins on the last earnings call?",
+    "How did BFSI and North America perform in Q2 FY26 compared to Q2 FY25?",
+    "Summarize the shareholding pattern and promoter holding.",
+    "What was attrition and headcount in FY2025?",
+    "What are the key risks management mentioned?",
+    "Revenue in Q1 FY19",
+)
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def timed(fn, *args, repeat: int = 1):
+    """(result of the last call, mean seconds per call)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+async def bench_file(path: Path, company_id: str, repeat: int) -> dict:
+    from app.services import ingestion
+
+    text_pages, extract_s = timed(ingestion.extract_text_from_pdf, path)
+    _, chunk_s = timed(ingestion.chunk_text, text_pages, repeat=repeat)
+
+    # Evidence tables for the pages the (fake) extraction cites
+    full_text = "\n".join(page["text"] for page in text_pages)
+    _, evidence_s = timed(ingestion.generate_evidence_csv, path, company_id, fake_metrics(full_text))
+
+    ingestion.FILING_CATALOG.register(CATALOG_COMPANY, path, text_pages)
+
+    # End to end: extract, chunk, (fake) LLM extraction + verification, evidence, no persistence
+    (ingestion.UPLOAD_DIR / company_id).mkdir(exist_ok=True) # The upload job moves files here first
+    start = time.perf_counter()
+    await ingestion.process_filing(path, company_id)
+    process_s = time.perf_counter() - start
+
+    return {
+        "file": path.name,
+        "kind": doc_kind(path),
+        "pages": len(text_pages),
+        "extract_s": extract_s,
+        "chunk_s": chunk_s,
+        "evidence_s": evidence_s,
+        "process_s": process_s,
+    }
+
+
+def bench_retrieval(repeat: int) -> dict:
+    """
+    retrieve_context over the cataloged sample: filing selection, transcript turn search and
+    budgeting, as /analyze runs it. The first pass also segments the transcripts (cold).
+    """
+    from app.api.analysis import retrieve_context
+
+    start = time.perf_counter()
+    contexts = [retrieve_context(CATALOG_COMPANY, question) for question in QUESTIONS]
+    cold_s = (time.perf_counter() - start) / len(QUESTIONS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            retrieve_context(CATALOG_COMPANY, question)
+    warm_s = (time.perf_counter() - start) / (repeat * len(QUESTIONS))
+    return {"cold_s": cold_s, "warm_s": warm_s, "chars": statistics.mean(len(c or "") for c in contexts)}
+
+
+def summarize(files: list, retrieval: dict) -> dict:
+    pages = sum(f["pages"] for f in files) or 1
+    extract_s = sum(f["extract_s"] for f in files)
+    process_s = sum(f["process_s"] for f in files)
+    return {
+        "extract_text.ms_per_page": round(extract_s * 1000 / pages, 3),
+        "extract_text.pages_per_second": round(pages / extract_s, 2) if extract_s else None,
+        "chunk_text.ms_per_page": round(sum(f["chunk_s"] for f in files) * 1000 / pages, 4),
+        "evidence.ms_per_filing": round(statistics.mean(f["evidence_s"] for f in files) * 1000, 2),
+        "retrieval.catalog_ms_per_query": round(retrieval["warm_s"] * 1000, 3),
+        "retrieval.catalog_cold_ms_per_query": round(retrieval["cold_s"] * 1000, 3),
+        "retrieval.context_chars_per_query": round(retrieval["chars"]),
+        "process_filing.ms_per_page": round(process_s * 1000 / pages, 3),
+        "process_filing.seconds_per_filing": round(process_s / len(files), 3),
+    }
+
+
+def by_kind(files: list) -> dict:
+    kinds = {}
+    for f in files:
+        entry = kinds.setdefault(f["kind"], {"files": 0, "pages": 0, "extract_s": 0.0})
+        entry["files"] += 1
+        entry["pages"] += f["pages"]
+        entry["extract_s"] += f["extract_s"]
+    return {
+        kind: {"files": e["files"], "pages": e["pages"], "extract_ms_per_page": round(e["extract_s"] * 1000 / max(e["pages"], 1), 2)}
+        for kind, e in sorted(kinds.items())
+    }
+
+
+def load_history() -> list:
+    if not HISTORY_FILE.exists():
+        return []
+    runs = []
+    for line in HISTORY_FILE.read_text().splitlines():
+        try:
+            runs.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return runs
+
+
+def check(record: dict, history: list, thresholds: dict) -> list:
+    """Failures against absolute limits and against the median of the last comparable passing runs."""
+    failures = []
+    window = thresholds.get("history_window", 5)
+    comparable = [
+        run for run in history
+        if run.get("ok") and run.get("config") == record["config"] and run.get("host") == record["host"]
+    ][-window:]
+
+    for name, rule in thresholds.get("metrics", {}).items():
+        value = record["metrics"].get(name)
+        if value is None:
+            continue
+        higher_is_better = rule.get("higher_is_better", False)
+        if "max" in rule and value > rule["max"]:
+            failures.append(f"{name} = {value} exceeds the limit of {rule['max']}")
+        if "min" in rule and value < rule["min"]:
+            failures.append(f"{name} = {value} is below the floor of {rule['min']}")
+
+        past = [run["metrics"][name] for run in comparable if run["metrics"].get(name)]
+        if not past:
+            continue
+        baseline = statistics.median(past)
+        allowed = rule.get("max_regression_pct", thresholds.get("max_regression_pct", 25)) / 100
+        change = (baseline - value) / baseline if higher_is_better else (value - baseline) / baseline
+        if change > allowed:
+            failures.append(f"{name} = {value} is {change:.0%} worse than the median {baseline} of the last {len(past)} runs")
+    return failures
+
+
+async def run(paths: list, repeat: int) -> tuple[list, dict]:
+    from app.core.config import settings
+    from app.services import ingestion
+
+    settings.DB_PERSIST = False
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        ingestion.UPLOAD_DIR = Path(tmp)
+        ingestion.FILING_CATALOG.root = Path(tmp)
+        for i, path in enumerate(paths):
+            result = await bench_file(path, f"BENCH_{i}", repeat)
+            results.append(result)
+            print(f"  {result['kind']:<18} {result['pages']:>4} pages  {result['extract_s'] * 1000 / max(result['pages'], 1):7.1f} ms/page  {path.name}")
+        retrieval = bench_retrieval(repeat)
+    return results, retrieval
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--full", action="store_true", help="every PDF in the corpus instead of the stratified sample")
+    parser.add_argument("--per-kind", type=int, default=1, help="filings per document kind in the sample")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions for the sub-millisecond stages")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="simulated latency of each fake LLM call")
+    parser.add_argument("--no-record", action="store_true", help="don't append to the history file")
+    parser.add_argument("--no-check", action="store_true", help="always exit 0")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    pdfs = list_pdfs(args.corpus)
+    if not pdfs:
+        print(f"No PDFs under {args.corpus}")
+        return 2
+    paths = pdfs if args.full else sample_pdfs(pdfs, args.per_kind)
+    set_llm(FakeLLM(latency=args.llm_latency_ms / 1000, tokens_per_second=0))
+
+    print(f"Benchmarking {len(paths)} of {len(pdfs)} filings from {args.corpus}")
+    started = time.perf_counter()
+    files, retrieval = asyncio.run(run(paths, args.repeat))
+
+    record = {
+        "ts": round(time.time(), 3),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "sample": "full" if args.full else sample_id(paths, args.corpus),
+            "files": len(paths),
+            "repeat": args.repeat,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "pages": sum(f["pages"] for f in files),
+        "wall_seconds": round(time.perf_counter() - started, 2),
+        "metrics": summarize(files, retrieval),
+        "by_kind": by_kind(files),
+    }
+    failures = check(record, load_history(), json.loads(THRESHOLDS_FILE.read_text()))
+    record["ok"] = not failures
+
+    print()
+    for name, value in record["metrics"].items():
+        print(f"  {name:<36} {value}")
+    if not args.no_record:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        with open(HISTORY_FILE, "a") as fh:
+            fh.write(json.dumps(record) + "\n")
+        print(f"\nRecorded in {HISTORY_FILE.relative_to(BACKEND_DIR)}")
+
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 0 if args.no_check else 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
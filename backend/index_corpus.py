@@ -0,0 +1,52 @@
+
+"""
+Catalogs a folder of filings (default: the bundled TCS/ corpus) so /analyze can read by period and document type.
+
+    python index_corpus.py                          # ../TCS as company TCS
+    python index_corpus.py /data/INFY --company INFY --jobs 4
+    python index_corpus.py --force                  # re-extract files already indexed
+
+Text extraction only (no LLM, no DB). Writes uploads/<company>/catalog.json, the text of each filing and
+the quarterly KPI series read from fact sheets and press releases (timeseries.json); a running server picks the new catalog up on the next question for that company.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from app.services.filing_catalog import FILING_CATALOG, index_corpus
+from app.services.timeseries import TIMESERIES
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent.parent / "TCS"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", type=Path, nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--company", help="company id (default: the folder name, e.g. TCS)")
+    parser.add_argument("--jobs", type=int, default=1, help="PDF extraction processes")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.root.is_dir():
+        sys.exit(f"Not a directory: {args.root}")
+    company_id = (args.company or args.root.resolve().name).upper()
+    started = time.perf_counter()
+
+    def progress(entry: dict):
+        print(f"  {entry['period'] or 'undated':<8} {entry['doc_type']:<18} {entry['currency'] or '-':<4} {entry['pages']:>4} pages  {entry['title']}")
+
+    counts = index_corpus(args.root, company_id, force=args.force, jobs=args.jobs, progress=progress)
+    print(f"{company_id}: {counts['indexed']} indexed, {counts['skipped']} unchanged, {counts['empty']} without text "
+          f"({counts['found']} PDFs, {time.perf_counter() - started:.1f}s)")
+    for doc_type, count in sorted(FILING_CATALOG.stats()["companies"].get(company_id, {}).get("doc_types", {}).items()):
+        print(f"  {doc_type:<18} {count}")
+    table = TIMESERIES.get(company_id)
+    if table and table["periods"]:
+        print(f"Time series: {len(table['metrics'])} metrics, {table['periods'][0]} to {table['periods'][-1]} "
+              f"({len(table['periods'])} quarters)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,33 @@
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import analysis, upload, metrics
+from app.core.http_cache import HTTPCacheMiddleware
+from app.core.startup import run_startup, startup_status
+from app.core.database import pool_stats, dispose_engine
+from app.core.memory import MEMORY
+from app.core.telemetry import TelemetryMiddleware, configure_logging, render_metrics
+from app.api import analysis, upload, metrics, compare, dashboard, filings, timeseries
+
+configure_logging()
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
 app.include_router(analysis.router, prefix="/api/v1")
 app.include_router(upload.router, prefix="/api/v1")
 app.include_router(metrics.router, prefix="/api/v1")
+app.include_router(compare.router, prefix="/api/v1")
+app.include_router(dashboard.router, prefix="/api/v1")
+app.include_router(filings.router, prefix="/api/v1")
+app.include_router(timeseries.router, prefix="/api/v1")
+
 
+# ETags / 304s, per-route Cache-Control and compression (added before CORS so CORS stays outermost)
+app.add_middleware(HTTPCacheMiddleware, minimum_size=settings.COMPRESS_MIN_BYTES)
+
+# Route latency histograms (outside the cache layer so compression time is included)
+app.add_middleware(TelemetryMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -27,24 +45,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.models.schema import Base
-from sqlalchemy import create_engine
-
 @app.on_event("startup")
-def startup_event():
-    # Naive DB init for prototype
-    # In production use Alembic migrations
-    try:
-        engine = create_engine(settings.DATABASE_URL)
-        Base.metadata.create_all(bind=engine)
-        print("Database tables created.")
+async def startup_event():
+    # Heavy imports and the DB probe: before serving (eager), in the background or on first use (lazy)
+    await run_startup(settings.STARTUP_MODE)
 
-    except Exception as e:
-        print(f"Warning: DB connection failed ({e}). Running without persistence.")
+@app.on_event("shutdown")
+async def shutdown_event():
+    await dispose_engine()
 
 @app.get("/health")
-def health_check():
-    return {"status": "ok", "env": settings.ENV}
+async def health_check():
+    # Never touches the DB or heavy libraries, so it answers as soon as the process is up
+    return {"status": "ok", "env": settings.ENV, "startup": startup_status()}
+
+@app.get("/db/stats")
+def db_stats():
+    """Connection pool usage (size, checked out, overflow) and lifetime connect/checkout counts."""
+    return pool_stats()
+
+@app.get("/memory")
+def memory_stats():
+    """RSS against the budget, admitted/waiting jobs and chats, and peak memory of recent filings."""
+    return MEMORY.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition: route latency, ingestion stages, Gemini calls/tokens, upstream latency, caches, DB pool."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
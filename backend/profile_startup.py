@@ -0,0 +1,114 @@
+
+"""
+Startup profile: import time of the app and time until /health answers, in fresh interpreters.
+
+    python profile_startup.py                      # report only
+    python profile_startup.py --max-import-ms 1500 --max-health-ms 3000   # CI gate (exit 1 if exceeded)
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(code: str, env: dict, *flags) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+
+def import_profile(env: dict, top: int):
+    """Cumulative import time of `main` plus the slowest top-level imports, from -X importtime."""
+    result = run_python("import main", env, "-X", "importtime")
+    if result.returncode != 0:
+        sys.exit(f"Importing main failed:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    total_us = next((cumulative for cumulative, _, name in rows if name == "main"), 0)
+    # Direct children of main's import (indent level 3) are the ones worth acting on
+    slowest = sorted((r for r in rows if r[1] <= 3 and r[2] != "main"), reverse=True)[:top]
+    return total_us / 1000, [(name, cumulative / 1000) for cumulative, _, name in slowest]
+
+
+def heavy_modules_loaded(env: dict) -> list:
+    result = run_python(
+        "import json, sys, main; from app.core.lazy import loaded_modules; print(json.dumps(loaded_modules()))",
+        env,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else ["<import failed>"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_health(env: dict, timeout: float = 30.0) -> float:
+    """Wall time from spawning uvicorn to the first 200 from /health."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        sys.exit(f"/health did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="lazy", choices=["eager", "background", "lazy"])
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-health-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports")
+    args = parser.parse_args()
+
+    env = {**os.environ, "STARTUP_MODE": args.mode, "PYTHONDONTWRITEBYTECODE": "1"}
+    import_ms, slowest = import_profile(env, args.top)
+    print(f"STARTUP_MODE={args.mode}")
+    print(f"import main: {import_ms:.0f} ms")
+    for name, ms in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    loaded = heavy_modules_loaded(env)
+    print(f"heavy modules loaded at import: {', '.join(loaded) or 'none'}")
+
+    health_ms = None
+    if not args.skip_server:
+        health_ms = time_to_health(env)
+        print(f"first /health: {health_ms:.0f} ms after spawn")
+
+    failures = []
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_health_ms is not None and health_ms is not None and health_ms > args.max_health_ms:
+        failures.append(f"time to /health {health_ms:.0f} ms > {args.max_health_ms:.0f} ms")
+    if args.mode == "lazy" and loaded:
+        failures.append(f"lazy mode imported heavy modules: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,4 @@
 
-import requests
-import json
-import sys
 import asyncio
 from app.api.metrics import get_company_metrics
 
@@ -11,9 +8,9 @@ async def test():
         data = await get_company_metrics("RELIANCE")
         print("Success!")
         print(f"Revenue Data Points: {len(data['revenue']['data'])}")
-        print(f"Stock Data Price: {data['stock_price']['data'][-1]}")
+        print(f"EPS Data Points: {len(data['eps']['data'])}")
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    verify_data()
+    asyncio.run(test())
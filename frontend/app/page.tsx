@@ -27,6 +27,7 @@ export default function Home() {
   const [file, setFile] = useState<File | null>(null);
   const [uploading, setUploading] = useState(false);
   const [companyId, setCompanyId] = useState("");
+  const [jobId, setJobId] = useState("");
   const [question, setQuestion] = useState("");
   const [chatHistory, setChatHistory] = useState<{ role: 'user' | 'agent', content: any }[]>([]);
   const [loadingAnalysis, setLoadingAnalysis] = useState(false);
@@ -88,22 +89,30 @@ export default function Home() {
     }
   }, [uploadSuccess]);
 
-  // Polling Effect
+  // Polling Effect (upload job: queued -> detecting -> processing -> done | failed)
   useEffect(() => {
-    if (!isPolling || !companyId) return;
+    if (!isPolling || !jobId) return;
 
     const interval = setInterval(async () => {
       try {
         const API_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, "");
-        const res = await fetch(`${API_BASE_URL}/api/v1/company/${companyId}/status`);
+        const res = await fetch(`${API_BASE_URL}/api/v1/upload/jobs/${jobId}`);
         const data = await res.json();
         console.log("Polling Status:", data.status);
 
-        if (data.status === "ready") {
+        // Company is known once detection has run in the background
+        if (data.company_id) setCompanyId(data.company_id);
+
+        if (data.status === "done") {
           clearInterval(interval);
           setIsPolling(false);
           setUploadSuccess(true); // Now trigger the smooth finish
           setRefreshTrigger(prev => prev + 1); // Refresh data
+        } else if (data.status === "failed") {
+          clearInterval(interval);
+          setIsPolling(false);
+          setUploading(false);
+          alert(`Processing failed: ${data.error}`);
         }
       } catch (e) {
         console.error("Polling Error:", e);
@@ -111,7 +120,7 @@ export default function Home() {
     }, 1000);
 
     return () => clearInterval(interval);
-  }, [isPolling, companyId]);
+  }, [isPolling, jobId]);
 
   const handleUpload = async () => {
     if (!file) return;
@@ -127,8 +136,8 @@ export default function Home() {
       const res = await fetch(`${API_BASE_URL}/api/v1/upload`, { method: "POST", body: formData });
       if (res.ok) {
         const data = await res.json();
-        console.log("Detected Company:", data.company_id);
         if (data.company_id) setCompanyId(data.company_id);
+        setJobId(data.job_id);
 
         // Start polling logic
         setIsPolling(true);
@@ -1,7 +1,7 @@
 
 "use client";
 
-import { useState, useEffect } from 'react';
+import { useDashboard } from '@/lib/dashboard';
 import { Building2, Globe, Users, Briefcase, TrendingUp, DollarSign } from 'lucide-react';
 
 interface ProfileData {
@@ -19,21 +19,9 @@ interface ProfileData {
 }
 
 export function CompanyProfile({ companyId }: { companyId: string }) {
-    const [profile, setProfile] = useState<ProfileData | null>(null);
-
-    useEffect(() => {
-        const fetchProfile = async () => {
-            try {
-                const API_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, "");
-                const res = await fetch(`${API_BASE_URL}/api/v1/company/${companyId}/metrics`);
-                const data = await res.json();
-                if (data.profile) setProfile(data.profile);
-            } catch (e) {
-                console.error("Profile Fetch Error:", e);
-            }
-        };
-        if (companyId) fetchProfile();
-    }, [companyId]);
+    // Shares the page's single /dashboard request with the charts and news
+    const dashboard = useDashboard(companyId);
+    const profile: ProfileData | null = dashboard?.metrics?.profile ?? null;
 
     if (!profile) return <div className="glass-card p-8 h-full animate-pulse bg-white/5" />;
 
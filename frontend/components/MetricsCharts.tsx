@@ -1,7 +1,7 @@
 
 "use client";
 
-import { useEffect, useState } from 'react';
+import { useDashboard } from '@/lib/dashboard';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, AreaChart, Area, PieChart, Pie, Cell, LabelList, CartesianGrid } from 'recharts';
 import { motion } from 'framer-motion';
 import { ExternalLink, CheckCircle, Download } from 'lucide-react';
@@ -37,22 +37,10 @@ function ChartCard({ title, children, citation, link }: { title: string, childre
 }
 
 export function MetricsCharts({ companyName, refreshKey }: { companyName: string, refreshKey?: number }) {
-    const [data, setData] = useState<any>(null);
-    const [stockData, setStockData] = useState<any>(null);
-
-    useEffect(() => {
-        const API_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, "");
-        fetch(`${API_BASE_URL}/api/v1/company/${companyName}/metrics?t=${refreshKey}`)
-            .then(res => res.json())
-            .then(setData)
-            .catch(console.error);
-
-        fetch(`${API_BASE_URL}/api/v1/company/${companyName}/stock`)
-            .then(res => res.json())
-            .then(setStockData)
-            .catch(console.error);
-
-    }, [companyName, refreshKey]);
+    // Metrics and stock come from the page's single /dashboard request; failed sections are null
+    const dashboard = useDashboard(companyName, refreshKey);
+    const data = dashboard ? dashboard.metrics ?? {} : null;
+    const stockData = dashboard ? dashboard.stock ?? { data: [], citation: "Unavailable" } : null;
 
     if (!data) return (
         <div className="grid grid-cols-1 md:grid-cols-2 xl:grid-cols-3 gap-6 animate-pulse">
@@ -1,20 +1,12 @@
 
 "use client";
 
-import { useEffect, useState } from 'react';
+import { useDashboard } from '@/lib/dashboard';
 import { motion } from 'framer-motion';
 import { Newspaper, ExternalLink, Clock } from 'lucide-react';
 
 export function NewsSection({ companyName }: { companyName: string }) {
-    const [news, setNews] = useState<any[]>([]);
-
-    useEffect(() => {
-        const API_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, "");
-        fetch(`${API_BASE_URL}/api/v1/company/${companyName}/news`)
-            .then(res => res.json())
-            .then(setNews)
-            .catch(console.error);
-    }, [companyName]);
+    const news = useDashboard(companyName)?.news ?? [];
 
     if (!news || news.length === 0) return null;
 
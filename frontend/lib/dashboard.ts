@@ -0,0 +1,50 @@
+"use client";
+
+import { useEffect, useState } from 'react';
+
+export interface Dashboard {
+    status: any;
+    metrics: any;
+    stock: any;
+    news: any[] | null;
+    incomplete: Record<string, string>;
+}
+
+const API_BASE_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000').replace(/\/$/, "");
+
+// One /dashboard request per company, shared by every component on the page.
+// A higher refreshKey (e.g. after an upload finishes) asks again; the server's ETag turns
+// an unchanged dashboard into a 304, so there is no cache-busting query string.
+const requests = new Map<string, { refreshKey: number, promise: Promise<Dashboard> }>();
+
+export function loadDashboard(companyId: string, refreshKey = 0): Promise<Dashboard> {
+    const cached = requests.get(companyId);
+    if (cached && cached.refreshKey >= refreshKey) return cached.promise;
+
+    const promise = fetch(`${API_BASE_URL}/api/v1/company/${companyId}/dashboard`)
+        .then(res => {
+            if (!res.ok) throw new Error(`Dashboard request failed: ${res.status}`);
+            return res.json();
+        });
+    // Don't keep failures around, the next mount retries
+    promise.catch(() => {
+        if (requests.get(companyId)?.promise === promise) requests.delete(companyId);
+    });
+    requests.set(companyId, { refreshKey, promise });
+    return promise;
+}
+
+export function useDashboard(companyId: string, refreshKey = 0): Dashboard | null {
+    const [dashboard, setDashboard] = useState<Dashboard | null>(null);
+
+    useEffect(() => {
+        if (!companyId) return;
+        let active = true;
+        loadDashboard(companyId, refreshKey)
+            .then(data => { if (active) setDashboard(data); })
+            .catch(console.error);
+        return () => { active = false; };
+    }, [companyId, refreshKey]);
+
+    return dashboard;
+}